@@ -11,8 +11,119 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 # โมเดลจาก Groq ที่จะใช้ (เช่น llama2-70b-4096, mixtral-8x7b-32768, gemma-7b-it)
 GROQ_MODEL_NAME = os.getenv("GROQ_MODEL_NAME", "qwen/qwen3-32b")
 
+# cache คำตอบของ LLM สำหรับ prompt ที่เหมือนกัน (ปิดไว้เป็นค่าเริ่มต้น)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "false").lower() == "true"
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./llm_cache/responses.sqlite3")
+
 # ชื่อโมเดล Embedding จาก Hugging Face
 EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+# backend ของ embeddings: torch หรือ onnx (int8 สำหรับ CPU ต้องติดตั้ง sentence-transformers[onnx])
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "./onnx_models")
+# ชุดคำสั่ง CPU ที่ใช้ quantize: arm64, avx2, avx512, avx512_vnni
+EMBEDDING_ONNX_QUANTIZATION = os.getenv("EMBEDDING_ONNX_QUANTIZATION", "avx2")
+# จำนวน thread ที่ใช้คำนวณ embedding (0 = ค่าเริ่มต้นของ backend)
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+
+# รวมคำค้นหาที่มาถึงภายในหน้าต่างเวลา (มิลลิวินาที) หรือจนครบจำนวนเป็น batch เดียว (0 = ปิด เป็นค่าเริ่มต้น เปิดเมื่อมีคำขอพร้อมกันมากพอ)
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "0"))
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+
+# cache ของ embeddings (จำนวนเวกเตอร์ในหน่วยความจำ และไฟล์ SQLite บนดิสก์ ถ้าเว้นว่างจะไม่เก็บลงดิสก์)
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache/embeddings.sqlite3")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
 
 # พาธสำหรับเก็บข้อมูล ChromaDB
-CHROMA_DB_DIRECTORY = os.getenv("CHROMA_DB_DIRECTORY", "./chroma_db")
\ No newline at end of file
+CHROMA_DB_DIRECTORY = os.getenv("CHROMA_DB_DIRECTORY", "./chroma_db")
+
+# ค้นหาแบบผสม vector + BM25 (ตัดคำภาษาไทย) แล้วรวมผลด้วย reciprocal rank fusion
+HYBRID_RETRIEVAL_ENABLED = os.getenv("HYBRID_RETRIEVAL_ENABLED", "true").lower() == "true"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "10"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# บริบทที่ส่งให้ LLM: จำนวนชิ้นส่วนที่ค้นหา และงบ token หลังรวมชิ้นส่วนที่ซ้อนทับกัน (0 = ไม่จำกัด)
+CONTEXT_RETRIEVAL_K = int(os.getenv("CONTEXT_RETRIEVAL_K", "8"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1000"))
+CONTEXT_CHARS_PER_TOKEN = float(os.getenv("CONTEXT_CHARS_PER_TOKEN", "2.0"))
+
+# ใช้เฉลยทั้งฉบับเป็นบริบทเมื่ออยู่ในงบ token เพื่อให้ prefix ของ prompt คงที่ต่อคำถาม
+# (ปิดไว้เป็นค่าเริ่มต้น: ค่าเริ่มต้นใช้ชิ้นส่วนที่ค้นหาได้ตามคำตอบของนักศึกษาเหมือนเดิม)
+WHOLE_ANSWER_KEY_CONTEXT = os.getenv("WHOLE_ANSWER_KEY_CONTEXT", "false").lower() == "true"
+# จำนวน prefix ของ prompt (คำถาม + เฉลย) ที่ cache ไว้
+PROMPT_PREFIX_CACHE_SIZE = int(os.getenv("PROMPT_PREFIX_CACHE_SIZE", "256"))
+# ใส่ cache_control ให้ prefix สำหรับ provider ที่ต้องระบุจุด cache เอง (เช่น Anthropic)
+PROMPT_CACHE_CONTROL = os.getenv("PROMPT_CACHE_CONTROL", "false").lower() == "true"
+
+# ให้ LLM เริ่มคำตอบด้วยบล็อก JSON ของคะแนนรายหมวด (ตรวจสอบด้วย ScoreBlock)
+STRUCTURED_OUTPUT_ENABLED = os.getenv("STRUCTURED_OUTPUT_ENABLED", "false").lower() == "true"
+
+# max_tokens ของโหมดให้คะแนนอย่างเดียว (mode=score)
+SCORE_ONLY_MAX_TOKENS = int(os.getenv("SCORE_ONLY_MAX_TOKENS", "512"))
+# ปิดการคิดของโมเดลแบบ reasoning (เช่น qwen3) ในโหมด score ด้วยคำสั่ง /no_think เพื่อไม่ให้บล็อก <think> ใช้ max_tokens หมด
+SCORE_ONLY_NO_THINK = os.getenv("SCORE_ONLY_NO_THINK", "true").lower() == "true"
+
+# LLM backend: groq หรือ fake (LLM จำลองสำหรับทดสอบภาระงานแบบออฟไลน์)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq").lower()
+# เวลาตอบสนองของ LLM จำลอง: latency ก่อน token แรก (ค่าเฉลี่ยและส่วนเบี่ยงเบน) และอัตรา token ต่อวินาที (0 = ไม่หน่วง)
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "500"))
+FAKE_LLM_LATENCY_JITTER_MS = float(os.getenv("FAKE_LLM_LATENCY_JITTER_MS", "100"))
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "0"))
+
+# การจำกัดอัตราเรียก LLM ให้อยู่ในโควตาของ provider (0 = ไม่จำกัด ค่าเริ่มต้น; ตั้งตามโควตาของบัญชี เช่น 30 สำหรับ Groq free tier)
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+# token ของคำตอบที่จองไว้ต่อคำขอ ก่อนปรับตามการใช้งานจริง
+LLM_COMPLETION_TOKEN_RESERVE = int(os.getenv("LLM_COMPLETION_TOKEN_RESERVE", "1024"))
+# การลองใหม่เมื่อเจอ 429/5xx และ circuit breaker
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "1.0"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "30.0"))
+LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5"))
+LLM_CIRCUIT_RESET_SECONDS = float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "30.0"))
+
+# ค้นหาแบบ exact ด้วย matrix ของเวกเตอร์ในหน่วยความจำ (NumPy) แทน HNSW ของ Chroma
+# ใช้กับ collection ที่มีชิ้นส่วนไม่เกิน EXACT_SEARCH_MAX_VECTORS เท่านั้น
+EXACT_SEARCH_ENABLED = os.getenv("EXACT_SEARCH_ENABLED", "true").lower() == "true"
+EXACT_SEARCH_MAX_VECTORS = int(os.getenv("EXACT_SEARCH_MAX_VECTORS", "5000"))
+
+# ใช้ metadata filter (subject_id, question_id) ตอนค้นหาใน Chroma
+# collection แยกตามคำถามอยู่แล้ว ตั้งเป็น false เพื่อข้าม filter ได้
+RETRIEVAL_METADATA_FILTER = os.getenv("RETRIEVAL_METADATA_FILTER", "true").lower() == "true"
+
+# รูปแบบ collection ของ ChromaDB: "question" (หนึ่ง collection ต่อคำถาม) หรือ "subject" (หนึ่ง collection ต่อวิชา
+# แยกคำถามด้วย metadata question_id) ย้ายข้อมูลเดิมด้วย python -m app.services.collection_migration_service
+COLLECTION_LAYOUT = os.getenv("COLLECTION_LAYOUT", "question").lower()
+
+# จำนวนชิ้นส่วนต่อ batch ตอน index เฉลย (embed แล้วบันทึกทีละ batch)
+INDEX_BATCH_SIZE = int(os.getenv("INDEX_BATCH_SIZE", "64"))
+
+# จำนวน vector store (collection) ที่เก็บไว้ใน cache ต่อ process
+VECTOR_STORE_CACHE_SIZE = int(os.getenv("VECTOR_STORE_CACHE_SIZE", "128"))
+
+# โหลด embeddings ล่วงหน้าตอนเริ่ม app เพื่อไม่ให้ request แรกช้า
+WARMUP_MODELS = os.getenv("WARMUP_MODELS", "true").lower() == "true"
+
+# จำนวน thread สูงสุดสำหรับงานที่ block (embedding, PDF, ดาวน์โหลดไฟล์) ใน async endpoints
+BLOCKING_EXECUTOR_WORKERS = int(os.getenv("BLOCKING_EXECUTOR_WORKERS", "8"))
+
+# จำนวน process สำหรับงาน CPU-bound (ค่าเริ่มต้นคือจำนวน CPU)
+PROCESS_EXECUTOR_WORKERS = int(os.getenv("PROCESS_EXECUTOR_WORKERS", str(os.cpu_count() or 1)))
+
+# จำนวนหน้าขั้นต่ำของ PDF ที่จะแบ่งสกัดข้อความขนานกันหลาย process
+PDF_PARALLEL_PAGE_THRESHOLD = int(os.getenv("PDF_PARALLEL_PAGE_THRESHOLD", "100"))
+
+# จำนวนการประเมินที่ทำพร้อมกันในการประเมินแบบ batch (ค่าเริ่มต้นและค่าสูงสุด)
+BATCH_EVALUATION_CONCURRENCY = int(os.getenv("BATCH_EVALUATION_CONCURRENCY", "4"))
+MAX_BATCH_EVALUATION_CONCURRENCY = int(os.getenv("MAX_BATCH_EVALUATION_CONCURRENCY", "16"))
+
+# จำนวนรายการสูงสุดต่อคำขอประเมินแบบ batch
+MAX_BATCH_ITEMS = int(os.getenv("MAX_BATCH_ITEMS", "200"))
+
+# คิวงาน index เฉลยเบื้องหลัง (จำนวน worker และจำนวนงานที่เก็บสถานะไว้)
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "2"))
+INGESTION_JOB_HISTORY = int(os.getenv("INGESTION_JOB_HISTORY", "1000"))
\ No newline at end of file
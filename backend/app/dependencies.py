@@ -0,0 +1,22 @@
+# backend/app/dependencies.py
+from fastapi import Request
+from .services.rag_service import AnswerEvaluationService
+from .services.llm_service import LLMEvaluationService
+from .services.supabase_service import SupabaseService
+from .services.ingestion_service import IngestionService
+
+def get_rag_service(request: Request) -> AnswerEvaluationService:
+    """ดึง RAG service instance ที่สร้างไว้ตอนเริ่ม app"""
+    return request.app.state.rag_service
+
+def get_llm_service(request: Request) -> LLMEvaluationService:
+    """ดึง LLM service instance ที่สร้างไว้ตอนเริ่ม app"""
+    return request.app.state.llm_service
+
+def get_supabase_service() -> SupabaseService:
+    """สร้าง Supabase service instance"""
+    return SupabaseService()
+
+def get_ingestion_service(request: Request) -> IngestionService:
+    """ดึงคิวงาน index เฉลยที่สร้างไว้ตอนเริ่ม app"""
+    return request.app.state.ingestion_service
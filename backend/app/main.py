@@ -1,16 +1,47 @@
 # backend/app/main.py
-from fastapi import FastAPI, Depends
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from .config import WARMUP_MODELS
+from .services.model_service import get_model_service, shutdown_model_service
+from .services.executor_service import shutdown_executor
+from .services.embedding_cache_service import CachedEmbeddings
+from .services.llm_gateway_service import LLMUnavailableError
 from .services.rag_service import AnswerEvaluationService
 from .services.llm_service import LLMEvaluationService
-from .services.supabase_service import SupabaseService
+from .services.ingestion_service import IngestionService
 from .routers import evaluation
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    โหลดโมเดลครั้งเดียวตอนเริ่ม app และปิดเมื่อ app หยุดทำงาน
+    
+    Args:
+        app: FastAPI app
+    """
+    model_service = get_model_service()
+    if WARMUP_MODELS:
+        model_service.warm_up()
+    
+    # services ที่ใช้ร่วมกันทุก request
+    app.state.rag_service = AnswerEvaluationService(model_service=model_service)
+    app.state.llm_service = LLMEvaluationService(app.state.rag_service, model_service=model_service)
+    app.state.ingestion_service = IngestionService(app.state.rag_service)
+    
+    yield
+    
+    app.state.ingestion_service.shutdown()
+    shutdown_executor()
+    shutdown_model_service()
+
 # สร้าง FastAPI app
 app = FastAPI(
     title="ระบบผู้ช่วยตรวจข้อสอบอัตนัย",
     version="1.0.0",
-    description="API สำหรับระบบผู้ช่วยตรวจข้อสอบอัตนัยด้วย AI"
+    description="API สำหรับระบบผู้ช่วยตรวจข้อสอบอัตนัยด้วย AI",
+    lifespan=lifespan
 )
 
 origins = [
@@ -28,26 +59,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-def setup_dependencies():
-    """กำหนด dependencies สำหรับ FastAPI"""
+def setup_exception_handlers():
+    """กำหนดการตอบกลับเมื่อเกิดข้อผิดพลาดที่ใช้ร่วมกันทุก route"""
     
-    # Dependency providers
-    def get_rag_service():
-        """สร้าง RAG service instance"""
-        return AnswerEvaluationService()
-
-    def get_llm_service(rag_service: AnswerEvaluationService = Depends(get_rag_service)):
-        """สร้าง LLM service instance โดยใช้ RAG service"""
-        return LLMEvaluationService(rag_service)
-
-    def get_supabase_service():
-        """สร้าง Supabase service instance"""
-        return SupabaseService()
-    
-    # ลงทะเบียน dependencies กับ FastAPI
-    app.dependency_overrides[AnswerEvaluationService] = get_rag_service
-    app.dependency_overrides[LLMEvaluationService] = get_llm_service
-    app.dependency_overrides[SupabaseService] = get_supabase_service
+    @app.exception_handler(LLMUnavailableError)
+    async def llm_unavailable_handler(request: Request, exc: LLMUnavailableError):
+        """ตอบ 503 เมื่อ circuit breaker ของ LLM เปิดอยู่"""
+        return JSONResponse(status_code=503, content={"detail": str(exc)})
 
 def setup_routers():
     """กำหนด routers สำหรับ FastAPI"""
@@ -60,8 +78,24 @@ def setup_routes():
     async def root():
         """Route หลักของ API"""
         return {"message": "ยินดีต้อนรับสู่ API ผู้ช่วยตรวจข้อสอบอัตนัย"}
+    
+    @app.get("/metrics")
+    async def metrics():
+        """สถิติการทำงานของ services สำหรับติดตามประสิทธิภาพ"""
+        model_service = get_model_service()
+        embeddings = model_service.get_embeddings()
+        response_cache = model_service.get_response_cache()
+        embedding_batcher = model_service.get_embedding_batcher()
+        return {
+            "embedding_cache": embeddings.get_stats() if isinstance(embeddings, CachedEmbeddings) else None,
+            "embedding_batcher": embedding_batcher.get_stats() if embedding_batcher is not None else None,
+            "llm_response_cache": response_cache.get_stats() if response_cache is not None else None,
+            "llm_gateway": model_service.get_llm_gateway().get_stats(),
+            "retrieval": app.state.rag_service.get_retrieval_stats(),
+            "ingestion_jobs": app.state.ingestion_service.get_stats()
+        }
 
 # เริ่มต้นตั้งค่า app
-setup_dependencies()
+setup_exception_handlers()
 setup_routers()
 setup_routes()
\ No newline at end of file
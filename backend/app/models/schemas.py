@@ -1,22 +1,79 @@
 # backend/app/models/schemas.py
 from pydantic import BaseModel, Field
+from typing import List, Optional, Literal
+from ..config import MAX_BATCH_ITEMS
+
+# รหัสวิชาและรหัสคำถามใช้เป็นส่วนหนึ่งของชื่อ collection และชื่อไฟล์ จึงรับเฉพาะตัวอักษร ตัวเลข _ และ -
+# โดยต้องขึ้นต้นและลงท้ายด้วยตัวอักษรหรือตัวเลขตามกฎชื่อ collection ของ Chroma
+ID_PATTERN = r"^[A-Za-z0-9](?:[A-Za-z0-9_-]*[A-Za-z0-9])?$"
+# ชื่อ collection ของ Chroma ยาวได้ไม่เกิน 63 ตัวอักษร และชื่อที่ยาวที่สุดคือ f"{subject_id}_{question_id}"
+ID_MAX_LENGTH = 31
 
 class EvaluationRequest(BaseModel):
     question: str
     student_answer: str
-    subject_id: str
-    question_id: str
+    subject_id: str = Field(..., pattern=ID_PATTERN, max_length=ID_MAX_LENGTH)
+    question_id: str = Field(..., pattern=ID_PATTERN, max_length=ID_MAX_LENGTH)
+    bypass_cache: bool = Field(False, description="ข้าม cache คำตอบของ LLM และประเมินใหม่")
+    mode: Literal["full", "score"] = Field(
+        "full",
+        description="full = ประเมินพร้อมคำอธิบาย, score = ให้คะแนนอย่างเดียว (เร็วกว่า ขอคำอธิบายภายหลังด้วยโหมด full)"
+    )
+    stop_after_score: bool = Field(
+        False,
+        description="เฉพาะ /evaluate-stream: หยุดรับข้อความจาก LLM ทันทีที่ได้คะแนน (ผลการประเมินจะมีเฉพาะส่วนต้นและไม่ถูก cache)"
+    )
+
+class CriterionScore(BaseModel):
+    raw: int = Field(..., ge=0, le=2, description="คะแนนดิบของหมวด (0-2)")
+    weighted: float = Field(..., ge=0, description="คะแนนที่ถ่วงน้ำหนักแล้ว")
+
+class ScoreBlock(BaseModel):
+    understanding: CriterionScore
+    analysis: CriterionScore
+    completeness: CriterionScore
+    comparison: CriterionScore
+    communication: CriterionScore
+    item_scores: List[float] = Field(default_factory=list, description="คะแนนรายข้อ (เต็ม 10 คะแนน)")
+    total: float = Field(..., ge=0, le=40, description="คะแนนรวมเต็ม 40 คะแนน")
 
 class EvaluationResponse(BaseModel):
     evaluation: str
     score: float = Field(..., description="คะแนนเต็ม 40 คะแนน")
     subject_id: str
     question_id: str
+    score_details: Optional[ScoreBlock] = Field(None, description="คะแนนรายหมวด (เฉพาะโหมด structured output)")
 
 class StorageEvaluationRequest(BaseModel):
-    subject_id: str
-    question_id: str
+    subject_id: str = Field(..., pattern=ID_PATTERN, max_length=ID_MAX_LENGTH)
+    question_id: str = Field(..., pattern=ID_PATTERN, max_length=ID_MAX_LENGTH)
     answer_key_url: str
     student_answer_url: str
     answer_key_path: str
-    student_answer_path: str
\ No newline at end of file
+    student_answer_path: str
+
+class BatchEvaluationItem(BaseModel):
+    question: str
+    student_answer: str
+    subject_id: str = Field(..., pattern=ID_PATTERN, max_length=ID_MAX_LENGTH)
+    question_id: str = Field(..., pattern=ID_PATTERN, max_length=ID_MAX_LENGTH)
+    item_id: Optional[str] = Field(None, description="รหัสอ้างอิงของรายการ เช่น รหัสนักศึกษา")
+
+class BatchEvaluationRequest(BaseModel):
+    items: List[BatchEvaluationItem] = Field(..., min_length=1, max_length=MAX_BATCH_ITEMS)
+    concurrency: Optional[int] = Field(None, ge=1, description="จำนวนการประเมินที่ทำพร้อมกันสูงสุด")
+    bypass_cache: bool = Field(False, description="ข้าม cache คำตอบของ LLM และประเมินใหม่")
+    mode: Literal["full", "score"] = Field(
+        "full",
+        description="full = ประเมินพร้อมคำอธิบาย, score = ให้คะแนนอย่างเดียว (เร็วกว่า ขอคำอธิบายภายหลังด้วยโหมด full)"
+    )
+
+class BatchEvaluationResult(BaseModel):
+    index: int = Field(..., description="ลำดับของรายการในคำขอ")
+    item_id: Optional[str] = None
+    subject_id: str
+    question_id: str
+    evaluation: Optional[str] = None
+    score: Optional[float] = Field(None, description="คะแนนเต็ม 40 คะแนน")
+    score_details: Optional[ScoreBlock] = None
+    error: Optional[str] = None
@@ -1,31 +1,43 @@
 # backend/app/routers/evaluation.py
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from ..services.llm_service import LLMEvaluationService
 from ..services.rag_service import AnswerEvaluationService
 from ..models.schemas import EvaluationRequest, EvaluationResponse
+from ..models.schemas import BatchEvaluationRequest, BatchEvaluationResult
 from ..services.supabase_service import SupabaseService
+from ..services.ingestion_service import IngestionService
+from ..services.llm_gateway_service import LLMUnavailableError
+from ..dependencies import get_rag_service, get_llm_service, get_supabase_service, get_ingestion_service
+import json
+import asyncio
+import logging
 from ..models.schemas import StorageEvaluationRequest
-import tempfile
-import os
+from ..config import BATCH_EVALUATION_CONCURRENCY, MAX_BATCH_EVALUATION_CONCURRENCY
 
 router = APIRouter(prefix="/api/evaluation", tags=["evaluation"])
+logger = logging.getLogger(__name__)
 
 @router.post("/upload-answer-key")
 async def upload_answer_key(
     file: UploadFile = File(...),
     subject_id: str = Form(...),
     question_id: str = Form(...),
-    rag_service: AnswerEvaluationService = Depends()
+    wait: bool = Form(False),
+    ingestion_service: IngestionService = Depends(get_ingestion_service)
 ):
     """
     อัปโหลดไฟล์เฉลยของอาจารย์ (รองรับเฉพาะไฟล์ PDF)
     
+    เฉลยจะถูกส่งเข้าคิว index เบื้องหลังและตอบกลับด้วย job_id ทันที
+    ใช้ GET /ingestion-jobs/{job_id} เพื่อติดตามสถานะ หรือส่ง wait=true เพื่อรอจน index เสร็จ
+    
     Args:
         file: ไฟล์ PDF ที่อัปโหลด
         subject_id: รหัสวิชา
         question_id: รหัสคำถาม
-        rag_service: AnswerEvaluationService (dependency injection)
+        wait: รอให้ index เสร็จก่อนตอบกลับ
+        ingestion_service: IngestionService (dependency injection)
     
     Returns:
         JSONResponse พร้อมข้อมูลผลการอัปโหลด
@@ -40,13 +52,18 @@ async def upload_answer_key(
         # อ่านเนื้อหาไฟล์
         content = await file.read()
         
-        # ส่งเนื้อหาไฟล์ไปยัง index_answer_key
-        chunks = rag_service.index_answer_key(
+        # ส่งเนื้อหาไฟล์เข้าคิว index
+        job_id, future = ingestion_service.submit(
             answer_key_content=content,
             subject_id=subject_id,
             question_id=question_id,
             file_name=file.filename
         )
+        
+        if not wait:
+            return _create_upload_queued_response(file.filename, subject_id, question_id, job_id)
+        
+        chunks = await asyncio.wrap_future(future)
          
         # สร้างและส่งคืนการตอบสนอง
         return _create_upload_success_response(file.filename, subject_id, question_id, chunks)
@@ -57,6 +74,9 @@ async def upload_answer_key(
             status_code=400,
             detail=str(e)
         )
+    except (HTTPException, LLMUnavailableError):
+        # ส่งต่อให้ exception handler ของแอป (LLMUnavailableError = 503)
+        raise
     except Exception as e:
         # จัดการข้อผิดพลาดอื่นๆ
         raise HTTPException(
@@ -64,14 +84,42 @@ async def upload_answer_key(
             detail=f"Error processing file: {str(e)}"
         )
 
+@router.get("/ingestion-jobs/{job_id}")
+async def get_ingestion_job(
+    job_id: str,
+    ingestion_service: IngestionService = Depends(get_ingestion_service)
+):
+    """
+    ดึงสถานะของงาน index เฉลย
+    
+    Args:
+        job_id: รหัสงานที่ได้จากการอัปโหลด
+        ingestion_service: IngestionService (dependency injection)
+    
+    Returns:
+        สถานะ ขั้นตอน (parse/embed/store) และจำนวนชิ้นส่วนของงาน
+    
+    Raises:
+        HTTPException: ถ้าไม่พบงาน
+    """
+    job = ingestion_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"ไม่พบงาน index เฉลย: {job_id}"
+        )
+    return job
+
 @router.post("/evaluate", response_model=EvaluationResponse)
 async def evaluate_answer(
     request: EvaluationRequest,
-    llm_service: LLMEvaluationService = Depends()
+    llm_service: LLMEvaluationService = Depends(get_llm_service)
 ):
     """
     ประเมินคำตอบของนักเรียน
     
+    ส่ง mode=score เพื่อให้คะแนนอย่างเดียว (เร็วกว่า) แล้วขอคำอธิบายเต็มภายหลังด้วย mode=full
+    
     Args:
         request: คำขอประเมินคำตอบ
         llm_service: LLMEvaluationService (dependency injection)
@@ -79,20 +127,137 @@ async def evaluate_answer(
     Returns:
         EvaluationResponse ผลการประเมินคำตอบ
     """
-    result = llm_service.evaluate_answer(
+    result = await llm_service.aevaluate_answer(
         question=request.question,
         student_answer=request.student_answer,
         subject_id=request.subject_id,
-        question_id=request.question_id
+        question_id=request.question_id,
+        bypass_cache=request.bypass_cache,
+        mode=request.mode
     )
     
     return EvaluationResponse(
         evaluation=result["evaluation"],
         score=result["score"],
         subject_id=request.subject_id,
-        question_id=request.question_id
+        question_id=request.question_id,
+        score_details=result.get("score_details")
+    )
+
+@router.post("/evaluate-stream")
+async def evaluate_answer_stream(
+    request: EvaluationRequest,
+    llm_service: LLMEvaluationService = Depends(get_llm_service)
+):
+    """
+    ประเมินคำตอบของนักเรียนแบบ streaming ด้วย server-sent events
+    
+    event ที่ส่ง:
+    - token: ข้อความจาก LLM ทีละส่วน ({"text": ...})
+    - score: คะแนนทันทีที่บรรทัด "คะแนนเต็ม: X/40" ครบ ({"score": ...})
+    - result: EvaluationResponse เมื่อประเมินเสร็จ
+    - error: ข้อผิดพลาดระหว่างประเมิน ({"detail": ...})
+    
+    ส่ง stop_after_score=true เพื่อหยุดรับข้อความจาก LLM ทันทีที่ได้คะแนน (ประหยัด token)
+    
+    Args:
+        request: คำขอประเมินคำตอบ
+        llm_service: LLMEvaluationService (dependency injection)
+    
+    Returns:
+        StreamingResponse แบบ text/event-stream
+    """
+    async def stream_events():
+        try:
+            async for event, data in llm_service.astream_evaluation(
+                question=request.question,
+                student_answer=request.student_answer,
+                subject_id=request.subject_id,
+                question_id=request.question_id,
+                bypass_cache=request.bypass_cache,
+                mode=request.mode,
+                stop_after_score=request.stop_after_score
+            ):
+                if event == "token":
+                    yield _format_sse_event("token", {"text": data})
+                elif event == "score":
+                    yield _format_sse_event("score", {"score": data})
+                else:
+                    response = EvaluationResponse(
+                        evaluation=data["evaluation"],
+                        score=data["score"],
+                        subject_id=request.subject_id,
+                        question_id=request.question_id,
+                        score_details=data.get("score_details")
+                    )
+                    yield _format_sse_event("result", response.model_dump())
+        except Exception as e:
+            yield _format_sse_event("error", {"detail": str(e)})
+    
+    return StreamingResponse(
+        stream_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
+@router.post("/evaluate-batch")
+async def evaluate_batch(
+    request: BatchEvaluationRequest,
+    llm_service: LLMEvaluationService = Depends(get_llm_service)
+):
+    """
+    ประเมินคำตอบของนักเรียนหลายรายการ (เช่น ทั้งห้องเรียน) ในคำขอเดียว
+    
+    ผลลัพธ์ถูกส่งกลับแบบ NDJSON ทีละบรรทัดตามลำดับที่ประเมินเสร็จ
+    รายการที่เกิดข้อผิดพลาดจะมีฟิลด์ error โดยไม่ทำให้รายการอื่นล้มเหลว
+    
+    Args:
+        request: คำขอประเมินคำตอบแบบ batch
+        llm_service: LLMEvaluationService (dependency injection)
+    
+    Returns:
+        StreamingResponse ของ BatchEvaluationResult ทีละบรรทัด
+    """
+    concurrency = min(request.concurrency or BATCH_EVALUATION_CONCURRENCY, MAX_BATCH_EVALUATION_CONCURRENCY)
+    items = [item.model_dump() for item in request.items]
+    
+    async def stream_results():
+        async for index, result in llm_service.aevaluate_batch(
+            items,
+            concurrency=concurrency,
+            bypass_cache=request.bypass_cache,
+            mode=request.mode
+        ):
+            item = request.items[index]
+            batch_result = BatchEvaluationResult(
+                index=index,
+                item_id=item.item_id,
+                subject_id=item.subject_id,
+                question_id=item.question_id
+            )
+            if isinstance(result, Exception):
+                batch_result.error = str(result)
+            else:
+                batch_result.evaluation = result["evaluation"]
+                batch_result.score = result["score"]
+                batch_result.score_details = result.get("score_details")
+            yield batch_result.model_dump_json() + "\n"
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+def _format_sse_event(event: str, data: dict) -> str:
+    """
+    จัดรูปแบบข้อมูลเป็น server-sent event
+    
+    Args:
+        event: ชื่อ event
+        data: ข้อมูลที่จะส่งเป็น JSON
+    
+    Returns:
+        ข้อความของ event
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 def _validate_pdf_file(filename: str):
     """
     ตรวจสอบว่าไฟล์เป็น PDF หรือไม่
@@ -109,6 +274,29 @@ def _validate_pdf_file(filename: str):
             detail="รองรับเฉพาะไฟล์ PDF เท่านั้น"
         )
 
+def _create_upload_queued_response(filename: str, subject_id: str, question_id: str, job_id: str):
+    """
+    สร้างการตอบสนองเมื่อส่งเฉลยเข้าคิว index แล้ว
+    
+    Args:
+        filename: ชื่อไฟล์ที่อัปโหลด
+        subject_id: รหัสวิชา
+        question_id: รหัสคำถาม
+        job_id: รหัสงาน index
+    
+    Returns:
+        JSONResponse (202) พร้อมรหัสงาน
+    """
+    return JSONResponse({
+        "message": "PDF answer key queued for indexing",
+        "job_id": job_id,
+        "status": "queued",
+        "file_name": filename,
+        "subject_id": subject_id,
+        "question_id": question_id,
+        "file_type": "PDF"
+    }, status_code=202)
+
 def _create_upload_success_response(filename: str, subject_id: str, question_id: str, chunks: int):
     """
     สร้างการตอบสนองสำหรับการอัปโหลดสำเร็จ
@@ -134,9 +322,9 @@ def _create_upload_success_response(filename: str, subject_id: str, question_id:
 @router.post("/evaluate-from-storage", response_model=EvaluationResponse)
 async def evaluate_from_storage(
     request: StorageEvaluationRequest,
-    llm_service: LLMEvaluationService = Depends(),
-    rag_service: AnswerEvaluationService = Depends(),
-    supabase_service: SupabaseService = Depends()
+    llm_service: LLMEvaluationService = Depends(get_llm_service),
+    rag_service: AnswerEvaluationService = Depends(get_rag_service),
+    supabase_service: SupabaseService = Depends(get_supabase_service)
 ):
     """
     ประเมินคำตอบจากไฟล์ที่เก็บใน Supabase Storage
@@ -165,49 +353,40 @@ async def evaluate_from_storage(
             question_id=request.question_id
         )
         
-        print(f"เพิ่มเฉลยเข้า ChromaDB สำเร็จ: {chunks} ชิ้นส่วน")
+        logger.info("เพิ่มเฉลยเข้า ChromaDB สำเร็จ: %d ชิ้นส่วน", chunks)
         
         # สกัดข้อความจากไฟล์คำตอบนักเรียน
-        temp_path = None
-        try:
-            # สร้างไฟล์ชั่วคราว
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-                temp_file.write(student_answer_content)
-                temp_path = temp_file.name
-            
-            # สกัดข้อความจาก PDF
-            student_answer = rag_service.extract_text_from_pdf(temp_path)
-            
-            # สร้างคำถามจาก context
-            context_docs = rag_service.retrieve_relevant_context(
-                query="ข้อสอบอัตนัย",
-                subject_id=request.subject_id,
-                question_id=request.question_id
-            )
-            
-            context_text = "\n\n".join(doc.page_content for doc in context_docs)
-            question = f"ให้ตอบคำถามต่อไปนี้ตามเนื้อหาที่เรียน: {context_text[:300]}..."
-            
-            # ประเมินคำตอบ
-            result = llm_service.evaluate_answer(
-                question=question,
-                student_answer=student_answer,
-                subject_id=request.subject_id,
-                question_id=request.question_id
-            )
-            
-            return EvaluationResponse(
-                evaluation=result["evaluation"],
-                score=result["score"],
-                subject_id=request.subject_id,
-                question_id=request.question_id
-            )
-            
-        finally:
-            # ลบไฟล์ชั่วคราวหลังใช้งาน
-            if temp_path and os.path.exists(temp_path):
-                os.unlink(temp_path)
+        student_answer = await rag_service.aextract_text_from_pdf_content(student_answer_content)
+        
+        # สร้างคำถามจาก context
+        context_docs = await rag_service.aretrieve_relevant_context(
+            query="ข้อสอบอัตนัย",
+            subject_id=request.subject_id,
+            question_id=request.question_id
+        )
+        
+        context_text = "\n\n".join(doc.page_content for doc in context_docs)
+        question = f"ให้ตอบคำถามต่อไปนี้ตามเนื้อหาที่เรียน: {context_text[:300]}..."
+        
+        # ประเมินคำตอบ
+        result = await llm_service.aevaluate_answer(
+            question=question,
+            student_answer=student_answer,
+            subject_id=request.subject_id,
+            question_id=request.question_id
+        )
+        
+        return EvaluationResponse(
+            evaluation=result["evaluation"],
+            score=result["score"],
+            subject_id=request.subject_id,
+            question_id=request.question_id,
+            score_details=result.get("score_details")
+        )
                 
+    except (HTTPException, LLMUnavailableError):
+        # ส่งต่อให้ exception handler ของแอป (LLMUnavailableError = 503)
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
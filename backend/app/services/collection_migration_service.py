@@ -0,0 +1,365 @@
+# backend/app/services/collection_migration_service.py
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import random
+import shutil
+import tempfile
+import statistics
+import subprocess
+from typing import List, Dict, Any
+import chromadb
+from .rag_service import COLLECTION_LAYOUTS, get_chroma_client, get_collection_name
+from .rag_service import get_question_key, get_chunk_id_prefix, get_lexical_index_path
+from .model_service import get_model_service
+from ..config import CHROMA_DB_DIRECTORY, INDEX_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+def _list_collection_names(client) -> List[str]:
+    """
+    ดึงชื่อ collection ทั้งหมด (รองรับทั้ง Chroma ที่คืนชื่อและคืน Collection)
+    
+    Args:
+        client: Chroma client
+    
+    Returns:
+        รายการชื่อ collection
+    """
+    return [item if isinstance(item, str) else item.name for item in client.list_collections()]
+
+def _convert_chunk_id(chunk_id: str, question_id: str, source_layout: str, target_layout: str) -> str:
+    """
+    แปลงรหัสชิ้นส่วนจากรูปแบบ collection หนึ่งไปอีกรูปแบบหนึ่ง
+    
+    Args:
+        chunk_id: รหัสชิ้นส่วนเดิม
+        question_id: รหัสคำถามของชิ้นส่วน
+        source_layout: รูปแบบ collection ต้นทาง
+        target_layout: รูปแบบ collection ปลายทาง
+    
+    Returns:
+        รหัสชิ้นส่วนในรูปแบบปลายทาง
+    """
+    source_prefix = get_chunk_id_prefix(question_id, source_layout)
+    if source_prefix and chunk_id.startswith(source_prefix):
+        chunk_id = chunk_id[len(source_prefix):]
+    return get_chunk_id_prefix(question_id, target_layout) + chunk_id
+
+def _is_source_collection(collection, layout: str) -> bool:
+    """
+    ตรวจว่า collection เป็นของรูปแบบต้นทางหรือไม่ จากชื่อและ metadata ของชิ้นส่วนแรก
+    
+    Args:
+        collection: Chroma collection
+        layout: รูปแบบ collection ต้นทาง
+    
+    Returns:
+        True ถ้าเป็น collection เฉลยของรูปแบบต้นทาง
+    """
+    sample = collection.get(limit=1, include=["metadatas"])
+    if not sample["ids"]:
+        return False
+    metadata = sample["metadatas"][0] or {}
+    if "subject_id" not in metadata or "question_id" not in metadata:
+        return False
+    return collection.name == get_collection_name(metadata["subject_id"], metadata["question_id"], layout)
+
+def _list_questions(client) -> Dict[str, set]:
+    """
+    รวบรวมคำถามที่มีชิ้นส่วนเฉลยอยู่ แยกตามรูปแบบ collection
+    
+    Args:
+        client: Chroma client
+    
+    Returns:
+        dict ของรูปแบบ collection กับชุดของ (subject_id, question_id)
+    """
+    questions = {layout: set() for layout in COLLECTION_LAYOUTS}
+    for name in _list_collection_names(client):
+        collection = client.get_collection(name, embedding_function=None)
+        for layout in COLLECTION_LAYOUTS:
+            if not _is_source_collection(collection, layout):
+                continue
+            metadatas = collection.get(include=["metadatas"])["metadatas"]
+            questions[layout].update((metadata["subject_id"], metadata["question_id"]) for metadata in metadatas)
+    return questions
+
+def migrate_collections(
+    target_layout: str,
+    persist_directory: str = CHROMA_DB_DIRECTORY,
+    batch_size: int = INDEX_BATCH_SIZE,
+    delete_source: bool = False
+) -> Dict[str, Any]:
+    """
+    ย้ายชิ้นส่วนเฉลยระหว่างรูปแบบ collection โดยคัดลอกเวกเตอร์เดิม (ไม่ต้อง embed ใหม่)
+    
+    ชิ้นส่วนเดิมของคำถามใน collection ปลายทางจะถูกแทนที่ (เขียนชิ้นส่วนใหม่ก่อนแล้วจึงลบชิ้นส่วนที่ค้าง) และไฟล์ lexical index ของคำถามที่ย้าย
+    จะถูกลบเพื่อสร้างใหม่จากรหัสชิ้นส่วนใหม่ตอนใช้งานครั้งแรก
+    
+    Args:
+        target_layout: รูปแบบ collection ปลายทาง ("question" หรือ "subject")
+        persist_directory: โฟลเดอร์ที่ใช้เก็บข้อมูล ChromaDB
+        batch_size: จำนวนชิ้นส่วนที่อ่านและเขียนต่อครั้ง
+        delete_source: ลบ collection ต้นทางหลังย้ายเสร็จ
+    
+    Returns:
+        dict ของจำนวน collection, คำถาม และชิ้นส่วนที่ย้าย และเวลาที่ใช้
+    """
+    if target_layout not in COLLECTION_LAYOUTS:
+        raise ValueError(f"ไม่รองรับ COLLECTION_LAYOUT: {target_layout}")
+    source_layout = next(layout for layout in COLLECTION_LAYOUTS if layout != target_layout)
+    
+    started = time.perf_counter()
+    client = get_chroma_client(persist_directory)
+    migrated_questions = set()
+    migrated_collections = 0
+    migrated_chunks = 0
+    
+    for name in _list_collection_names(client):
+        source = client.get_collection(name, embedding_function=None)
+        if not _is_source_collection(source, source_layout):
+            continue
+        
+        # รหัสชิ้นส่วนที่เขียนลง collection ปลายทางของแต่ละคำถามใน collection ต้นทางนี้
+        copied = {}
+        for offset in range(0, source.count(), batch_size):
+            stored = source.get(offset=offset, limit=batch_size, include=["embeddings", "documents", "metadatas"])
+            
+            # จัดกลุ่มชิ้นส่วนตาม collection ปลายทาง
+            batches = {}
+            for chunk_id, embedding, text, metadata in zip(
+                stored["ids"], stored["embeddings"], stored["documents"], stored["metadatas"]
+            ):
+                subject_id, question_id = metadata["subject_id"], metadata["question_id"]
+                target_name = get_collection_name(subject_id, question_id, target_layout)
+                target_id = _convert_chunk_id(chunk_id, question_id, source_layout, target_layout)
+                copied.setdefault((subject_id, question_id), (target_name, set()))[1].add(target_id)
+                
+                batch = batches.setdefault(target_name, {"ids": [], "embeddings": [], "documents": [], "metadatas": []})
+                batch["ids"].append(target_id)
+                batch["embeddings"].append(embedding)
+                batch["documents"].append(text)
+                batch["metadatas"].append(metadata)
+            
+            for target_name, batch in batches.items():
+                client.get_or_create_collection(target_name, embedding_function=None).upsert(**batch)
+                migrated_chunks += len(batch["ids"])
+        
+        # เขียนชิ้นส่วนใหม่ครบแล้วจึงลบชิ้นส่วนเดิมของคำถามใน collection ปลายทางที่ไม่ได้มาจากการคัดลอกนี้
+        # (ผู้ค้นหาระหว่างย้ายจึงเห็นชิ้นส่วนของคำถามเสมอ)
+        for (subject_id, question_id), (target_name, target_ids) in copied.items():
+            target = client.get_collection(target_name, embedding_function=None)
+            existing = target.get(where={"$and": [
+                {"subject_id": {"$eq": subject_id}},
+                {"question_id": {"$eq": question_id}}
+            ]}, include=[])["ids"]
+            stale_ids = [chunk_id for chunk_id in existing if chunk_id not in target_ids]
+            if stale_ids:
+                target.delete(ids=stale_ids)
+            
+            question_key = get_question_key(subject_id, question_id)
+            migrated_questions.add(question_key)
+            
+            # ลบไฟล์ lexical index ทุกรุ่นของคำถาม (รุ่นเก่าที่ไม่มี manifest และรุ่นที่ระบุ generation)
+            legacy_path = get_lexical_index_path(persist_directory, question_key)
+            for lexical_path in [legacy_path] + glob.glob(legacy_path[:-len(".json")] + ".*.json"):
+                if os.path.exists(lexical_path):
+                    os.remove(lexical_path)
+        
+        migrated_collections += 1
+        logger.info("ย้าย collection %s แล้ว (%d ชิ้นส่วน, %d คำถาม)", name, migrated_chunks, len(migrated_questions))
+        if delete_source:
+            client.delete_collection(name)
+    
+    return {
+        "source_layout": source_layout,
+        "target_layout": target_layout,
+        "collections": migrated_collections,
+        "questions": len(migrated_questions),
+        "chunks": migrated_chunks,
+        "seconds": time.perf_counter() - started
+    }
+
+# สคริปต์วัดเวลาเปิด client ใหม่ใน process แยก: เปิด collection และค้นหาครั้งแรก (โหลด index จากดิสก์)
+_COLD_START_SCRIPT = """
+import json, sys, time
+import chromadb
+request = json.load(sys.stdin)
+started = time.perf_counter()
+client = chromadb.PersistentClient(path=request["path"])
+collection = client.get_collection(request["collection"], embedding_function=None)
+collection.query(query_embeddings=[request["embedding"]], n_results=1, where=request["where"], include=[])
+print(json.dumps({"seconds": time.perf_counter() - started}))
+"""
+
+def _measure_cold_start(persist_directory: str, collection_name: str, embedding: List[float], where) -> float:
+    """
+    วัดเวลาตั้งแต่เปิด Chroma client ใหม่จนค้นหาครั้งแรกเสร็จ ใน process แยก (client ใน process นี้ถูกใช้ร่วมกันจึงอุ่นแล้ว)
+    
+    Args:
+        persist_directory: โฟลเดอร์ที่ใช้เก็บข้อมูล ChromaDB
+        collection_name: ชื่อ collection ที่ค้นหา
+        embedding: เวกเตอร์ของคำค้นหา
+        where: เงื่อนไข metadata ของการค้นหา
+        
+    Returns:
+        เวลาที่ใช้ (มิลลิวินาที)
+    """
+    request = {"path": os.path.abspath(persist_directory), "collection": collection_name, "embedding": embedding, "where": where}
+    completed = subprocess.run(
+        [sys.executable, "-c", _COLD_START_SCRIPT],
+        input=json.dumps(request),
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])["seconds"] * 1000
+
+def _get_catalog_size(persist_directory: str) -> int:
+    """
+    ขนาดของไฟล์ catalog ของ Chroma (chroma.sqlite3) ในหน่วยไบต์
+    
+    Args:
+        persist_directory: โฟลเดอร์ที่ใช้เก็บข้อมูล ChromaDB
+        
+    Returns:
+        ขนาดไฟล์ หรือ 0 ถ้าไม่พบ
+    """
+    path = os.path.join(persist_directory, "chroma.sqlite3")
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+def _copy_layout(client, layout: str, persist_directory: str, batch_size: int = INDEX_BATCH_SIZE) -> set:
+    """
+    คัดลอก collection เฉลยของรูปแบบหนึ่ง (พร้อมเวกเตอร์เดิม) ไปยังโฟลเดอร์ ChromaDB ใหม่
+    
+    Args:
+        client: Chroma client ต้นทาง
+        layout: รูปแบบ collection ที่คัดลอก
+        persist_directory: โฟลเดอร์ปลายทาง
+        batch_size: จำนวนชิ้นส่วนที่อ่านและเขียนต่อครั้ง
+        
+    Returns:
+        ชุดของชื่อ collection ที่คัดลอก
+    """
+    target_client = chromadb.PersistentClient(path=persist_directory)
+    copied = set()
+    for name in _list_collection_names(client):
+        source = client.get_collection(name, embedding_function=None)
+        if not _is_source_collection(source, layout):
+            continue
+        target = target_client.get_or_create_collection(name, metadata=source.metadata, embedding_function=None)
+        for offset in range(0, source.count(), batch_size):
+            stored = source.get(offset=offset, limit=batch_size, include=["embeddings", "documents", "metadatas"])
+            target.upsert(
+                ids=stored["ids"],
+                embeddings=stored["embeddings"],
+                documents=stored["documents"],
+                metadatas=stored["metadatas"]
+            )
+        copied.add(name)
+    return copied
+
+def benchmark_layouts(
+    persist_directory: str = CHROMA_DB_DIRECTORY,
+    queries: List[str] = None,
+    sample_questions: int = 20,
+    k: int = 4,
+    cold_start_samples: int = 5
+) -> Dict[str, Dict[str, float]]:
+    """
+    วัดเวลาค้นหาของแต่ละรูปแบบ collection ด้วยคำถามชุดเดียวกัน
+    
+    ค้นหาผ่าน Chroma โดยตรง (ไม่ผ่าน exact index หรือ hybrid retrieval ของ AnswerEvaluationService)
+    เพื่อให้ผลต่างมาจากรูปแบบ collection เท่านั้น แต่ละรูปแบบถูกคัดลอกไปยังโฟลเดอร์ชั่วคราวของตัวเอง
+    ขนาด catalog และเวลาเปิด client ใหม่ (ค่ามัธยฐานจากหลายครั้ง ใน process แยก) จึงวัดจากข้อมูลของรูปแบบนั้นเท่านั้น
+    
+    ใช้หลังย้ายข้อมูลโดยยังไม่ลบ collection ต้นทาง เพื่อให้ทั้งสองรูปแบบมีข้อมูลครบ
+    
+    Args:
+        persist_directory: โฟลเดอร์ที่ใช้เก็บข้อมูล ChromaDB
+        queries: คำค้นหาที่ใช้วัด
+        sample_questions: จำนวนคำถามที่สุ่มมาวัด
+        k: จำนวนเอกสารที่ค้นหาต่อครั้ง
+        cold_start_samples: จำนวนครั้งที่วัดเวลาเปิด client ใหม่
+    
+    Returns:
+        dict ของรูปแบบ collection กับจำนวนคำถาม จำนวน collection, ขนาด catalog (ไบต์),
+        ค่ามัธยฐานของเวลาเปิด client ใหม่จนค้นหาครั้งแรกเสร็จ และเวลาค้นหาเฉลี่ย/p95 (มิลลิวินาที)
+    """
+    queries = queries or ["หลักการออกแบบซอฟต์แวร์", "ข้อดีและข้อเสีย", "ยกตัวอย่างประกอบ"]
+    client = get_chroma_client(persist_directory)
+    embeddings = [get_model_service().get_embeddings().embed_query(query) for query in queries]
+    
+    # สุ่มคำถามที่มีข้อมูลในทั้งสองรูปแบบ
+    questions_by_layout = _list_questions(client)
+    questions = sorted(set.intersection(*questions_by_layout.values()))
+    questions = random.Random(0).sample(questions, min(sample_questions, len(questions)))
+    
+    results = {}
+    for layout in COLLECTION_LAYOUTS:
+        layout_directory = tempfile.mkdtemp(prefix=f"chroma_{layout}_")
+        try:
+            collection_names = _copy_layout(client, layout, layout_directory)
+            layout_client = chromadb.PersistentClient(path=layout_directory)
+            catalog_bytes = _get_catalog_size(layout_directory)
+        
+            cold_starts = []
+            timings = []
+            for subject_id, question_id in questions:
+                collection_name = get_collection_name(subject_id, question_id, layout)
+                where = {"$and": [
+                    {"subject_id": {"$eq": subject_id}},
+                    {"question_id": {"$eq": question_id}}
+                ]} if layout == "subject" else None
+            
+                if not cold_starts:
+                    cold_starts = [
+                        _measure_cold_start(layout_directory, collection_name, embeddings[0], where)
+                        for _ in range(cold_start_samples)
+                    ]
+            
+                collection = layout_client.get_collection(collection_name, embedding_function=None)
+                for embedding in embeddings:
+                    started = time.perf_counter()
+                    collection.query(query_embeddings=[embedding], n_results=k, where=where, include=["documents", "metadatas"])
+                    timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            shutil.rmtree(layout_directory, ignore_errors=True)
+        
+        timings.sort()
+        logger.info("วัดรูปแบบ %s แล้ว (%d การค้นหา)", layout, len(timings))
+        results[layout] = {
+            "questions": len(questions_by_layout[layout]),
+            "collections": len(collection_names),
+            "catalog_bytes": catalog_bytes,
+            "searches": len(timings),
+            "cold_start_ms": statistics.median(cold_starts) if cold_starts else 0.0,
+            "mean_ms": sum(timings) / len(timings) if timings else 0.0,
+            "p95_ms": timings[int(len(timings) * 0.95)] if timings else 0.0
+        }
+    return results
+
+if __name__ == "__main__":
+    # ย้ายข้อมูล: python -m app.services.collection_migration_service subject [--delete-source] [--benchmark]
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="ย้ายชิ้นส่วนเฉลยระหว่างรูปแบบ collection ของ ChromaDB")
+    parser.add_argument("target_layout", choices=COLLECTION_LAYOUTS)
+    parser.add_argument("--persist-directory", default=CHROMA_DB_DIRECTORY)
+    parser.add_argument("--batch-size", type=int, default=INDEX_BATCH_SIZE)
+    parser.add_argument("--delete-source", action="store_true", help="ลบ collection ต้นทางหลังย้ายเสร็จ")
+    parser.add_argument("--benchmark", action="store_true", help="วัดเวลาค้นหาของทั้งสองรูปแบบหลังย้าย")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    
+    result = migrate_collections(args.target_layout, args.persist_directory, args.batch_size, args.delete_source)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+    
+    if args.benchmark:
+        for layout, stats in benchmark_layouts(args.persist_directory).items():
+            print(f"{layout}: " + ", ".join(f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}" for key, value in stats.items()))
@@ -0,0 +1,123 @@
+# backend/app/services/context_service.py
+import math
+from typing import List, Optional
+from langchain_core.documents import Document
+
+def estimate_tokens(text: str, chars_per_token: float = 2.0) -> int:
+    """
+    ประมาณจำนวน token ของข้อความ
+    
+    ใช้อัตราส่วนตัวอักษรต่อ token แบบคงที่ เพราะ tokenizer ของโมเดลบน Groq ไม่มีให้ใช้แบบออฟไลน์
+    
+    Args:
+        text: ข้อความ
+        chars_per_token: จำนวนตัวอักษรเฉลี่ยต่อ token
+    
+    Returns:
+        จำนวน token โดยประมาณ
+    """
+    return math.ceil(len(text) / chars_per_token)
+
+def _merge_spans(left, right):
+    """
+    รวมช่วงข้อความสองช่วงของเอกสารเดียวกันที่ซ้อนทับหรือติดกัน
+    
+    Args:
+        left: ช่วงที่เริ่มก่อน (dict ที่มี start, end, text, rank)
+        right: ช่วงที่เริ่มทีหลัง
+    
+    Returns:
+        ช่วงใหม่ที่ครอบคลุมทั้งสองช่วง
+    """
+    text = left["text"]
+    if right["end"] > left["end"]:
+        text += right["text"][left["end"] - right["start"]:]
+    return {
+        "start": left["start"],
+        "end": max(left["end"], right["end"]),
+        "text": text,
+        "rank": min(left["rank"], right["rank"])
+    }
+
+def _add_span(spans, span):
+    """
+    เพิ่มช่วงข้อความลงในรายการ โดยรวมกับช่วงที่ซ้อนทับหรือติดกัน
+    
+    Args:
+        spans: รายการช่วงของเอกสารเดียวกัน
+        span: ช่วงที่ต้องการเพิ่ม
+    
+    Returns:
+        รายการช่วงใหม่
+    """
+    merged = span
+    remaining = []
+    for existing in spans:
+        if existing["start"] <= merged["end"] and merged["start"] <= existing["end"]:
+            if existing["start"] <= merged["start"]:
+                merged = _merge_spans(existing, merged)
+            else:
+                merged = _merge_spans(merged, existing)
+        else:
+            remaining.append(existing)
+    remaining.append(merged)
+    return remaining
+
+def pack_context(
+    context_docs: List[Document],
+    token_budget: int,
+    chars_per_token: float = 2.0,
+    separator: str = "\n\n"
+) -> str:
+    """
+    รวมชิ้นส่วนเฉลยเป็นบริบทภายในงบ token
+    
+    ชิ้นส่วนของเอกสารเดียวกันที่ซ้อนทับหรือติดกัน (ตาม start_index) จะถูกรวมเป็นช่วงเดียว
+    เพื่อตัดข้อความที่ซ้ำจาก chunk_overlap ทิ้ง ชิ้นส่วนจะถูกเพิ่มตามลำดับความเกี่ยวข้อง
+    และข้ามชิ้นที่ทำให้เกินงบ
+    
+    Args:
+        context_docs: ชิ้นส่วนเฉลยเรียงตามความเกี่ยวข้อง
+        token_budget: จำนวน token สูงสุดของบริบท
+        chars_per_token: จำนวนตัวอักษรเฉลี่ยต่อ token
+        separator: ข้อความคั่นระหว่างช่วง
+    
+    Returns:
+        บริบทที่รวมเป็นข้อความเดียว
+    """
+    groups = {}
+    used_tokens = 0
+    
+    for rank, doc in enumerate(context_docs):
+        start_index: Optional[int] = doc.metadata.get("start_index")
+        if start_index is None:
+            # ไม่รู้ตำแหน่งในเอกสาร ใช้ข้อความเป็นตัวระบุแทน
+            group_key = ("text", doc.page_content)
+            start_index = 0
+        else:
+            group_key = (doc.metadata.get("source"), doc.metadata.get("fingerprint"))
+        
+        span = {
+            "start": start_index,
+            "end": start_index + len(doc.page_content),
+            "text": doc.page_content,
+            "rank": rank
+        }
+        spans = groups.get(group_key, [])
+        candidate = _add_span(spans, span)
+        
+        added_tokens = (
+            sum(estimate_tokens(item["text"], chars_per_token) for item in candidate)
+            - sum(estimate_tokens(item["text"], chars_per_token) for item in spans)
+        )
+        if used_tokens + added_tokens > token_budget:
+            continue
+        
+        groups[group_key] = candidate
+        used_tokens += added_tokens
+    
+    packed = sorted(
+        (span for spans in groups.values() for span in spans),
+        key=lambda span: span["rank"]
+    )
+    return separator.join(span["text"] for span in packed)
@@ -0,0 +1,155 @@
+# backend/app/services/embedding_batcher_service.py
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from typing import List, Dict
+from langchain_core.embeddings import Embeddings
+
+class MicroBatchingEmbeddings(Embeddings):
+    """
+    Embeddings ที่รวมคำค้นหาจากหลาย request ที่มาถึงใกล้กันเป็น batch เดียว
+    
+    คำค้นหาแรกจะเปิดหน้าต่างเวลา (max_wait_ms) คำค้นหาที่มาถึงภายในหน้าต่างนั้น
+    หรือจนครบ max_batch_size จะถูกคำนวณในการเรียก embed_documents ครั้งเดียว แล้วส่งเวกเตอร์กลับให้ผู้เรียกแต่ละราย
+    embed_documents ส่งต่อไปยังโมเดลโดยตรงเพราะเป็น batch อยู่แล้ว
+    """
+    
+    def __init__(self, embeddings: Embeddings, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        """
+        สร้าง embeddings แบบ micro-batching
+        
+        Args:
+            embeddings: Embeddings ที่ใช้คำนวณเวกเตอร์จริง
+            max_batch_size: จำนวนคำค้นหาสูงสุดต่อ batch
+            max_wait_ms: เวลารอคำค้นหาอื่นหลังคำค้นหาแรกของ batch (มิลลิวินาที)
+        """
+        self.embeddings = embeddings
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats = {"batches": 0, "queries": 0, "max_batch_size": 0}
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        แปลงข้อความหลายรายการเป็นเวกเตอร์
+        
+        Args:
+            texts: รายการข้อความ
+        
+        Returns:
+            รายการเวกเตอร์ตามลำดับของข้อความ
+        """
+        return self.embeddings.embed_documents(texts)
+    
+    def embed_query(self, text: str) -> List[float]:
+        """
+        แปลงคำค้นหาเป็นเวกเตอร์ โดยรวม batch กับคำค้นหาอื่นที่มาถึงพร้อมกัน
+        
+        Args:
+            text: คำค้นหา
+        
+        Returns:
+            เวกเตอร์ของคำค้นหา
+            
+        Raises:
+            RuntimeError: ถ้า batcher ถูกปิดแล้ว
+        """
+        future = Future()
+        with self._lock:
+            # ใส่คิวภายใต้ lock เดียวกับ close เพื่อไม่ให้มีคำค้นหาตามหลังสัญญาณหยุด
+            if self._closed:
+                raise RuntimeError("embedding batcher ถูกปิดแล้ว")
+            self._queue.put((text, future))
+        return future.result()
+    
+    def _collect_batch(self, first):
+        """
+        รวบรวมคำค้นหาที่มาถึงภายในหน้าต่างเวลา
+        
+        Args:
+            first: คำค้นหาแรกของ batch
+        
+        Returns:
+            Tuple (รายการคำค้นหา, ได้รับสัญญาณหยุดหรือไม่)
+        """
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+    
+    def _run(self):
+        """วนรับคำค้นหาจากคิวและคำนวณทีละ batch (ทำงานใน thread เบื้องหลัง)"""
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, stopping = self._collect_batch(first)
+            
+            # คำนวณข้อความที่ซ้ำกันใน batch เพียงครั้งเดียว
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                vectors = dict(zip(texts, self.embeddings.embed_documents(texts)))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            
+            for text, future in batch:
+                future.set_result(vectors[text])
+            
+            with self._lock:
+                self._stats["batches"] += 1
+                self._stats["queries"] += len(batch)
+                self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(batch))
+    
+    def get_stats(self) -> Dict[str, float]:
+        """
+        ดึงสถิติการรวม batch
+        
+        Returns:
+            dict ของจำนวน batch, จำนวนคำค้นหา, ขนาด batch เฉลี่ยและสูงสุด และความยาวคิว
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["average_batch_size"] = stats["queries"] / stats["batches"] if stats["batches"] else 0.0
+        stats["queue_size"] = self._queue.qsize()
+        return stats
+    
+    def close(self):
+        """
+        หยุด thread เบื้องหลังหลังคำนวณคำค้นหาที่ค้างอยู่
+        
+        คำค้นหาที่ยังเหลือในคิวหลัง thread หยุดจะได้รับ RuntimeError และคำค้นหาใหม่หลังปิดจะล้มเหลวทันที
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].set_exception(RuntimeError("embedding batcher ถูกปิดแล้ว"))
+
@@ -0,0 +1,215 @@
+# backend/app/services/embedding_cache_service.py
+import os
+import re
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import List, Dict, Optional
+from langchain_core.embeddings import Embeddings
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings ที่ cache เวกเตอร์ไว้ในหน่วยความจำ (LRU) และบนดิสก์ (SQLite)
+    
+    key ของ cache คือ SHA-256 ของชื่อโมเดลและข้อความที่ normalize แล้ว
+    embed_query และ embed_documents ใช้ cache ร่วมกัน เพราะโมเดลที่ใช้ไม่แยก prefix ของ query
+    """
+    
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_name: str,
+        max_size: int = 10000,
+        db_path: Optional[str] = None,
+        max_disk_entries: int = 100000
+    ):
+        """
+        สร้าง embeddings ที่มี cache
+        
+        Args:
+            embeddings: Embeddings ที่ใช้คำนวณเวกเตอร์จริง
+            model_name: ชื่อโมเดล (เป็นส่วนหนึ่งของ key)
+            max_size: จำนวนเวกเตอร์สูงสุดที่เก็บในหน่วยความจำ
+            db_path: พาธของไฟล์ SQLite (None = เก็บในหน่วยความจำอย่างเดียว)
+            max_disk_entries: จำนวนเวกเตอร์สูงสุดที่เก็บบนดิสก์
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_size = max_size
+        self.max_disk_entries = max_disk_entries
+        
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        
+        self._db = self._open_database(db_path) if db_path else None
+    
+    def _open_database(self, db_path):
+        """
+        เปิดฐานข้อมูล SQLite สำหรับเก็บเวกเตอร์
+        
+        Args:
+            db_path: พาธของไฟล์ SQLite
+        
+        Returns:
+            sqlite3 Connection
+        """
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        
+        db = sqlite3.connect(db_path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        db.commit()
+        return db
+    
+    def _make_key(self, text: str) -> str:
+        """
+        สร้าง key ของ cache จากชื่อโมเดลและข้อความ
+        
+        Args:
+            text: ข้อความ
+        
+        Returns:
+            SHA-256 hex digest
+        """
+        normalized = re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+        return hashlib.sha256(f"{self.model_name}\0{normalized}".encode("utf-8")).hexdigest()
+    
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        """
+        ค้นหาเวกเตอร์ใน cache (หน่วยความจำก่อน แล้วจึงดิสก์)
+        
+        Args:
+            keys: รายการ key
+        
+        Returns:
+            dict ของ key ที่พบกับเวกเตอร์
+        """
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+            self._stats["memory_hits"] += len(found)
+            
+            missing = [key for key in set(keys) if key not in found]
+            if self._db is not None and missing:
+                placeholders = ",".join("?" * len(missing))
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    missing
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+                    self._remember(key, found[key])
+                self._stats["disk_hits"] += len(rows)
+        return found
+    
+    def _remember(self, key: str, vector: List[float]):
+        """เก็บเวกเตอร์ใน cache หน่วยความจำ (เรียกภายใต้ lock)"""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+    
+    def _store(self, vectors: Dict[str, List[float]]):
+        """
+        เก็บเวกเตอร์ใหม่ลง cache ทั้งหน่วยความจำและดิสก์
+        
+        Args:
+            vectors: dict ของ key กับเวกเตอร์
+        """
+        with self._lock:
+            self._stats["misses"] += len(vectors)
+            for key, vector in vectors.items():
+                self._remember(key, vector)
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, array("f", vector).tobytes()) for key, vector in vectors.items()]
+                )
+                self._prune_database()
+                self._db.commit()
+    
+    def _prune_database(self):
+        """ลบเวกเตอร์ที่เขียนไว้นานที่สุดเมื่อเกินจำนวนสูงสุด (เรียกภายใต้ lock)"""
+        # rowid เพิ่มขึ้นตามลำดับการเขียน (INSERT OR REPLACE ได้ rowid ใหม่) จึงลบแถวที่ rowid ห่างจากล่าสุดเกินจำนวนสูงสุด
+        # ซึ่งใช้ดัชนีของ rowid โดยไม่ต้องนับทั้งตาราง (แถวที่เหลือจึงไม่เกิน max_disk_entries)
+        self._db.execute(
+            "DELETE FROM embeddings WHERE rowid <= (SELECT MAX(rowid) FROM embeddings) - ?",
+            (self.max_disk_entries,)
+        )
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        แปลงข้อความหลายรายการเป็นเวกเตอร์ โดยคำนวณเฉพาะข้อความที่ไม่อยู่ใน cache
+        
+        Args:
+            texts: รายการข้อความ
+        
+        Returns:
+            รายการเวกเตอร์ตามลำดับของข้อความ
+        """
+        keys = [self._make_key(text) for text in texts]
+        found = self._lookup(keys)
+        
+        # คำนวณข้อความที่ไม่พบใน cache ในการเรียกครั้งเดียว
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = {key: [float(x) for x in vector] for key, vector in zip(missing.keys(), vectors)}
+            self._store(computed)
+            found.update(computed)
+        
+        return [found[key] for key in keys]
+    
+    def embed_query(self, text: str) -> List[float]:
+        """
+        แปลงคำค้นหาเป็นเวกเตอร์
+        
+        Args:
+            text: คำค้นหา
+        
+        Returns:
+            เวกเตอร์ของคำค้นหา
+        """
+        key = self._make_key(text)
+        found = self._lookup([key])
+        if key in found:
+            return found[key]
+        
+        vector = [float(x) for x in self.embeddings.embed_query(text)]
+        self._store({key: vector})
+        return vector
+    
+    def get_stats(self) -> Dict[str, float]:
+        """
+        ดึงสถิติการใช้งาน cache
+        
+        Returns:
+            dict ของจำนวน hit/miss, อัตรา hit และขนาด cache ในหน่วยความจำ
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_size"] = len(self._memory)
+        total = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / total if total else 0.0
+        return stats
+    
+    def close(self):
+        """ปิดฐานข้อมูล SQLite"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,112 @@
+# backend/app/services/exact_search_service.py
+import numpy as np
+from typing import List, Dict, Any, Optional
+from langchain_core.documents import Document
+
+class ExactSearchIndex:
+    """
+    ดัชนีค้นหาแบบ exact ในหน่วยความจำสำหรับ collection ขนาดเล็ก
+    
+    เก็บเวกเตอร์ที่ normalize แล้วของชิ้นส่วนเฉลยทั้งหมดเป็น matrix float32 ต่อเนื่อง
+    ค้นหา top-k ด้วยการคูณ matrix-vector ครั้งเดียวแล้วใช้ argpartition
+    (cosine similarity เท่ากับ dot product เมื่อเวกเตอร์ normalize แล้ว)
+    """
+    
+    def __init__(self, ids: List[str], matrix: np.ndarray, documents: List[str], metadatas: List[Dict[str, Any]]):
+        """
+        สร้างดัชนีจากข้อมูลที่เตรียมไว้แล้ว
+        
+        Args:
+            ids: รหัสของชิ้นส่วน
+            matrix: matrix float32 ของเวกเตอร์ที่ normalize แล้ว (แถวละหนึ่งชิ้นส่วน)
+            documents: ข้อความของชิ้นส่วน
+            metadatas: metadata ของชิ้นส่วน
+        """
+        self.ids = ids
+        self.matrix = matrix
+        self.documents = documents
+        self.metadatas = metadatas
+    
+    @classmethod
+    def build(cls, ids: List[str], embeddings, documents: List[str], metadatas: List[Optional[Dict[str, Any]]]) -> "ExactSearchIndex":
+        """
+        สร้างดัชนีจากเวกเตอร์ของชิ้นส่วน
+        
+        Args:
+            ids: รหัสของชิ้นส่วน
+            embeddings: เวกเตอร์ของชิ้นส่วน (list หรือ numpy array)
+            documents: ข้อความของชิ้นส่วน
+            metadatas: metadata ของชิ้นส่วน
+        
+        Returns:
+            ExactSearchIndex
+        """
+        if not ids:
+            return cls([], np.zeros((0, 0), dtype=np.float32), [], [])
+        
+        matrix = np.ascontiguousarray(np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms > 0, norms, 1.0)
+        return cls(list(ids), matrix, list(documents), [metadata or {} for metadata in metadatas])
+    
+    @classmethod
+    def from_vector_store(cls, vector_store, where: Optional[Dict[str, Any]] = None) -> "ExactSearchIndex":
+        """
+        โหลดเวกเตอร์ของชิ้นส่วนเฉลยจาก Chroma
+        
+        Args:
+            vector_store: Chroma vector store ของคำถาม
+            where: เงื่อนไข metadata สำหรับเลือกชิ้นส่วน (None = ทั้ง collection)
+        
+        Returns:
+            ExactSearchIndex
+        """
+        stored = vector_store.get(where=where, include=["embeddings", "documents", "metadatas"])
+        return cls.build(stored["ids"], stored["embeddings"], stored["documents"], stored["metadatas"])
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    def search_with_scores(self, embedding: List[float], k: int = 4):
+        """
+        ค้นหาชิ้นส่วนที่ใกล้เคียงกับเวกเตอร์คำค้นหามากที่สุด
+        
+        Args:
+            embedding: เวกเตอร์ของคำค้นหา
+            k: จำนวนผลลัพธ์
+        
+        Returns:
+            รายการ (ตำแหน่งแถว, cosine similarity) เรียงจากมากไปน้อย
+        """
+        if not self.ids or k <= 0:
+            return []
+        
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+        
+        scores = self.matrix @ query
+        k = min(k, len(scores))
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(row), float(scores[row])) for row in top]
+    
+    def search(self, embedding: List[float], k: int = 4) -> List[Document]:
+        """
+        ค้นหาเอกสารที่เกี่ยวข้องด้วยเวกเตอร์คำค้นหา
+        
+        Args:
+            embedding: เวกเตอร์ของคำค้นหา
+            k: จำนวนเอกสารที่ต้องการ
+        
+        Returns:
+            รายการ Document เรียงตามความเกี่ยวข้อง
+        """
+        return [
+            Document(page_content=self.documents[row], metadata=self.metadatas[row], id=self.ids[row])
+            for row, _ in self.search_with_scores(embedding, k)
+        ]
@@ -0,0 +1,80 @@
+# backend/app/services/executor_service.py
+import asyncio
+import functools
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Optional
+from ..config import BLOCKING_EXECUTOR_WORKERS, PROCESS_EXECUTOR_WORKERS
+
+# ThreadPoolExecutor ที่ใช้ร่วมกันทั้ง process สำหรับงานที่ block event loop
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+# ProcessPoolExecutor ที่ใช้ร่วมกันทั้ง process สำหรับงาน CPU-bound ขนาดใหญ่ (เช่น สกัดข้อความจาก PDF หลายร้อยหน้า)
+_process_executor: Optional[ProcessPoolExecutor] = None
+_process_executor_lock = threading.Lock()
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    ดึง executor สำหรับงานที่ block (embedding, PDF, HTTP แบบ sync)
+    
+    Returns:
+        ThreadPoolExecutor ที่จำกัดจำนวน worker
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=BLOCKING_EXECUTOR_WORKERS,
+                    thread_name_prefix="blocking"
+                )
+    return _executor
+
+def get_process_executor() -> ProcessPoolExecutor:
+    """
+    ดึง process pool สำหรับงาน CPU-bound ที่แบ่งทำขนานกันได้
+    
+    ใช้ spawn แทน fork เพราะ process หลักมีหลาย thread (event loop, executor, โมเดล)
+    
+    Returns:
+        ProcessPoolExecutor ที่จำกัดจำนวน worker
+    """
+    global _process_executor
+    if _process_executor is None:
+        with _process_executor_lock:
+            if _process_executor is None:
+                _process_executor = ProcessPoolExecutor(
+                    max_workers=PROCESS_EXECUTOR_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+    return _process_executor
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    เรียกฟังก์ชันที่ block ใน executor โดยไม่ block event loop
+    
+    Args:
+        func: ฟังก์ชันที่ต้องการเรียก
+        *args: arguments ของฟังก์ชัน
+        **kwargs: keyword arguments ของฟังก์ชัน
+    
+    Returns:
+        ผลลัพธ์ของฟังก์ชัน
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+def shutdown_executor():
+    """ปิด executor และ process pool ที่ใช้ร่วมกัน"""
+    global _executor, _process_executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+    
+    with _process_executor_lock:
+        if _process_executor is not None:
+            _process_executor.shutdown(wait=True)
+            _process_executor = None
@@ -0,0 +1,167 @@
+# backend/app/services/fake_llm_service.py
+import time
+import random
+import asyncio
+import hashlib
+from typing import Any, Iterator, AsyncIterator, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from .context_service import estimate_tokens
+
+class FakeGradingChatModel(BaseChatModel):
+    """
+    LLM จำลองสำหรับทดสอบภาระงานแบบออฟไลน์
+    
+    ตอบด้วยข้อความตามรูปแบบเกณฑ์การให้คะแนน โดยคะแนนกำหนดจาก hash ของ prompt
+    (prompt เดียวกันได้คำตอบเดียวกันเสมอ) และจำลองเวลาตอบสนองด้วย
+    latency ก่อน token แรก (สุ่มแบบ normal จาก seed ของ prompt) และอัตรา token ต่อวินาที
+    """
+    
+    model_name: str = "fake-grading-model"
+    temperature: float = 0.0
+    latency_ms: float = 500.0
+    latency_jitter_ms: float = 100.0
+    tokens_per_second: float = 0.0
+    chars_per_token: float = 2.0
+    max_tokens: Optional[int] = None
+    
+    @property
+    def _llm_type(self) -> str:
+        return "fake-grading"
+    
+    def _seed(self, messages: List[BaseMessage]) -> int:
+        """
+        สร้าง seed จาก prompt
+        
+        Args:
+            messages: ข้อความของ prompt
+        
+        Returns:
+            seed สำหรับสุ่มคะแนนและ latency
+        """
+        text = "\0".join(str(message.content) for message in messages)
+        return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    
+    def _build_response(self, rng: random.Random, max_tokens: Optional[int]) -> str:
+        """
+        สร้างคำตอบตามรูปแบบเกณฑ์การให้คะแนน
+        
+        Args:
+            rng: ตัวสุ่มที่ seed จาก prompt
+            max_tokens: จำนวน token สูงสุดของคำตอบ
+        
+        Returns:
+            ข้อความคำตอบ
+        """
+        item_scores = [rng.randint(4, 10) for _ in range(4)]
+        lines = [f"คะแนนเต็ม: {sum(item_scores)}/40", f"ข้อล่ะ {round(sum(item_scores) / 4)}/10", ""]
+        for number, item_score in enumerate(item_scores, start=1):
+            lines += [
+                f"{number}. ข้อที่ {number}",
+                "คำตอบนักศึกษา: (คำตอบจำลอง)",
+                "เฉลยอาจารย์: (เฉลยจำลอง)",
+                "การประเมิน: คำตอบครอบคลุมประเด็นหลักบางส่วนตามเฉลย",
+                f"คะแนน: {item_score}/10",
+                ""
+            ]
+        lines += ["## สรุปเหตุผลการให้คะแนน:", "คำตอบจำลองสำหรับทดสอบภาระงาน"]
+        response = "\n".join(lines)
+        
+        if max_tokens is not None:
+            response = response[:int(max_tokens * self.chars_per_token)]
+        return response
+    
+    def _finish_reason(self, response: str, **kwargs: Any) -> str:
+        """
+        เหตุผลที่หยุดตอบแบบเดียวกับ API จริง ("length" เมื่อคำตอบถูกตัดที่ max_tokens)
+        
+        Args:
+            response: คำตอบที่สร้าง
+            
+        Returns:
+            "length" หรือ "stop"
+        """
+        max_tokens = kwargs.get("max_tokens", self.max_tokens)
+        if max_tokens is not None and len(response) >= int(max_tokens * self.chars_per_token):
+            return "length"
+        return "stop"
+    
+    def _plan(self, messages: List[BaseMessage], **kwargs: Any):
+        """
+        กำหนดคำตอบและเวลาตอบสนองของ prompt
+        
+        Args:
+            messages: ข้อความของ prompt
+        
+        Returns:
+            Tuple (คำตอบ, latency ก่อน token แรกเป็นวินาที, เวลาต่อ token เป็นวินาที)
+        """
+        rng = random.Random(self._seed(messages))
+        response = self._build_response(rng, kwargs.get("max_tokens", self.max_tokens))
+        latency = max(0.0, rng.gauss(self.latency_ms, self.latency_jitter_ms)) / 1000.0
+        token_delay = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        return response, latency, token_delay
+    
+    def _usage(self, messages: List[BaseMessage], response: str):
+        """
+        คำนวณการใช้ token โดยประมาณ
+        
+        Returns:
+            dict ของ usage_metadata
+        """
+        input_tokens = sum(estimate_tokens(str(message.content), self.chars_per_token) for message in messages)
+        output_tokens = estimate_tokens(response, self.chars_per_token)
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens
+        }
+    
+    def _split_tokens(self, response: str) -> List[str]:
+        """แบ่งคำตอบเป็นส่วนตามจำนวนตัวอักษรต่อ token"""
+        size = max(1, int(self.chars_per_token))
+        return [response[i:i + size] for i in range(0, len(response), size)]
+    
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        response, latency, token_delay = self._plan(messages, **kwargs)
+        time.sleep(latency + token_delay * estimate_tokens(response, self.chars_per_token))
+        message = AIMessage(
+            content=response,
+            usage_metadata=self._usage(messages, response),
+            response_metadata={"finish_reason": self._finish_reason(response, **kwargs)}
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+    
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        response, latency, token_delay = self._plan(messages, **kwargs)
+        await asyncio.sleep(latency + token_delay * estimate_tokens(response, self.chars_per_token))
+        message = AIMessage(
+            content=response,
+            usage_metadata=self._usage(messages, response),
+            response_metadata={"finish_reason": self._finish_reason(response, **kwargs)}
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+    
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        response, latency, token_delay = self._plan(messages, **kwargs)
+        time.sleep(latency)
+        for token in self._split_tokens(response):
+            if token_delay:
+                time.sleep(token_delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        yield ChatGenerationChunk(
+            message=AIMessageChunk(content="", response_metadata={"finish_reason": self._finish_reason(response, **kwargs)})
+        )
+    
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        response, latency, token_delay = self._plan(messages, **kwargs)
+        await asyncio.sleep(latency)
+        for token in self._split_tokens(response):
+            if token_delay:
+                await asyncio.sleep(token_delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        yield ChatGenerationChunk(
+            message=AIMessageChunk(content="", response_metadata={"finish_reason": self._finish_reason(response, **kwargs)})
+        )
+
@@ -0,0 +1,146 @@
+# backend/app/services/ingestion_service.py
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
+from .rag_service import validate_question_ids
+from ..config import INGESTION_WORKERS, INGESTION_JOB_HISTORY
+
+class IngestionService:
+    """
+    คิวงาน index เฉลยแบบเบื้องหลัง พร้อมสถานะและความคืบหน้าของแต่ละงาน
+    """
+    
+    def __init__(self, rag_service, workers: int = INGESTION_WORKERS, max_jobs: int = INGESTION_JOB_HISTORY):
+        """
+        สร้างคิวงาน index เฉลย
+        
+        Args:
+            rag_service: AnswerEvaluationService สำหรับ index เฉลย
+            workers: จำนวน worker ที่ index พร้อมกัน
+            max_jobs: จำนวนงานที่เก็บสถานะไว้สูงสุด (งานที่เสร็จแล้วเก่าที่สุดจะถูกลบก่อน)
+        """
+        self.rag_service = rag_service
+        self.max_jobs = max_jobs
+        
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingestion")
+    
+    def submit(self, answer_key_content: bytes, subject_id: str, question_id: str, file_name: str):
+        """
+        ส่งเฉลยเข้าคิวเพื่อ index
+        
+        Args:
+            answer_key_content: เนื้อหาของเฉลย (ไฟล์ PDF)
+            subject_id: รหัสวิชา
+            question_id: รหัสคำถาม
+            file_name: ชื่อไฟล์
+        
+        Returns:
+            Tuple (job_id, Future ของจำนวนชิ้นส่วนที่แบ่งได้)
+            
+        Raises:
+            ValueError: ถ้ารหัสวิชาหรือรหัสคำถามไม่ถูกต้อง
+        """
+        # ตรวจรหัสก่อนเข้าคิว เพื่อให้ผู้เรียกได้รับข้อผิดพลาดทันที
+        validate_question_ids(subject_id, question_id)
+        
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "stage": None,
+            "total_chunks": None,
+            "file_name": file_name,
+            "subject_id": subject_id,
+            "question_id": question_id,
+            "chunks": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now
+        }
+        
+        with self._lock:
+            self._jobs[job_id] = job
+            self._prune_jobs()
+        
+        future = self._executor.submit(
+            self._run_job, job_id, answer_key_content, subject_id, question_id, file_name
+        )
+        return job_id, future
+    
+    def _run_job(self, job_id, answer_key_content, subject_id, question_id, file_name):
+        """
+        index เฉลยใน worker thread และบันทึกสถานะของงาน
+        
+        Returns:
+            จำนวนชิ้นส่วนที่แบ่งได้
+        """
+        self._update_job(job_id, status="running")
+        
+        def report(stage, **info):
+            self._update_job(job_id, stage=stage, **info)
+        
+        try:
+            chunks = self.rag_service.index_answer_key(
+                answer_key_content=answer_key_content,
+                subject_id=subject_id,
+                question_id=question_id,
+                file_name=file_name,
+                progress_callback=report
+            )
+        except Exception as e:
+            self._update_job(job_id, status="failed", error=str(e))
+            raise
+        
+        self._update_job(job_id, status="completed", chunks=chunks)
+        return chunks
+    
+    def _update_job(self, job_id, **fields):
+        """อัปเดตสถานะของงาน"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+                job["updated_at"] = time.time()
+    
+    def _prune_jobs(self):
+        """ลบสถานะของงานที่เสร็จแล้วเก่าที่สุดเมื่อเกินจำนวนสูงสุด (เรียกภายใต้ lock)"""
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in ("completed", "failed")]
+        for job_id in finished[:max(0, len(self._jobs) - self.max_jobs)]:
+            del self._jobs[job_id]
+    
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        ดึงสถานะของงาน
+        
+        Args:
+            job_id: รหัสงาน
+        
+        Returns:
+            dict สถานะของงาน หรือ None ถ้าไม่พบ
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+    
+    def get_stats(self) -> Dict[str, int]:
+        """
+        ดึงจำนวนงานแยกตามสถานะ
+        
+        Returns:
+            dict ของสถานะกับจำนวนงาน
+        """
+        stats = {"queued": 0, "running": 0, "completed": 0, "failed": 0}
+        with self._lock:
+            for job in self._jobs.values():
+                stats[job["status"]] += 1
+        return stats
+    
+    def shutdown(self):
+        """รอให้งานที่ค้างอยู่เสร็จแล้วปิด worker"""
+        self._executor.shutdown(wait=True)
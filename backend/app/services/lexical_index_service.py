@@ -0,0 +1,164 @@
+# backend/app/services/lexical_index_service.py
+import os
+import json
+import math
+import tempfile
+import unicodedata
+from collections import Counter, defaultdict
+from typing import List, Dict, Tuple, Iterable
+from pythainlp.tokenize import word_tokenize
+
+def tokenize(text: str) -> List[str]:
+    """
+    ตัดคำข้อความภาษาไทยปนอังกฤษสำหรับ index แบบ lexical
+    
+    ภาษาไทยตัดคำด้วย newmm ส่วนภาษาอังกฤษแปลงเป็นตัวพิมพ์เล็ก และตัดเครื่องหมายวรรคตอนทิ้ง
+    
+    Args:
+        text: ข้อความ
+    
+    Returns:
+        รายการคำ
+    """
+    tokens = []
+    for token in word_tokenize(unicodedata.normalize("NFC", text), engine="newmm", keep_whitespace=False):
+        token = token.strip().lower()
+        if token and any(char.isalnum() for char in token):
+            tokens.append(token)
+    return tokens
+
+class BM25Index:
+    """
+    inverted index แบบ BM25 สำหรับชิ้นส่วนเฉลยของคำถามหนึ่งข้อ
+    """
+    
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        สร้าง index เปล่า
+        
+        Args:
+            k1: ค่าควบคุมผลของความถี่คำ
+            b: ค่าควบคุมผลของความยาวเอกสาร
+        """
+        self.k1 = k1
+        self.b = b
+        self.doc_ids: List[str] = []
+        self.doc_lengths: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+    
+    @classmethod
+    def build(cls, doc_ids: Iterable[str], texts: Iterable[str], **kwargs):
+        """
+        สร้าง index จากชิ้นส่วนเอกสาร
+        
+        Args:
+            doc_ids: รหัสของชิ้นส่วน (ตรงกับ id ใน ChromaDB)
+            texts: ข้อความของชิ้นส่วน
+        
+        Returns:
+            BM25Index
+        """
+        index = cls(**kwargs)
+        postings = defaultdict(list)
+        for position, (doc_id, text) in enumerate(zip(doc_ids, texts)):
+            term_counts = Counter(tokenize(text))
+            index.doc_ids.append(doc_id)
+            index.doc_lengths.append(sum(term_counts.values()))
+            for term, count in term_counts.items():
+                postings[term].append((position, count))
+        index.postings = dict(postings)
+        return index
+    
+    def search(self, query: str, k: int = 4) -> List[Tuple[str, float]]:
+        """
+        ค้นหาชิ้นส่วนที่มีคำตรงกับคำค้นหา
+        
+        Args:
+            query: คำค้นหา
+            k: จำนวนผลลัพธ์สูงสุด
+        
+        Returns:
+            รายการ (รหัสชิ้นส่วน, คะแนน BM25) เรียงจากคะแนนมากไปน้อย
+        """
+        doc_count = len(self.doc_ids)
+        if doc_count == 0:
+            return []
+        
+        average_length = sum(self.doc_lengths) / doc_count or 1.0
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            term_postings = self.postings.get(term)
+            if not term_postings:
+                continue
+            idf = math.log(1 + (doc_count - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+            for position, count in term_postings:
+                length_norm = 1 - self.b + self.b * self.doc_lengths[position] / average_length
+                scores[position] += idf * count * (self.k1 + 1) / (count + self.k1 * length_norm)
+        
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.doc_ids[position], score) for position, score in ranked]
+    
+    def save(self, path: str):
+        """
+        บันทึก index ลงไฟล์ JSON
+        
+        Args:
+            path: พาธของไฟล์
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        data = {
+            "k1": self.k1,
+            "b": self.b,
+            "doc_ids": self.doc_ids,
+            "doc_lengths": self.doc_lengths,
+            "postings": self.postings
+        }
+        # ไฟล์ชั่วคราวต้องไม่ซ้ำกัน เพราะหลาย process อาจบันทึก index ของคำถามเดียวกันพร้อมกัน
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=os.path.dirname(os.path.abspath(path)),
+            prefix=f"{os.path.basename(path)}.", suffix=".tmp", delete=False
+        ) as f:
+            temp_path = f.name
+            try:
+                json.dump(data, f, ensure_ascii=False)
+            except BaseException:
+                f.close()
+                os.remove(temp_path)
+                raise
+        os.replace(temp_path, path)
+    
+    @classmethod
+    def load(cls, path: str):
+        """
+        โหลด index จากไฟล์ JSON
+        
+        Args:
+            path: พาธของไฟล์
+        
+        Returns:
+            BM25Index
+        """
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(k1=data["k1"], b=data["b"])
+        index.doc_ids = data["doc_ids"]
+        index.doc_lengths = data["doc_lengths"]
+        index.postings = {term: [tuple(posting) for posting in postings] for term, postings in data["postings"].items()}
+        return index
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[str]:
+    """
+    รวมผลการค้นหาหลายแบบด้วย reciprocal rank fusion
+    
+    Args:
+        rankings: รายการผลการค้นหา แต่ละรายการเป็นรหัสชิ้นส่วนเรียงตามความเกี่ยวข้อง
+        k: ค่าคงที่ของ RRF
+    
+    Returns:
+        รหัสชิ้นส่วนเรียงตามคะแนนรวม
+    """
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True)
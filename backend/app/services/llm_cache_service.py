@@ -0,0 +1,163 @@
+# backend/app/services/llm_cache_service.py
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+class LLMResponseCache:
+    """
+    cache คำตอบของ LLM สำหรับ prompt ที่เหมือนกันทุกตัวอักษร
+    
+    key คือ SHA-256 ของชื่อโมเดล, temperature และ prompt สุดท้ายที่ส่งไปยัง LLM
+    เก็บในหน่วยความจำ (LRU) และใน SQLite (ถ้าระบุพาธ) โดยมีอายุและจำนวนสูงสุดจำกัด
+    """
+    
+    def __init__(self, ttl_seconds: int = 86400, max_entries: int = 10000, db_path: Optional[str] = None):
+        """
+        สร้าง cache คำตอบของ LLM
+        
+        Args:
+            ttl_seconds: อายุของคำตอบใน cache (วินาที)
+            max_entries: จำนวนคำตอบสูงสุดที่เก็บไว้
+            db_path: พาธของไฟล์ SQLite (None = เก็บในหน่วยความจำอย่างเดียว)
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "bypassed": 0}
+        
+        self._db = self._open_database(db_path) if db_path else None
+    
+    def _open_database(self, db_path):
+        """
+        เปิดฐานข้อมูล SQLite สำหรับเก็บคำตอบ
+        
+        Args:
+            db_path: พาธของไฟล์ SQLite
+        
+        Returns:
+            sqlite3 Connection
+        """
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        
+        db = sqlite3.connect(db_path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, content TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at)")
+        db.commit()
+        return db
+    
+    def make_key(self, model_name: str, temperature: float, prompt: str) -> str:
+        """
+        สร้าง key ของ cache
+        
+        Args:
+            model_name: ชื่อโมเดล
+            temperature: temperature ของโมเดล
+            prompt: prompt สุดท้ายที่ส่งไปยัง LLM
+        
+        Returns:
+            SHA-256 hex digest
+        """
+        payload = json.dumps([model_name, temperature, prompt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        ดึงคำตอบจาก cache
+        
+        Args:
+            key: key ของ cache
+        
+        Returns:
+            คำตอบที่เก็บไว้ หรือ None ถ้าไม่พบหรือหมดอายุ
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT content, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    entry = (row[0], row[1])
+                    self._remember(key, entry)
+            
+            if entry is None or now - entry[1] > self.ttl_seconds:
+                self._stats["misses"] += 1
+                return None
+            
+            self._memory.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[0]
+    
+    def set(self, key: str, content: str):
+        """
+        เก็บคำตอบลง cache
+        
+        Args:
+            key: key ของ cache
+            content: คำตอบของ LLM
+        """
+        entry = (content, time.time())
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, content, created_at) VALUES (?, ?, ?)",
+                    (key, content, entry[1])
+                )
+                self._prune_database(entry[1])
+                self._db.commit()
+    
+    def record_bypass(self):
+        """นับจำนวนครั้งที่ข้าม cache"""
+        with self._lock:
+            self._stats["bypassed"] += 1
+    
+    def _remember(self, key, entry):
+        """เก็บคำตอบใน cache หน่วยความจำ (เรียกภายใต้ lock)"""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+    
+    def _prune_database(self, now):
+        """ลบคำตอบที่หมดอายุ และคำตอบเก่าที่สุดเมื่อเกินจำนวนสูงสุด (เรียกภายใต้ lock)"""
+        self._db.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        self._db.execute(
+            "DELETE FROM responses WHERE key IN "
+            "(SELECT key FROM responses ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+    
+    def get_stats(self) -> Dict[str, float]:
+        """
+        ดึงสถิติการใช้งาน cache
+        
+        Returns:
+            dict ของจำนวน hit/miss/bypass, อัตรา hit และขนาด cache ในหน่วยความจำ
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_size"] = len(self._memory)
+        total = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / total if total else 0.0
+        return stats
+    
+    def close(self):
+        """ปิดฐานข้อมูล SQLite"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
\ No newline at end of file
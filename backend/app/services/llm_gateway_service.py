@@ -0,0 +1,564 @@
+# backend/app/services/llm_gateway_service.py
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from typing import Dict, Any, Optional
+from .context_service import estimate_tokens
+
+class LLMUnavailableError(RuntimeError):
+    """LLM provider ใช้งานไม่ได้ชั่วคราว (circuit breaker เปิดอยู่)"""
+
+class TokenBucket:
+    """
+    token bucket สำหรับจำกัดอัตราต่อนาที (ไม่ thread-safe เรียกภายใต้ lock ของ LLMGateway)
+    """
+    
+    def __init__(self, per_minute: int):
+        """
+        สร้าง bucket
+        
+        Args:
+            per_minute: จำนวนที่อนุญาตต่อนาที (0 = ไม่จำกัด)
+        """
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.available = float(per_minute)
+        self.updated_at = time.monotonic()
+    
+    def _refill(self, now):
+        """เติม token ตามเวลาที่ผ่านไป"""
+        self.available = min(self.capacity, self.available + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+    
+    def wait_time(self, amount: float, now: float) -> float:
+        """
+        คำนวณเวลาที่ต้องรอจนมี token พอ
+        
+        Args:
+            amount: จำนวน token ที่ต้องการ
+            now: เวลาปัจจุบัน (time.monotonic)
+        
+        Returns:
+            จำนวนวินาทีที่ต้องรอ (0 = ใช้ได้ทันที)
+        """
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        # คำขอที่ใหญ่กว่าความจุทั้งหมดให้รอจน bucket เต็ม
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.rate
+    
+    def consume(self, amount: float):
+        """
+        ใช้ token (ยอมให้ติดลบได้เมื่อปรับยอดตามการใช้งานจริง)
+        
+        Args:
+            amount: จำนวน token
+        """
+        if self.rate > 0:
+            self.available -= amount
+
+class FairSemaphore:
+    """
+    semaphore แบบ FIFO ที่ใช้ร่วมกันได้ทั้งจาก thread (invoke) และ coroutine (ainvoke/astream)
+    
+    ช่องที่ว่างจะถูกส่งต่อให้ผู้รอที่มาก่อนโดยตรง ผู้มาใหม่จึงแซงคิวไม่ได้
+    (threading.BoundedSemaphore รอใน event loop ไม่ได้ และ asyncio.Semaphore ใช้ข้าม thread ไม่ได้)
+    """
+    
+    def __init__(self, value: int):
+        """
+        สร้าง semaphore
+        
+        Args:
+            value: จำนวนช่องทั้งหมด
+        """
+        self._value = value
+        self._waiters = deque()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """รอจนได้ช่อง (แบบ block thread)"""
+        with self._lock:
+            if self._value > 0 and not self._waiters:
+                self._value -= 1
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+    
+    async def aacquire(self):
+        """รอจนได้ช่อง โดยไม่ block event loop"""
+        with self._lock:
+            if self._value > 0 and not self._waiters:
+                self._value -= 1
+                return
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                waiting = future in self._waiters
+                if waiting:
+                    self._waiters.remove(future)
+            # ถ้าได้ช่องแล้วแต่ถูกยกเลิก ให้คืนช่อง (future ที่ถูกยกเลิกก่อน _wake จะถูกคืนใน _wake)
+            if not waiting and not future.cancelled():
+                self.release()
+            raise
+    
+    def _wake(self, future):
+        """ส่งช่องให้ coroutine ที่รออยู่ (ทำงานใน event loop ของผู้รอ)"""
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+    
+    def release(self):
+        """คืนช่องให้ผู้รอที่มาก่อน หรือคืนเข้า semaphore ถ้าไม่มีผู้รอ"""
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if isinstance(waiter, threading.Event):
+                    waiter.set()
+                    return
+                if waiter.done():
+                    continue
+                try:
+                    waiter.get_loop().call_soon_threadsafe(self._wake, waiter)
+                    return
+                except RuntimeError:
+                    # event loop ของผู้รอปิดไปแล้ว
+                    continue
+            self._value += 1
+
+class LLMGateway:
+    """
+    ช่องทางเรียก LLM ที่ใช้ร่วมกันทั้ง process
+    
+    จำกัดจำนวนคำขอและ token ต่อนาทีด้วย token bucket, จำกัดจำนวนคำขอพร้อมกันด้วย semaphore แบบ FIFO,
+    ลองใหม่แบบ exponential backoff ที่มี jitter เมื่อเจอ 429/5xx และเปิด circuit breaker
+    เมื่อ provider ล้มเหลว (5xx, timeout, connection) ติดต่อกัน หลัง reset_timeout จะให้คำขอทดลองผ่านได้ครั้งละหนึ่งคำขอ (half-open)
+    """
+    
+    RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+    
+    def __init__(
+        self,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+        max_concurrency: int = 4,
+        max_retries: int = 5,
+        retry_base_delay: float = 1.0,
+        retry_max_delay: float = 30.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        completion_token_reserve: int = 1024
+    ):
+        """
+        สร้าง gateway
+        
+        Args:
+            requests_per_minute: จำนวนคำขอต่อนาที (0 = ไม่จำกัด)
+            tokens_per_minute: จำนวน token ต่อนาที (0 = ไม่จำกัด)
+            max_concurrency: จำนวนคำขอที่ส่งพร้อมกันสูงสุด
+            max_retries: จำนวนครั้งที่ลองใหม่สูงสุด
+            retry_base_delay: เวลารอเริ่มต้นก่อนลองใหม่ (วินาที)
+            retry_max_delay: เวลารอสูงสุดก่อนลองใหม่ (วินาที)
+            failure_threshold: จำนวนครั้งที่ล้มเหลวติดต่อกันก่อนเปิด circuit breaker
+            reset_timeout: เวลาที่ circuit breaker เปิดก่อนให้ลองใหม่ (วินาที)
+            completion_token_reserve: จำนวน token ของคำตอบที่จองไว้ก่อนรู้การใช้งานจริง
+        """
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.completion_token_reserve = completion_token_reserve
+        
+        self._request_bucket = TokenBucket(requests_per_minute)
+        self._token_bucket = TokenBucket(tokens_per_minute)
+        self._slots = FairSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._stats = {
+            "requests": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "retries": 0,
+            "rejected": 0,
+            "waiting": 0,
+            "max_waiting": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0
+        }
+    
+    def _estimate_request_tokens(self, prompt_value) -> int:
+        """
+        ประมาณจำนวน token ของคำขอ (prompt + คำตอบที่จองไว้)
+        
+        Args:
+            prompt_value: รายการข้อความหรือข้อความของ prompt
+        
+        Returns:
+            จำนวน token โดยประมาณ
+        """
+        if isinstance(prompt_value, str):
+            text = prompt_value
+        else:
+            text = "".join(str(message.content) for message in prompt_value)
+        return estimate_tokens(text) + self.completion_token_reserve
+    
+    def _check_circuit(self, claim_probe: bool = False) -> bool:
+        """
+        ตรวจสถานะ circuit breaker
+        
+        Args:
+            claim_probe: จองสิทธิ์เป็นคำขอทดลองเมื่ออยู่ในสถานะ half-open
+            
+        Returns:
+            True ถ้าคำขอนี้เป็นคำขอทดลองของสถานะ half-open
+            
+        Raises:
+            LLMUnavailableError: ถ้า circuit breaker เปิดอยู่ หรือมีคำขอทดลองกำลังทำงาน
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            if now - self._opened_at < self.reset_timeout or self._probing:
+                self._stats["rejected"] += 1
+                raise LLMUnavailableError("LLM provider ไม่พร้อมใช้งานชั่วคราว กรุณาลองใหม่ภายหลัง")
+            if claim_probe:
+                self._probing = True
+                return True
+            return False
+    
+    def _reserve(self, tokens: int) -> float:
+        """
+        จองโควตาคำขอและ token ต่อนาที
+        
+        Args:
+            tokens: จำนวน token ที่ต้องการจอง
+        
+        Returns:
+            0 ถ้าจองได้ หรือจำนวนวินาทีที่ต้องรอจนโควตาพอ
+        """
+        now = time.monotonic()
+        with self._lock:
+            wait = max(
+                self._request_bucket.wait_time(1, now),
+                self._token_bucket.wait_time(tokens, now)
+            )
+            if wait > 0:
+                return wait
+            self._request_bucket.consume(1)
+            self._token_bucket.consume(tokens)
+            self._in_flight += 1
+            return 0.0
+    
+    def _admit(self) -> bool:
+        """
+        ตรวจ circuit breaker หลังได้ช่องส่งคำขอ (คืนช่องถ้าถูกปฏิเสธ)
+        
+        Returns:
+            True ถ้าคำขอนี้เป็นคำขอทดลองของสถานะ half-open
+        """
+        try:
+            return self._check_circuit(claim_probe=True)
+        except LLMUnavailableError:
+            self._slots.release()
+            raise
+    
+    def _abandon(self, probe: bool):
+        """
+        คืนช่องของคำขอที่ถูกยกเลิกระหว่างรอโควตา
+        
+        Args:
+            probe: คำขอนี้เป็นคำขอทดลองหรือไม่
+        """
+        if probe:
+            with self._lock:
+                self._probing = False
+        self._slots.release()
+    
+    def _enter_queue(self):
+        """นับคำขอที่รอคิว"""
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["waiting"] += 1
+            self._stats["max_waiting"] = max(self._stats["max_waiting"], self._stats["waiting"])
+    
+    def _leave_queue(self, waited: float):
+        """
+        บันทึกเวลาที่รอคิว
+        
+        Args:
+            waited: จำนวนวินาทีที่รอ
+        """
+        with self._lock:
+            self._stats["waiting"] -= 1
+            self._stats["total_wait_seconds"] += waited
+            self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+    
+    def _acquire(self, tokens: int) -> bool:
+        """
+        รอจนจองช่องส่งคำขอได้ (แบบ block thread)
+        
+        รอช่องตามลำดับการมาถึง แล้วรอจนโควตาต่อนาทีพอ
+        
+        Args:
+            tokens: จำนวน token ที่ต้องการจอง
+            
+        Returns:
+            True ถ้าคำขอนี้เป็นคำขอทดลองของสถานะ half-open
+            
+        Raises:
+            LLMUnavailableError: ถ้า circuit breaker เปิดอยู่
+        """
+        started = time.monotonic()
+        self._enter_queue()
+        try:
+            self._check_circuit()
+            self._slots.acquire()
+            probe = self._admit()
+            try:
+                while True:
+                    wait = self._reserve(tokens)
+                    if wait <= 0:
+                        return probe
+                    time.sleep(wait)
+            except BaseException:
+                self._abandon(probe)
+                raise
+        finally:
+            self._leave_queue(time.monotonic() - started)
+    
+    async def _aacquire(self, tokens: int) -> bool:
+        """
+        รอจนจองช่องส่งคำขอได้ โดยไม่ block event loop
+        
+        Args:
+            tokens: จำนวน token ที่ต้องการจอง
+            
+        Returns:
+            True ถ้าคำขอนี้เป็นคำขอทดลองของสถานะ half-open
+            
+        Raises:
+            LLMUnavailableError: ถ้า circuit breaker เปิดอยู่
+        """
+        started = time.monotonic()
+        self._enter_queue()
+        try:
+            self._check_circuit()
+            await self._slots.aacquire()
+            probe = self._admit()
+            try:
+                while True:
+                    wait = self._reserve(tokens)
+                    if wait <= 0:
+                        return probe
+                    await asyncio.sleep(wait)
+            except BaseException:
+                self._abandon(probe)
+                raise
+        finally:
+            self._leave_queue(time.monotonic() - started)
+    
+    def _release(self, reserved_tokens: int, message=None, error: Optional[Exception] = None, probe: bool = False, completed: bool = True):
+        """
+        คืนช่องส่งคำขอ ปรับยอด token ตามการใช้งานจริง และอัปเดต circuit breaker
+        
+        Args:
+            reserved_tokens: จำนวน token ที่จองไว้
+            message: ข้อความตอบกลับของ LLM (ถ้าสำเร็จ)
+            error: ข้อผิดพลาด (ถ้าล้มเหลว)
+            probe: คำขอนี้เป็นคำขอทดลองของสถานะ half-open หรือไม่
+            completed: คำขอทำงานจนจบ (False = ผู้เรียกยกเลิก ไม่นับเป็นผลของ provider)
+        """
+        usage = getattr(message, "usage_metadata", None) if message is not None else None
+        with self._lock:
+            self._in_flight -= 1
+            if probe:
+                self._probing = False
+            if usage and usage.get("total_tokens"):
+                self._token_bucket.consume(usage["total_tokens"] - reserved_tokens)
+            
+            if not completed:
+                # ผู้เรียกยกเลิกเอง ไม่เปลี่ยนสถานะ circuit breaker
+                pass
+            elif error is None:
+                self._consecutive_failures = 0
+                self._opened_at = None
+            elif self._is_retryable(error) and getattr(error, "status_code", None) != 429:
+                # rate limit ไม่นับเป็นความล้มเหลวของ provider เพราะจัดการด้วย backoff แล้ว
+                self._consecutive_failures += 1
+                if probe or self._consecutive_failures >= self.failure_threshold:
+                    # คำขอทดลองล้มเหลว เปิด circuit breaker ต่ออีกรอบ
+                    self._opened_at = time.monotonic()
+        self._slots.release()
+    
+    def _is_retryable(self, error: Exception) -> bool:
+        """
+        ตรวจว่าข้อผิดพลาดควรลองใหม่หรือไม่ (rate limit, 5xx, timeout, connection)
+        
+        Args:
+            error: ข้อผิดพลาด
+        
+        Returns:
+            True ถ้าควรลองใหม่
+        """
+        status_code = getattr(error, "status_code", None)
+        if status_code is not None:
+            return status_code in self.RETRYABLE_STATUS_CODES
+        name = type(error).__name__
+        return "Timeout" in name or "Connection" in name
+    
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        """
+        คำนวณเวลารอก่อนลองใหม่ (ใช้ retry-after จาก provider ถ้ามี)
+        
+        Args:
+            attempt: ครั้งที่ลองใหม่ (เริ่มจาก 0)
+            error: ข้อผิดพลาดของครั้งก่อน
+        
+        Returns:
+            จำนวนวินาทีที่ต้องรอ
+        """
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        try:
+            retry_after = float(headers.get("retry-after"))
+        except (TypeError, ValueError):
+            retry_after = None
+        if retry_after is not None:
+            return min(retry_after, self.retry_max_delay)
+        
+        delay = min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+    
+    def _record(self, key: str):
+        """เพิ่มตัวนับสถิติ"""
+        with self._lock:
+            self._stats[key] += 1
+    
+    def invoke(self, llm, prompt_value):
+        """
+        เรียก LLM ผ่าน gateway
+        
+        Args:
+            llm: LLM (หรือ Runnable) ที่จะเรียก
+            prompt_value: prompt ที่จะส่ง
+        
+        Returns:
+            ข้อความตอบกลับของ LLM
+        """
+        tokens = self._estimate_request_tokens(prompt_value)
+        for attempt in range(self.max_retries + 1):
+            probe = self._acquire(tokens)
+            try:
+                message = llm.invoke(prompt_value)
+            except Exception as e:
+                self._release(tokens, error=e, probe=probe)
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    self._record("failed")
+                    raise
+                self._record("retries")
+                time.sleep(self._retry_delay(attempt, e))
+                continue
+            self._release(tokens, message=message, probe=probe)
+            self._record("succeeded")
+            return message
+    
+    async def ainvoke(self, llm, prompt_value):
+        """
+        เรียก LLM ผ่าน gateway แบบ async
+        
+        Args:
+            llm: LLM (หรือ Runnable) ที่จะเรียก
+            prompt_value: prompt ที่จะส่ง
+        
+        Returns:
+            ข้อความตอบกลับของ LLM
+        """
+        tokens = self._estimate_request_tokens(prompt_value)
+        for attempt in range(self.max_retries + 1):
+            probe = await self._aacquire(tokens)
+            try:
+                message = await llm.ainvoke(prompt_value)
+            except Exception as e:
+                self._release(tokens, error=e, probe=probe)
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    self._record("failed")
+                    raise
+                self._record("retries")
+                await asyncio.sleep(self._retry_delay(attempt, e))
+                continue
+            self._release(tokens, message=message, probe=probe)
+            self._record("succeeded")
+            return message
+    
+    async def astream(self, llm, prompt_value):
+        """
+        เรียก LLM แบบ streaming ผ่าน gateway
+        
+        ลองใหม่ได้เฉพาะก่อนได้รับข้อความส่วนแรก
+        
+        Args:
+            llm: LLM (หรือ Runnable) ที่จะเรียก
+            prompt_value: prompt ที่จะส่ง
+        
+        Yields:
+            ข้อความตอบกลับทีละส่วน
+        """
+        tokens = self._estimate_request_tokens(prompt_value)
+        for attempt in range(self.max_retries + 1):
+            probe = await self._aacquire(tokens)
+            received = False
+            try:
+                async for chunk in llm.astream(prompt_value):
+                    received = True
+                    yield chunk
+            except Exception as e:
+                self._release(tokens, error=e, probe=probe)
+                if received or attempt >= self.max_retries or not self._is_retryable(e):
+                    self._record("failed")
+                    raise
+                self._record("retries")
+                await asyncio.sleep(self._retry_delay(attempt, e))
+                continue
+            except BaseException:
+                # ผู้เรียกหยุดรับข้อความก่อนจบ (เช่น ปิดการเชื่อมต่อ)
+                self._release(tokens, probe=probe, completed=False)
+                raise
+            self._release(tokens, probe=probe)
+            self._record("succeeded")
+            return
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        ดึงสถิติของ gateway
+        
+        Returns:
+            dict ของจำนวนคำขอ, ความลึกของคิว, เวลารอ และสถานะ circuit breaker
+        """
+        now = time.monotonic()
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = self._in_flight
+            stats["consecutive_failures"] = self._consecutive_failures
+            circuit_open = self._opened_at is not None and now - self._opened_at < self.reset_timeout
+        started = stats["requests"] - stats["waiting"]
+        stats["average_wait_seconds"] = stats["total_wait_seconds"] / started if started else 0.0
+        stats["circuit_state"] = "open" if circuit_open else ("half_open" if self._opened_at is not None else "closed")
+        stats["probing"] = self._probing
+        return stats
+
@@ -2,9 +2,24 @@
 from langchain import hub
 from langchain.prompts import PromptTemplate
 from langgraph.graph import START, StateGraph
-from typing_extensions import TypedDict, List
+from typing_extensions import TypedDict, List, Optional
 from langchain_core.documents import Document
-from .model_service import ModelService
+from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+import json
+import math
+import asyncio
+import threading
+import contextlib
+from collections import OrderedDict
+from .model_service import ModelService, get_model_service
+from .executor_service import run_blocking
+from .context_service import pack_context, estimate_tokens
+from .score_parser_service import IncrementalScoreParser
+from ..config import BATCH_EVALUATION_CONCURRENCY, INDEX_BATCH_SIZE
+from ..config import CONTEXT_RETRIEVAL_K, CONTEXT_TOKEN_BUDGET, CONTEXT_CHARS_PER_TOKEN
+from ..config import WHOLE_ANSWER_KEY_CONTEXT, PROMPT_PREFIX_CACHE_SIZE, PROMPT_CACHE_CONTROL
+from ..config import STRUCTURED_OUTPUT_ENABLED, SCORE_ONLY_MAX_TOKENS, SCORE_ONLY_NO_THINK
 
 class EvaluationState(TypedDict):
     question: str
@@ -14,36 +29,102 @@ class EvaluationState(TypedDict):
     context: List[Document]
     evaluation: str
     score: float
+    score_details: Optional[dict]
+    bypass_cache: bool
+    mode: str
 
 class LLMEvaluationService:
-    def __init__(self, rag_service):
+    # ส่วนของ prompt ที่คงที่ต่อคำถาม และส่วนที่เปลี่ยนตามคำตอบของนักศึกษา
+    PROMPT_PREFIX_TEMPLATE = """## คำถาม:
+{question}
+
+## เฉลยอาจารย์:
+{answer_key}"""
+    PROMPT_SUFFIX_TEMPLATE = """## คำตอบของนักศึกษา:
+{student_answer}
+
+โปรดประเมินคำตอบของนักศึกษาข้างต้นตามเกณฑ์และรูปแบบที่กำหนด"""
+    # ส่วนท้ายของ prompt สำหรับโหมดให้คะแนนอย่างเดียว (ส่วนต้นเหมือนโหมดเต็มเพื่อใช้ prompt caching ร่วมกัน)
+    PROMPT_SCORE_ONLY_SUFFIX_TEMPLATE = """## คำตอบของนักศึกษา:
+{student_answer}
+
+โหมดให้คะแนนอย่างเดียว: ไม่ต้องแสดงการเปรียบเทียบรายข้อและสรุปเหตุผล
+ตอบเฉพาะส่วนคะแนนต่อไปนี้เท่านั้น
+{score_format}"""
+    SCORE_ONLY_TEXT_FORMAT = """คะแนนเต็ม: X/40
+ข้อล่ะ X/10
+ตามด้วยคะแนนดิบ (0-2) และคะแนนที่ถ่วงน้ำหนักแล้วของแต่ละหมวด หมวดละหนึ่งบรรทัด"""
+    SCORE_ONLY_STRUCTURED_FORMAT = "บล็อก JSON ของคะแนนตามรูปแบบที่กำหนด ตามด้วยบรรทัด คะแนนเต็ม: X/40"
+    # คำสั่งปิดการคิดของโมเดลแบบ reasoning (qwen3) ต่อท้าย prompt ของโหมดให้คะแนนอย่างเดียว
+    NO_THINK_SWITCH = "\n/no_think"
+    
+    # คำสั่งเพิ่มเติมสำหรับโหมด structured output (บล็อก JSON ของคะแนนตาม ScoreBlock)
+    STRUCTURED_OUTPUT_INSTRUCTIONS = """
+        **โหมดคะแนนแบบโครงสร้าง:**
+        ก่อนข้อความอื่นทั้งหมด ให้เริ่มต้นคำตอบด้วยบล็อก JSON ของคะแนนหนึ่งก้อนตามรูปแบบนี้ (ตัวเลขเท่านั้น ห้ามมีคำอธิบายใน JSON)
+        {"understanding": {"raw": 0-2, "weighted": X}, "analysis": {"raw": 0-2, "weighted": X},
+         "completeness": {"raw": 0-2, "weighted": X}, "comparison": {"raw": 0-2, "weighted": X},
+         "communication": {"raw": 0-2, "weighted": X}, "item_scores": [X, X, X, X], "total": X}
+        โดย total คือคะแนนรวมเต็ม 40 แล้วจึงตามด้วยคำตอบในรูปแบบที่กำหนดข้างต้น
+        """
+    
+    def __init__(self, rag_service, model_service: Optional[ModelService] = None, graph=None):
         """
         สร้าง service สำหรับการประเมินคำตอบด้วย LLM
         
         Args:
             rag_service: บริการ RAG สำหรับการค้นหาข้อมูลที่เกี่ยวข้อง
+            model_service: ModelService ที่ต้องการใช้ (ค่าเริ่มต้นคือตัวที่ใช้ร่วมกันทั้ง process)
+            graph: graph ที่ compile แล้ว (ถ้าไม่ระบุจะสร้างครั้งแรกที่ใช้งานแล้วเก็บไว้ใช้ซ้ำ)
         """
         self.rag_service = rag_service
         
         # เตรียม LLM และ prompt
-        self._setup_llm_and_prompt()
+        self._setup_llm_and_prompt(model_service)
+        
+        # graph ที่ compile แล้ว ใช้ซ้ำได้ทุกการประเมิน
+        self._graph = graph
+        self._graph_lock = threading.Lock()
     
-    def _setup_llm_and_prompt(self):
+    def _setup_llm_and_prompt(self, model_service=None):
         """เตรียม LLM และ prompt สำหรับการประเมิน"""
-        # ดึง LLM จาก ModelService
-        model_service = ModelService()
+        # ดึง LLM จาก ModelService ที่ใช้ร่วมกัน
+        model_service = model_service or get_model_service()
+        self.model_service = model_service
         self.llm = model_service.get_llm()
+        self.response_cache = model_service.get_response_cache()
+        self.gateway = model_service.get_llm_gateway()
         
         # สร้าง prompt สำหรับประเมินคำตอบภาษาไทย
+        # แบ่งเป็นส่วนคงที่ (เกณฑ์ + คำถามและเฉลย) และส่วนที่เปลี่ยนตามนักศึกษา
+        # เพื่อให้ provider ที่มี prompt caching ใช้ prefix เดิมซ้ำได้
         self.prompt_template = self._create_evaluation_prompt_template()
-        self.prompt = PromptTemplate(
-            template=self.prompt_template,
-            input_variables=["question", "student_answer", "answer_key"]
+        if STRUCTURED_OUTPUT_ENABLED:
+            self.prompt_template += self.STRUCTURED_OUTPUT_INSTRUCTIONS
+        self.system_message = SystemMessage(content=self.prompt_template)
+        self.prefix_prompt = PromptTemplate(
+            template=self.PROMPT_PREFIX_TEMPLATE,
+            input_variables=["question", "answer_key"]
         )
+        self.suffix_prompt = PromptTemplate(
+            template=self.PROMPT_SUFFIX_TEMPLATE,
+            input_variables=["student_answer"]
+        )
+        self.score_only_suffix_prompt = PromptTemplate(
+            template=self.PROMPT_SCORE_ONLY_SUFFIX_TEMPLATE + (self.NO_THINK_SWITCH if SCORE_ONLY_NO_THINK else ""),
+            input_variables=["student_answer"],
+            partial_variables={
+                "score_format": self.SCORE_ONLY_STRUCTURED_FORMAT if STRUCTURED_OUTPUT_ENABLED else self.SCORE_ONLY_TEXT_FORMAT
+            }
+        )
+        # โหมดให้คะแนนอย่างเดียวจำกัดความยาวคำตอบให้สั้น
+        self.score_only_llm = self.llm.bind(max_tokens=SCORE_ONLY_MAX_TOKENS)
+        self._prompt_prefixes = OrderedDict()
+        self._prompt_prefixes_lock = threading.Lock()
     
     def _create_evaluation_prompt_template(self):
         """
-        สร้าง template สำหรับ prompt ที่ใช้ในการประเมิน
+        สร้าง template สำหรับ prompt ที่ใช้ในการประเมิน (เกณฑ์และรูปแบบคำตอบ ซึ่งเหมือนกันทุกคำถาม)
         
         Returns:
             template string สำหรับ prompt
@@ -97,16 +178,7 @@ class LLMEvaluationService:
         - คะแนนรวมต่อข้อ (เต็ม 10 คะแนน)
         - เหตุผลประกอบสำหรับแต่ละหมวด  
 
-        ---
-        ## คำถาม:
-        {question}
-
-        ## คำตอบของนักศึกษา:
-        {student_answer}
-
-        ## เฉลยอาจารย์:
-        {answer_key}
-        ---
+        คำถามและเฉลยอาจารย์จะอยู่ในข้อความถัดไป ตามด้วยคำตอบของนักศึกษา
 
         โปรดประเมินคำตอบโดยให้คะแนนระหว่าง 0 ถึง 40 พร้อมคำอธิบาย
         เริ่มต้นคำตอบด้วย:
@@ -154,9 +226,9 @@ class LLMEvaluationService:
         # สร้าง graph การประมวลผล
         workflow = StateGraph(EvaluationState)
         
-        # Add nodes
-        workflow.add_node("retrieve", self._retrieve)
-        workflow.add_node("evaluate", self._evaluate)
+        # Add nodes (รองรับทั้ง invoke และ ainvoke)
+        workflow.add_node("retrieve", RunnableLambda(self._retrieve, afunc=self._aretrieve))
+        workflow.add_node("evaluate", RunnableLambda(self._evaluate, afunc=self._aevaluate))
         
         # Add edges
         workflow.add_edge(START, "retrieve")
@@ -165,6 +237,19 @@ class LLMEvaluationService:
         
         return workflow.compile()
     
+    def get_evaluation_graph(self):
+        """
+        ดึง graph สำหรับการประเมินคำตอบ โดย compile เพียงครั้งเดียวต่อ service
+        
+        Returns:
+            StateGraph ที่ compile แล้ว
+        """
+        if self._graph is None:
+            with self._graph_lock:
+                if self._graph is None:
+                    self._graph = self.create_evaluation_graph()
+        return self._graph
+    
     def _retrieve(self, state: EvaluationState):
         """
         ค้นหาข้อมูลที่เกี่ยวข้องจากเฉลย
@@ -175,14 +260,69 @@ class LLMEvaluationService:
         Returns:
             ข้อมูลบริบทที่พบ
         """
+        retrieved_docs = self._get_whole_answer_key_context(state['subject_id'], state['question_id'])
+        if retrieved_docs is not None:
+            return {"context": retrieved_docs}
+        
         query = self._create_query_from_state(state)
         retrieved_docs = self.rag_service.retrieve_relevant_context(
             query=query,
             subject_id=state['subject_id'],
-            question_id=state['question_id']
+            question_id=state['question_id'],
+            k=CONTEXT_RETRIEVAL_K
         )
         return {"context": retrieved_docs}
     
+    async def _aretrieve(self, state: EvaluationState):
+        """
+        ค้นหาข้อมูลที่เกี่ยวข้องจากเฉลยโดยไม่ block event loop
+        
+        Args:
+            state: สถานะปัจจุบันของการประเมิน
+            
+        Returns:
+            ข้อมูลบริบทที่พบ
+        """
+        retrieved_docs = await run_blocking(
+            self._get_whole_answer_key_context, state['subject_id'], state['question_id']
+        )
+        if retrieved_docs is not None:
+            return {"context": retrieved_docs}
+        
+        query = self._create_query_from_state(state)
+        retrieved_docs = await self.rag_service.aretrieve_relevant_context(
+            query=query,
+            subject_id=state['subject_id'],
+            question_id=state['question_id'],
+            k=CONTEXT_RETRIEVAL_K
+        )
+        return {"context": retrieved_docs}
+    
+    def _get_whole_answer_key_context(self, subject_id, question_id):
+        """
+        ดึงเฉลยทั้งฉบับเป็นบริบท ถ้าเฉลยสั้นพอที่จะอยู่ในงบ token
+        
+        บริบทที่ได้จะเหมือนกันทุกครั้งสำหรับคำถามเดียวกัน ทำให้ prefix ของ prompt คงที่
+        
+        Args:
+            subject_id: รหัสวิชา
+            question_id: รหัสคำถาม
+            
+        Returns:
+            ชิ้นส่วนเฉลยเรียงตามตำแหน่งในเอกสาร หรือ None ถ้าต้องค้นหาเฉพาะส่วนที่เกี่ยวข้อง
+        """
+        if not WHOLE_ANSWER_KEY_CONTEXT or CONTEXT_TOKEN_BUDGET <= 0:
+            return None
+        
+        documents = self.rag_service.get_answer_key_documents(subject_id, question_id)
+        if not documents:
+            return None
+        
+        content = pack_context(documents, math.inf, CONTEXT_CHARS_PER_TOKEN)
+        if estimate_tokens(content, CONTEXT_CHARS_PER_TOKEN) > CONTEXT_TOKEN_BUDGET:
+            return None
+        return documents
+    
     def _create_query_from_state(self, state):
         """
         สร้างคำค้นหาจากสถานะ
@@ -212,34 +352,182 @@ class LLMEvaluationService:
         prompt_value = self._create_evaluation_prompt(
             state["question"],
             state["student_answer"],
-            docs_content
+            docs_content,
+            mode=state.get("mode", "full")
         )
         
         # ส่งคำถามไปยัง LLM
-        response = self.llm.invoke(prompt_value)
-        result = response.content
+        result = self._invoke_llm(
+            prompt_value,
+            bypass_cache=state.get("bypass_cache", False),
+            mode=state.get("mode", "full")
+        )
         
         # แยกคะแนนและการประเมิน
-        score = self._extract_score_from_result(result)
+        return {
+            "evaluation": result,
+            **self._parse_result(result)
+        }
+    
+    async def _aevaluate(self, state: EvaluationState):
+        """
+        ประเมินคำตอบนักเรียนเทียบกับเฉลยโดยไม่ block event loop
         
+        Args:
+            state: สถานะปัจจุบันของการประเมิน
+            
+        Returns:
+            ผลการประเมิน
+        """
+        # รวมเนื้อหาจากเอกสารบริบท
+        docs_content = self._prepare_context_content(state["context"])
+        
+        # สร้าง prompt สำหรับการประเมิน
+        prompt_value = self._create_evaluation_prompt(
+            state["question"],
+            state["student_answer"],
+            docs_content,
+            mode=state.get("mode", "full")
+        )
+        
+        # ส่งคำถามไปยัง LLM
+        result = await self._ainvoke_llm(
+            prompt_value,
+            bypass_cache=state.get("bypass_cache", False),
+            mode=state.get("mode", "full")
+        )
+        
+        # แยกคะแนนและการประเมิน
         return {
             "evaluation": result,
-            "score": score
+            **self._parse_result(result)
         }
     
+    def _get_cache_key(self, prompt_value):
+        """
+        สร้าง key ของ cache คำตอบจากโมเดลและ prompt
+        
+        Args:
+            prompt_value: รายการข้อความของ prompt
+            
+        Returns:
+            key ของ cache หรือ None ถ้าไม่ได้เปิดใช้ cache
+        """
+        if self.response_cache is None:
+            return None
+        model_name = getattr(self.llm, "model_name", type(self.llm).__name__)
+        temperature = getattr(self.llm, "temperature", None)
+        prompt_text = json.dumps([[message.type, message.content] for message in prompt_value], ensure_ascii=False)
+        return self.response_cache.make_key(model_name, temperature, prompt_text)
+    
+    def _get_llm_for_mode(self, mode):
+        """
+        เลือก LLM ตามโหมดการประเมิน
+        
+        Args:
+            mode: "full" หรือ "score"
+            
+        Returns:
+            LLM (โหมด score จำกัด max_tokens)
+        """
+        return self.score_only_llm if mode == "score" else self.llm
+    
+    def _invoke_llm(self, prompt_value, bypass_cache=False, mode="full"):
+        """
+        ส่ง prompt ไปยัง LLM โดยใช้คำตอบจาก cache ถ้ามี
+        
+        Args:
+            prompt_value: รายการข้อความของ prompt
+            bypass_cache: ข้าม cache และเรียก LLM ใหม่เสมอ
+            mode: "full" = ประเมินพร้อมคำอธิบาย, "score" = ให้คะแนนอย่างเดียว
+            
+        Returns:
+            ข้อความคำตอบของ LLM
+        """
+        cache_key = self._get_cache_key(prompt_value)
+        if cache_key is not None:
+            if bypass_cache:
+                self.response_cache.record_bypass()
+            else:
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+        
+        response = self.gateway.invoke(self._get_llm_for_mode(mode), prompt_value)
+        result = response.content
+        self._check_truncated(result, response.response_metadata.get("finish_reason"), mode)
+        
+        if cache_key is not None:
+            self.response_cache.set(cache_key, result)
+        return result
+    
+    async def _ainvoke_llm(self, prompt_value, bypass_cache=False, mode="full"):
+        """
+        ส่ง prompt ไปยัง LLM แบบ async โดยใช้คำตอบจาก cache ถ้ามี
+        
+        Args:
+            prompt_value: รายการข้อความของ prompt
+            bypass_cache: ข้าม cache และเรียก LLM ใหม่เสมอ
+            mode: "full" = ประเมินพร้อมคำอธิบาย, "score" = ให้คะแนนอย่างเดียว
+            
+        Returns:
+            ข้อความคำตอบของ LLM
+        """
+        cache_key = self._get_cache_key(prompt_value)
+        if cache_key is not None:
+            if bypass_cache:
+                self.response_cache.record_bypass()
+            else:
+                cached = await run_blocking(self.response_cache.get, cache_key)
+                if cached is not None:
+                    return cached
+        
+        response = await self.gateway.ainvoke(self._get_llm_for_mode(mode), prompt_value)
+        result = response.content
+        self._check_truncated(result, response.response_metadata.get("finish_reason"), mode)
+        
+        if cache_key is not None:
+            await run_blocking(self.response_cache.set, cache_key, result)
+        return result
+    
+    def _check_truncated(self, result, finish_reason, mode):
+        """
+        ตรวจคำตอบของโหมดให้คะแนนอย่างเดียวที่ถูกตัดที่ max_tokens ก่อนได้คะแนน
+        
+        Args:
+            result: ข้อความคำตอบของ LLM
+            finish_reason: เหตุผลที่ LLM หยุดตอบ ("length" = ถูกตัดที่ max_tokens)
+            mode: "full" หรือ "score"
+            
+        Raises:
+            ValueError: ถ้าคำตอบถูกตัดและไม่มีคะแนน (แทนการใช้คะแนนเริ่มต้น)
+        """
+        if mode != "score" or finish_reason != "length":
+            return
+        parser = self._create_score_parser()
+        parser.feed(result)
+        if parser.finish() is None:
+            raise ValueError(
+                f"คำตอบของ LLM ถูกตัดที่ SCORE_ONLY_MAX_TOKENS ({SCORE_ONLY_MAX_TOKENS}) ก่อนได้คะแนน"
+            )
+    
     def _prepare_context_content(self, context_docs):
         """
         รวมเนื้อหาจากเอกสารบริบท
         
+        ชิ้นส่วนที่ซ้อนทับกันจะถูกรวม และบริบทจะถูกจำกัดตามงบ token (CONTEXT_TOKEN_BUDGET)
+        
         Args:
-            context_docs: รายการเอกสารบริบท
+            context_docs: รายการเอกสารบริบทเรียงตามความเกี่ยวข้อง
             
         Returns:
             เนื้อหาที่รวมเป็นข้อความเดียว
         """
-        return "\n\n".join(doc.page_content for doc in context_docs)
+        if CONTEXT_TOKEN_BUDGET <= 0:
+            return "\n\n".join(doc.page_content for doc in context_docs)
+        return pack_context(context_docs, CONTEXT_TOKEN_BUDGET, CONTEXT_CHARS_PER_TOKEN)
     
-    def _create_evaluation_prompt(self, question, student_answer, answer_key_content):
+    def _create_evaluation_prompt(self, question, student_answer, answer_key_content, mode="full"):
         """
         สร้าง prompt สำหรับการประเมิน
         
@@ -247,15 +535,97 @@ class LLMEvaluationService:
             question: คำถาม
             student_answer: คำตอบของนักเรียน
             answer_key_content: เนื้อหาเฉลย
+            mode: "full" = ประเมินพร้อมคำอธิบาย, "score" = ให้คะแนนอย่างเดียว
             
         Returns:
-            prompt ที่จัดรูปแบบแล้ว
+            รายการข้อความ (system, ส่วนคงที่ของคำถาม, คำตอบของนักศึกษา)
         """
-        return self.prompt.format(
-            question=question,
-            student_answer=student_answer,
-            answer_key=answer_key_content
-        )
+        suffix_prompt = self.score_only_suffix_prompt if mode == "score" else self.suffix_prompt
+        return [
+            self.system_message,
+            self._get_prompt_prefix(question, answer_key_content),
+            HumanMessage(content=suffix_prompt.format(student_answer=student_answer))
+        ]
+    
+    def _get_prompt_prefix(self, question, answer_key_content):
+        """
+        ดึงข้อความส่วนคงที่ของ prompt (คำถามและเฉลย) จาก cache หรือสร้างใหม่
+        
+        Args:
+            question: คำถาม
+            answer_key_content: เนื้อหาเฉลย
+            
+        Returns:
+            HumanMessage ของส่วนคงที่
+        """
+        cache_key = (question, answer_key_content)
+        with self._prompt_prefixes_lock:
+            message = self._prompt_prefixes.get(cache_key)
+            if message is not None:
+                self._prompt_prefixes.move_to_end(cache_key)
+                return message
+        
+        content = self.prefix_prompt.format(question=question, answer_key=answer_key_content)
+        message = HumanMessage(content=self._mark_prompt_prefix_cacheable(content))
+        
+        with self._prompt_prefixes_lock:
+            self._prompt_prefixes[cache_key] = message
+            while len(self._prompt_prefixes) > PROMPT_PREFIX_CACHE_SIZE:
+                self._prompt_prefixes.popitem(last=False)
+        return message
+    
+    def _mark_prompt_prefix_cacheable(self, content):
+        """
+        จุดเชื่อมกับ prompt caching ของ provider
+        
+        provider ที่ cache prefix อัตโนมัติ (เช่น Groq, OpenAI) ต้องการเพียงให้ prefix เหมือนเดิมทุกตัวอักษร
+        ส่วน provider ที่ต้องระบุจุด cache เอง (เช่น Anthropic) เปิดด้วย PROMPT_CACHE_CONTROL
+        
+        Args:
+            content: ข้อความส่วนคงที่ของ prompt
+            
+        Returns:
+            content ของข้อความที่จะส่งไปยัง LLM
+        """
+        if not PROMPT_CACHE_CONTROL:
+            return content
+        return [{"type": "text", "text": content, "cache_control": {"type": "ephemeral"}}]
+    
+    def _create_score_parser(self):
+        """
+        สร้างตัวแยกคะแนนตามโหมดของ prompt
+        
+        Returns:
+            IncrementalScoreParser
+        """
+        return IncrementalScoreParser(structured=STRUCTURED_OUTPUT_ENABLED)
+    
+    def _parse_result(self, result_text, parser=None, default_score=20.0):
+        """
+        แยกคะแนนและคะแนนรายหมวดจากผลลัพธ์การประเมิน
+        
+        Args:
+            result_text: ข้อความผลลัพธ์
+            parser: ตัวแยกคะแนนที่รับข้อความครบแล้ว (ถ้าไม่ระบุจะแยกจาก result_text)
+            default_score: คะแนนเริ่มต้นกรณีไม่พบคะแนน
+            
+        Returns:
+            dict ของ score และ score_details
+        """
+        if parser is None:
+            parser = self._create_score_parser()
+            parser.feed(result_text)
+        score = parser.finish()
+        
+        if score is None:
+            # กรณีไม่สามารถแยกคะแนนได้ ใช้ค่าเริ่มต้น
+            print(f"Score not found in evaluation, using default score {default_score}")
+            score = default_score
+        
+        return {
+            "score": score,
+            "score_details": parser.block.model_dump() if parser.block is not None else None
+        }
     
     def _extract_score_from_result(self, result_text, default_score=20.0):
         """
@@ -268,21 +638,9 @@ class LLMEvaluationService:
         Returns:
             คะแนนที่แยกได้
         """
-        try:
-            # ค้นหาบรรทัดที่มีคำว่า "คะแนนเต็ม: X/40"
-            lines = result_text.split("\n")
-            for line in lines:
-                if "คะแนนเต็ม:" in line:
-                    # แยกคะแนนจากข้อความ "คะแนนเต็ม: X/40"
-                    score_text = line.replace("คะแนนเต็ม:", "").strip().split("/")[0]
-                    return float(score_text)
-        except Exception as e:
-            print(f"Error extracting score: {str(e)}")
-        
-        # กรณีไม่สามารถแยกคะแนนได้ ใช้ค่าเริ่มต้น
-        return default_score
+        return self._parse_result(result_text, default_score=default_score)["score"]
     
-    def evaluate_answer(self, question, student_answer, subject_id, question_id):
+    def evaluate_answer(self, question, student_answer, subject_id, question_id, graph=None, bypass_cache=False, mode="full"):
         """
         ประเมินคำตอบของนักเรียน
         
@@ -291,15 +649,197 @@ class LLMEvaluationService:
             student_answer: คำตอบของนักเรียน
             subject_id: รหัสวิชา
             question_id: รหัสคำถาม
+            graph: graph ที่ compile แล้ว (ถ้าไม่ระบุจะใช้ graph ของ service)
+            bypass_cache: ข้าม cache คำตอบของ LLM
+            mode: "full" = ประเมินพร้อมคำอธิบาย, "score" = ให้คะแนนอย่างเดียว (เร็วกว่า)
             
         Returns:
             ผลการประเมิน
         """
-        graph = self.create_evaluation_graph()
+        graph = graph or self.get_evaluation_graph()
         initial_state = {
             "question": question,
             "student_answer": student_answer,
             "subject_id": subject_id,
-            "question_id": question_id
+            "question_id": question_id,
+            "bypass_cache": bypass_cache,
+            "mode": mode
         }
-        return graph.invoke(initial_state)
\ No newline at end of file
+        return graph.invoke(initial_state)
+    
+    async def aevaluate_answer(self, question, student_answer, subject_id, question_id, graph=None, bypass_cache=False, mode="full"):
+        """
+        ประเมินคำตอบของนักเรียนแบบ async
+        
+        Args:
+            question: คำถาม
+            student_answer: คำตอบของนักเรียน
+            subject_id: รหัสวิชา
+            question_id: รหัสคำถาม
+            graph: graph ที่ compile แล้ว (ถ้าไม่ระบุจะใช้ graph ของ service)
+            bypass_cache: ข้าม cache คำตอบของ LLM
+            mode: "full" = ประเมินพร้อมคำอธิบาย, "score" = ให้คะแนนอย่างเดียว (เร็วกว่า)
+            
+        Returns:
+            ผลการประเมิน
+        """
+        graph = graph or self.get_evaluation_graph()
+        initial_state = {
+            "question": question,
+            "student_answer": student_answer,
+            "subject_id": subject_id,
+            "question_id": question_id,
+            "bypass_cache": bypass_cache,
+            "mode": mode
+        }
+        return await graph.ainvoke(initial_state)
+    
+    async def astream_evaluation(self, question, student_answer, subject_id, question_id, bypass_cache=False, mode="full", stop_after_score=False):
+        """
+        ประเมินคำตอบของนักเรียนแบบ streaming
+        
+        ส่งข้อความของ LLM กลับทีละส่วนตามที่ได้รับ ส่งคะแนนทันทีที่บรรทัด "คะแนนเต็ม: X/40" ครบ
+        และปิดท้ายด้วยผลการประเมินทั้งหมด
+        
+        Args:
+            question: คำถาม
+            student_answer: คำตอบของนักเรียน
+            subject_id: รหัสวิชา
+            question_id: รหัสคำถาม
+            bypass_cache: ข้าม cache คำตอบของ LLM
+            mode: "full" = ประเมินพร้อมคำอธิบาย, "score" = ให้คะแนนอย่างเดียว (เร็วกว่า)
+            stop_after_score: หยุดรับข้อความจาก LLM ทันทีที่ได้คะแนน (ผลการประเมินจะมีเฉพาะส่วนต้น)
+            
+        Yields:
+            Tuple (ชนิดของ event, ข้อมูล) โดยชนิดเป็น "token", "score" หรือ "result"
+        """
+        state = {
+            "question": question,
+            "student_answer": student_answer,
+            "subject_id": subject_id,
+            "question_id": question_id,
+            "bypass_cache": bypass_cache,
+            "mode": mode
+        }
+        state.update(await self._aretrieve(state))
+        
+        prompt_value = self._create_evaluation_prompt(
+            question,
+            student_answer,
+            self._prepare_context_content(state["context"]),
+            mode=mode
+        )
+        
+        cache_key = self._get_cache_key(prompt_value)
+        result = None
+        if cache_key is not None:
+            if bypass_cache:
+                self.response_cache.record_bypass()
+            else:
+                result = await run_blocking(self.response_cache.get, cache_key)
+        
+        parser = self._create_score_parser()
+        score_sent = False
+        if result is not None:
+            parser.feed(result)
+            yield "token", result
+        else:
+            parts = []
+            stopped = False
+            finish_reason = None
+            # ปิด stream ของ gateway ทันทีเมื่อหยุดกลางทาง (คืน slot และบันทึกผลของ circuit breaker)
+            async with contextlib.aclosing(self.gateway.astream(self._get_llm_for_mode(mode), prompt_value)) as stream:
+                async for chunk in stream:
+                    finish_reason = chunk.response_metadata.get("finish_reason") or finish_reason
+                    if not chunk.content:
+                        continue
+                    parts.append(chunk.content)
+                    yield "token", chunk.content
+                
+                    if not score_sent and parser.feed(chunk.content) is not None:
+                        yield "score", parser.score
+                        score_sent = True
+                        if stop_after_score:
+                            # หยุดรับข้อความที่เหลือเพื่อประหยัด token
+                            stopped = True
+                            break
+            
+            result = "".join(parts)
+            if not stopped:
+                self._check_truncated(result, finish_reason, mode)
+            if cache_key is not None and not stopped:
+                await run_blocking(self.response_cache.set, cache_key, result)
+        
+        state["evaluation"] = result
+        state.update(self._parse_result(result, parser=parser))
+        if not score_sent:
+            yield "score", state["score"]
+        yield "result", state
+    
+    async def aevaluate_batch(self, items, concurrency=BATCH_EVALUATION_CONCURRENCY, bypass_cache=False, mode="full"):
+        """
+        ประเมินคำตอบหลายรายการพร้อมกัน และส่งผลกลับทันทีที่แต่ละรายการเสร็จ
+        
+        คำค้นหาของทุกรายการจะถูกแปลงเป็น embedding ทีละ INDEX_BATCH_SIZE รายการ
+        ข้อผิดพลาดของรายการหนึ่งไม่ทำให้รายการอื่นล้มเหลว
+        
+        Args:
+            items: รายการ dict ที่มี question, student_answer, subject_id, question_id
+            concurrency: จำนวนการประเมินที่ทำพร้อมกันสูงสุด
+            bypass_cache: ข้าม cache คำตอบของ LLM
+            mode: "full" = ประเมินพร้อมคำอธิบาย, "score" = ให้คะแนนอย่างเดียว (เร็วกว่า)
+            
+        Yields:
+            Tuple (ลำดับของรายการ, ผลการประเมิน หรือ Exception)
+        """
+        states = [
+            {
+                "question": item["question"],
+                "student_answer": item["student_answer"],
+                "subject_id": item["subject_id"],
+                "question_id": item["question_id"],
+                "bypass_cache": bypass_cache,
+                "mode": mode
+            }
+            for item in items
+        ]
+        
+        # แปลงคำค้นหาเป็น embedding ทีละ batch (batch ใหญ่ครั้งเดียวใช้หน่วยความจำมากและกันงานอื่นนานเกินไป)
+        queries = [self._create_query_from_state(state) for state in states]
+        query_embeddings = []
+        for start in range(0, len(queries), INDEX_BATCH_SIZE):
+            query_embeddings.extend(await run_blocking(
+                self.rag_service.embeddings.embed_documents, queries[start:start + INDEX_BATCH_SIZE]
+            ))
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def evaluate_item(index):
+            async with semaphore:
+                try:
+                    state = states[index]
+                    state["context"] = await run_blocking(
+                        self._get_whole_answer_key_context, state["subject_id"], state["question_id"]
+                    )
+                    if state["context"] is None:
+                        state["context"] = await run_blocking(
+                            self.rag_service.retrieve_relevant_context_by_vector,
+                            query_embeddings[index],
+                            state["subject_id"],
+                            state["question_id"],
+                            k=CONTEXT_RETRIEVAL_K,
+                            query=queries[index]
+                        )
+                    state.update(await self._aevaluate(state))
+                    return index, state
+                except Exception as e:
+                    return index, e
+        
+        tasks = [asyncio.ensure_future(evaluate_item(index)) for index in range(len(states))]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield await next_result
+        finally:
+            # ยกเลิกรายการที่ยังค้างอยู่ถ้าผู้เรียกหยุดรับผล (เช่น client ตัดการเชื่อมต่อ)
+            for task in tasks:
+                task.cancel()
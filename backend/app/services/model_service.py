@@ -2,8 +2,70 @@
 from langchain_groq import ChatGroq
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain.schema import Document
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import threading
+import torch
+from .embedding_cache_service import CachedEmbeddings
+from .llm_cache_service import LLMResponseCache
+from .llm_gateway_service import LLMGateway
+from .fake_llm_service import FakeGradingChatModel
+from .onnx_embedding_service import create_onnx_embeddings
+from .embedding_batcher_service import MicroBatchingEmbeddings
 from ..config import GROQ_API_KEY, GROQ_MODEL_NAME, EMBEDDING_MODEL_NAME
+from ..config import LLM_BACKEND, FAKE_LLM_LATENCY_MS, FAKE_LLM_LATENCY_JITTER_MS, FAKE_LLM_TOKENS_PER_SECOND
+from ..config import EMBEDDING_BACKEND, EMBEDDING_ONNX_DIR, EMBEDDING_ONNX_QUANTIZATION, EMBEDDING_THREADS
+from ..config import EMBEDDING_BATCH_WAIT_MS, EMBEDDING_BATCH_MAX_SIZE
+from ..config import EMBEDDING_CACHE_ENABLED, EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES
+from ..config import LLM_CACHE_ENABLED, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_PATH
+from ..config import LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE, LLM_MAX_CONCURRENCY
+from ..config import LLM_MAX_RETRIES, LLM_RETRY_BASE_DELAY, LLM_RETRY_MAX_DELAY
+from ..config import LLM_CIRCUIT_FAILURE_THRESHOLD, LLM_CIRCUIT_RESET_SECONDS, LLM_COMPLETION_TOKEN_RESERVE
+
+def get_embedding_model_id() -> str:
+    """
+    สร้างชื่อระบุตัวตนของโมเดล embeddings ตาม backend ที่ใช้ (เวกเตอร์ของแต่ละ backend ต่างกันเล็กน้อย)
+    
+    Returns:
+        ชื่อโมเดลพร้อม backend เช่น "<model>" หรือ "<model>@onnx-qint8-avx2"
+    """
+    if EMBEDDING_BACKEND == "onnx":
+        return f"{EMBEDDING_MODEL_NAME}@onnx-qint8-{EMBEDDING_ONNX_QUANTIZATION}"
+    return EMBEDDING_MODEL_NAME
+
+def _create_groq_llm():
+    """
+    สร้าง LLM จาก Groq
+    
+    Returns:
+        ChatGroq instance
+    """
+    return ChatGroq(
+        groq_api_key=GROQ_API_KEY,
+        model_name=GROQ_MODEL_NAME,
+        temperature=0.1,  # ตั้งค่า temperature ต่ำเพื่อให้คำตอบแน่นอนมากขึ้น
+        max_tokens=4096,
+        max_retries=0,  # การลองใหม่ทำที่ LLMGateway
+    )
+
+def _create_fake_llm():
+    """
+    สร้าง LLM จำลองที่ตอบแบบ deterministic โดยไม่ต้องใช้เครือข่าย
+    
+    Returns:
+        FakeGradingChatModel instance
+    """
+    return FakeGradingChatModel(
+        latency_ms=FAKE_LLM_LATENCY_MS,
+        latency_jitter_ms=FAKE_LLM_LATENCY_JITTER_MS,
+        tokens_per_second=FAKE_LLM_TOKENS_PER_SECOND,
+        max_tokens=4096
+    )
+
+# LLM backend ที่เลือกได้ผ่าน LLM_BACKEND
+LLM_BACKENDS = {
+    "groq": _create_groq_llm,
+    "fake": _create_fake_llm
+}
 
 class ModelService:
     """
@@ -21,24 +83,77 @@ class ModelService:
     
     def _initialize_llm(self):
         """
-        เตรียม LLM จาก Groq
+        เตรียม LLM ตาม LLM_BACKEND (groq หรือ fake สำหรับทดสอบแบบออฟไลน์)
         """
-        self.llm = ChatGroq(
-            groq_api_key=GROQ_API_KEY,
-            model_name=GROQ_MODEL_NAME,
-            temperature=0.1,  # ตั้งค่า temperature ต่ำเพื่อให้คำตอบแน่นอนมากขึ้น
-            max_tokens=4096,
+        backend = LLM_BACKENDS.get(LLM_BACKEND)
+        if backend is None:
+            raise ValueError(f"ไม่รู้จัก LLM_BACKEND: {LLM_BACKEND} (รองรับ: {', '.join(LLM_BACKENDS)})")
+        self.llm = backend()
+        
+        # ช่องทางเรียก LLM ที่จำกัดอัตราและลองใหม่เมื่อเจอ rate limit
+        self.gateway = LLMGateway(
+            requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+            tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+            max_concurrency=LLM_MAX_CONCURRENCY,
+            max_retries=LLM_MAX_RETRIES,
+            retry_base_delay=LLM_RETRY_BASE_DELAY,
+            retry_max_delay=LLM_RETRY_MAX_DELAY,
+            failure_threshold=LLM_CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=LLM_CIRCUIT_RESET_SECONDS,
+            completion_token_reserve=LLM_COMPLETION_TOKEN_RESERVE
         )
+        
+        # cache คำตอบของ LLM (เปิดใช้ผ่าน LLM_CACHE_ENABLED)
+        self.response_cache = None
+        if LLM_CACHE_ENABLED:
+            self.response_cache = LLMResponseCache(
+                ttl_seconds=LLM_CACHE_TTL_SECONDS,
+                max_entries=LLM_CACHE_MAX_ENTRIES,
+                db_path=LLM_CACHE_PATH or None
+            )
     
     def _initialize_embeddings(self):
         """
-        เตรียม Embeddings model จาก Hugging Face
+        เตรียม Embeddings model จาก Hugging Face ตาม EMBEDDING_BACKEND (torch หรือ onnx)
         """
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=EMBEDDING_MODEL_NAME,
-            model_kwargs={"device": "cpu"},  # เปลี่ยนเป็น "cuda" ถ้ามี GPU
-            encode_kwargs={"normalize_embeddings": True}
-        )
+        if EMBEDDING_BACKEND == "onnx":
+            # โมเดล ONNX แบบ int8 สำหรับเครื่องที่มีแต่ CPU
+            self.embeddings = create_onnx_embeddings(
+                EMBEDDING_MODEL_NAME,
+                EMBEDDING_ONNX_DIR,
+                quantization=EMBEDDING_ONNX_QUANTIZATION,
+                threads=EMBEDDING_THREADS
+            )
+        elif EMBEDDING_BACKEND == "torch":
+            if EMBEDDING_THREADS > 0:
+                torch.set_num_threads(EMBEDDING_THREADS)
+            self.embeddings = HuggingFaceEmbeddings(
+                model_name=EMBEDDING_MODEL_NAME,
+                model_kwargs={"device": "cpu"},  # เปลี่ยนเป็น "cuda" ถ้ามี GPU
+                encode_kwargs={"normalize_embeddings": True}
+            )
+        else:
+            raise ValueError(f"ไม่รู้จัก EMBEDDING_BACKEND: {EMBEDDING_BACKEND} (รองรับ: torch, onnx)")
+        
+        # รวมคำค้นหาจาก request ที่มาถึงพร้อมกันเป็น batch เดียว
+        self.embedding_batcher = None
+        if EMBEDDING_BATCH_WAIT_MS > 0:
+            self.embedding_batcher = MicroBatchingEmbeddings(
+                self.embeddings,
+                max_batch_size=EMBEDDING_BATCH_MAX_SIZE,
+                max_wait_ms=EMBEDDING_BATCH_WAIT_MS
+            )
+            self.embeddings = self.embedding_batcher
+        
+        # cache เวกเตอร์ของข้อความที่เคยคำนวณแล้ว (แยกตาม backend เพราะเวกเตอร์ต่างกันเล็กน้อย)
+        if EMBEDDING_CACHE_ENABLED:
+            self.embeddings = CachedEmbeddings(
+                self.embeddings,
+                model_name=get_embedding_model_id(),
+                max_size=EMBEDDING_CACHE_SIZE,
+                db_path=EMBEDDING_CACHE_PATH or None,
+                max_disk_entries=EMBEDDING_CACHE_MAX_ENTRIES
+            )
     
     def get_llm(self):
         """
@@ -49,6 +164,15 @@ class ModelService:
         """
         return self.llm
     
+    def get_llm_gateway(self):
+        """
+        ดึงช่องทางเรียก LLM ที่ใช้ร่วมกัน
+        
+        Returns:
+            LLMGateway instance
+        """
+        return self.gateway
+    
     def get_embeddings(self):
         """
         ดึง Embeddings instance
@@ -56,4 +180,69 @@ class ModelService:
         Returns:
             Embeddings instance
         """
-        return self.embeddings
\ No newline at end of file
+        return self.embeddings
+    
+    def get_embedding_batcher(self):
+        """
+        ดึงตัวรวม batch ของคำค้นหา
+        
+        Returns:
+            MicroBatchingEmbeddings instance หรือ None ถ้าไม่ได้เปิดใช้
+        """
+        return self.embedding_batcher
+    
+    def get_response_cache(self):
+        """
+        ดึง cache คำตอบของ LLM
+        
+        Returns:
+            LLMResponseCache instance หรือ None ถ้าไม่ได้เปิดใช้
+        """
+        return self.response_cache
+    
+    def warm_up(self):
+        """
+        เรียกใช้ Embeddings model หนึ่งครั้งเพื่อโหลด weights และเตรียม tokenizer
+        ก่อนรับ request แรก (ไม่เรียก LLM เพื่อไม่ให้เสียค่า API)
+        """
+        self.embeddings.embed_query("warm up")
+    
+    def close(self):
+        """ปล่อยทรัพยากรของโมเดลที่โหลดไว้"""
+        if isinstance(self.embeddings, CachedEmbeddings):
+            self.embeddings.close()
+        if self.embedding_batcher is not None:
+            self.embedding_batcher.close()
+            self.embedding_batcher = None
+        if self.response_cache is not None:
+            self.response_cache.close()
+            self.response_cache = None
+        self.llm = None
+        self.embeddings = None
+
+
+# ModelService ที่ใช้ร่วมกันทั้ง process
+_model_service: Optional[ModelService] = None
+_model_service_lock = threading.Lock()
+
+def get_model_service() -> ModelService:
+    """
+    ดึง ModelService ที่ใช้ร่วมกันทั้ง process (สร้างเมื่อเรียกครั้งแรก)
+    
+    Returns:
+        ModelService instance
+    """
+    global _model_service
+    if _model_service is None:
+        with _model_service_lock:
+            if _model_service is None:
+                _model_service = ModelService()
+    return _model_service
+
+def shutdown_model_service():
+    """ปิด ModelService ที่ใช้ร่วมกัน เพื่อให้การเรียก get_model_service ครั้งถัดไปสร้างใหม่"""
+    global _model_service
+    with _model_service_lock:
+        if _model_service is not None:
+            _model_service.close()
+            _model_service = None
@@ -0,0 +1,194 @@
+# backend/app/services/onnx_embedding_service.py
+import os
+import math
+import time
+import logging
+import importlib.util
+from typing import List, Dict
+from langchain_core.embeddings import Embeddings
+from langchain_huggingface import HuggingFaceEmbeddings
+
+# ข้อความตัวอย่างสำหรับตรวจความใกล้เคียงของเวกเตอร์ระหว่าง backend
+PARITY_SAMPLE_TEXTS = [
+    "หลักการ SOLID ช่วยให้ออกแบบซอฟต์แวร์ที่ดูแลรักษาง่าย",
+    "Singleton pattern ทำให้คลาสมี instance เพียงตัวเดียวในระบบ",
+    "การทดสอบหน่วย (unit test) ช่วยตรวจสอบการทำงานของแต่ละฟังก์ชัน",
+    "Scrum แบ่งการพัฒนาออกเป็น Sprint ที่มีระยะเวลาคงที่",
+    "Requirement engineering คือกระบวนการรวบรวมและวิเคราะห์ความต้องการของผู้ใช้",
+    "คำตอบของนักศึกษาอธิบายความแตกต่างระหว่าง coupling และ cohesion",
+    "Waterfall model เหมาะกับโครงการที่ความต้องการชัดเจนตั้งแต่ต้น",
+    "Design pattern แบบ Observer ใช้แจ้งเตือนเมื่อสถานะของ object เปลี่ยน"
+]
+
+logger = logging.getLogger(__name__)
+
+def _get_export_path(model_name: str, export_dir: str) -> str:
+    """
+    สร้างพาธของโมเดลที่ export เป็น ONNX แล้ว
+    
+    Args:
+        model_name: ชื่อโมเดลบน Hugging Face
+        export_dir: ไดเรกทอรีสำหรับเก็บโมเดลที่ export
+    
+    Returns:
+        พาธของไดเรกทอรีโมเดล
+    """
+    return os.path.join(export_dir, model_name.replace("/", "__"))
+
+def _require_onnx_dependencies():
+    """
+    ตรวจว่าติดตั้งแพ็กเกจที่ backend ONNX ต้องใช้แล้ว
+    
+    Raises:
+        ImportError: ถ้ายังไม่ได้ติดตั้ง optimum หรือ onnxruntime
+    """
+    missing = [name for name in ("optimum", "onnxruntime") if importlib.util.find_spec(name) is None]
+    if missing:
+        raise ImportError(
+            f"EMBEDDING_BACKEND=onnx ต้องติดตั้ง {', '.join(missing)} "
+            "(pip install \"sentence-transformers[onnx]\" หรือ pip install -r requirements.txt)"
+        )
+
+def export_quantized_onnx_model(model_name: str, export_dir: str, quantization: str = "avx2") -> str:
+    """
+    export โมเดล sentence-transformers เป็น ONNX และทำ dynamic int8 quantization (ครั้งเดียว)
+    
+    Args:
+        model_name: ชื่อโมเดลบน Hugging Face
+        export_dir: ไดเรกทอรีสำหรับเก็บโมเดลที่ export
+        quantization: ชุดคำสั่ง CPU ที่ใช้ quantize (arm64, avx2, avx512, avx512_vnni)
+    
+    Returns:
+        พาธของไฟล์ ONNX ที่ quantize แล้ว (สัมพัทธ์กับไดเรกทอรีโมเดล)
+        
+    Raises:
+        ImportError: ถ้ายังไม่ได้ติดตั้ง optimum หรือ onnxruntime
+    """
+    _require_onnx_dependencies()
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+    
+    model_path = _get_export_path(model_name, export_dir)
+    file_name = f"onnx/model_qint8_{quantization}.onnx"
+    if os.path.exists(os.path.join(model_path, file_name)):
+        return file_name
+    
+    logger.info("กำลัง export %s เป็น ONNX (int8, %s) ไปที่ %s", model_name, quantization, model_path)
+    model = SentenceTransformer(model_name, device="cpu", backend="onnx")
+    model.save(model_path)
+    export_dynamic_quantized_onnx_model(model, quantization, model_path)
+    return file_name
+
+def create_onnx_embeddings(
+    model_name: str,
+    export_dir: str,
+    quantization: str = "avx2",
+    threads: int = 0
+) -> HuggingFaceEmbeddings:
+    """
+    สร้าง Embeddings ที่รันโมเดล ONNX แบบ int8 บน CPU ด้วย onnxruntime
+    
+    ต้องติดตั้ง sentence-transformers[onnx] (optimum และ onnxruntime)
+    
+    Args:
+        model_name: ชื่อโมเดลบน Hugging Face
+        export_dir: ไดเรกทอรีสำหรับเก็บโมเดลที่ export
+        quantization: ชุดคำสั่ง CPU ที่ใช้ quantize (arm64, avx2, avx512, avx512_vnni)
+        threads: จำนวน intra-op thread ของ onnxruntime (0 = ค่าเริ่มต้นของ onnxruntime)
+    
+    Returns:
+        HuggingFaceEmbeddings ที่ใช้ backend ONNX
+        
+    Raises:
+        ImportError: ถ้ายังไม่ได้ติดตั้ง optimum หรือ onnxruntime
+    """
+    _require_onnx_dependencies()
+    import onnxruntime
+    
+    file_name = export_quantized_onnx_model(model_name, export_dir, quantization)
+    
+    session_options = onnxruntime.SessionOptions()
+    if threads > 0:
+        session_options.intra_op_num_threads = threads
+        session_options.inter_op_num_threads = 1
+    
+    return HuggingFaceEmbeddings(
+        model_name=_get_export_path(model_name, export_dir),
+        model_kwargs={
+            "device": "cpu",
+            "backend": "onnx",
+            "model_kwargs": {
+                "file_name": file_name,
+                "provider": "CPUExecutionProvider",
+                "session_options": session_options
+            }
+        },
+        encode_kwargs={"normalize_embeddings": True}
+    )
+
+def _cosine_similarity(a: List[float], b: List[float]) -> float:
+    """คำนวณ cosine similarity ของเวกเตอร์สองตัว"""
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+def check_embedding_parity(
+    reference: Embeddings,
+    candidate: Embeddings,
+    texts: List[str] = PARITY_SAMPLE_TEXTS,
+    min_similarity: float = 0.98
+) -> Dict[str, float]:
+    """
+    ตรวจว่าเวกเตอร์จาก backend ใหม่ใกล้เคียงกับ backend เดิม และเปรียบเทียบความเร็ว
+    
+    Args:
+        reference: Embeddings เดิม (PyTorch)
+        candidate: Embeddings ใหม่ (ONNX int8)
+        texts: ข้อความที่ใช้ตรวจ
+        min_similarity: cosine similarity ต่ำสุดที่ยอมรับได้
+    
+    Returns:
+        dict ของ cosine similarity ต่ำสุด/เฉลี่ย, เวลาที่ใช้ของแต่ละ backend และผลการตรวจ
+    """
+    # เรียกครั้งแรกเพื่อโหลดโมเดลก่อนจับเวลา
+    reference.embed_documents(texts[:1])
+    candidate.embed_documents(texts[:1])
+    
+    started = time.perf_counter()
+    reference_vectors = reference.embed_documents(texts)
+    reference_seconds = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    candidate_vectors = candidate.embed_documents(texts)
+    candidate_seconds = time.perf_counter() - started
+    
+    similarities = [_cosine_similarity(a, b) for a, b in zip(reference_vectors, candidate_vectors)]
+    return {
+        "min_similarity": min(similarities),
+        "mean_similarity": sum(similarities) / len(similarities),
+        "reference_seconds": reference_seconds,
+        "candidate_seconds": candidate_seconds,
+        "speedup": reference_seconds / candidate_seconds if candidate_seconds else 0.0,
+        "passed": min(similarities) >= min_similarity
+    }
+
+if __name__ == "__main__":
+    # ตรวจ parity ระหว่าง PyTorch กับ ONNX int8: python -m app.services.onnx_embedding_service
+    from ..config import EMBEDDING_MODEL_NAME, EMBEDDING_ONNX_DIR, EMBEDDING_ONNX_QUANTIZATION, EMBEDDING_THREADS
+    
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    reference_embeddings = HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME,
+        model_kwargs={"device": "cpu"},
+        encode_kwargs={"normalize_embeddings": True}
+    )
+    onnx_embeddings = create_onnx_embeddings(
+        EMBEDDING_MODEL_NAME,
+        EMBEDDING_ONNX_DIR,
+        quantization=EMBEDDING_ONNX_QUANTIZATION,
+        threads=EMBEDDING_THREADS
+    )
+    result = check_embedding_parity(reference_embeddings, onnx_embeddings, PARITY_SAMPLE_TEXTS * 16)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+    raise SystemExit(0 if result["passed"] else 1)
+
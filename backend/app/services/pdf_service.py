@@ -0,0 +1,34 @@
+# backend/app/services/pdf_service.py
+# ฟังก์ชันในไฟล์นี้ถูกเรียกใน worker process จึงต้อง import เฉพาะสิ่งที่จำเป็นเพื่อให้เริ่ม process ได้เร็ว
+from typing import List
+import fitz  # PyMuPDF
+
+def open_pdf(source):
+    """
+    เปิดเอกสาร PDF จากพาธของไฟล์หรือจากข้อมูลไบต์ในหน่วยความจำ
+    
+    Args:
+        source: พาธของไฟล์ PDF หรือ bytes/bytearray/memoryview ของไฟล์
+        
+    Returns:
+        fitz.Document
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        # เปิดจาก buffer โดยตรง ไม่ต้องเขียนไฟล์ชั่วคราว
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
+
+def extract_page_range(source, start: int, end: int) -> List[str]:
+    """
+    สกัดข้อความจากช่วงหน้าของ PDF (ใช้ใน worker process)
+    
+    Args:
+        source: พาธของไฟล์ PDF หรือ bytes ของไฟล์
+        start: หน้าแรก (เริ่มจาก 0)
+        end: หน้าสุดท้าย (ไม่รวม)
+        
+    Returns:
+        รายการข้อความของแต่ละหน้าในช่วงนั้น
+    """
+    with open_pdf(source) as doc:
+        return [doc[page_num].get_text("text") for page_num in range(start, end)]
@@ -1,41 +1,242 @@
 # backend/app/services/rag_service.py
 import os
+import re
+import json
+import time
 import tempfile
-import fitz  # PyMuPDF
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import chromadb
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
 from typing import List, Dict, Any, Optional
-from .model_service import ModelService
-from ..config import CHROMA_DB_DIRECTORY
+from .model_service import ModelService, get_model_service, get_embedding_model_id
+from .executor_service import run_blocking, get_process_executor
+from .pdf_service import open_pdf, extract_page_range
+from .lexical_index_service import BM25Index, reciprocal_rank_fusion
+from .exact_search_service import ExactSearchIndex
+from ..models.schemas import ID_PATTERN, ID_MAX_LENGTH
+from ..config import CHROMA_DB_DIRECTORY, VECTOR_STORE_CACHE_SIZE, INDEX_BATCH_SIZE
+from ..config import PROCESS_EXECUTOR_WORKERS, PDF_PARALLEL_PAGE_THRESHOLD
+from ..config import HYBRID_RETRIEVAL_ENABLED, HYBRID_CANDIDATES, RRF_K
+from ..config import EXACT_SEARCH_ENABLED, EXACT_SEARCH_MAX_VECTORS, RETRIEVAL_METADATA_FILTER
+from ..config import COLLECTION_LAYOUT
+
+logger = logging.getLogger(__name__)
+
+# รูปแบบการจัดเก็บ collection: หนึ่ง collection ต่อคำถาม หรือหนึ่ง collection ต่อวิชา
+COLLECTION_LAYOUTS = ("question", "subject")
+
+# รุ่นของชิ้นส่วนเฉลยที่ index ก่อนมี manifest (ผูกกับรุ่นนี้ก่อน index เฉลยใหม่ทับ)
+LEGACY_GENERATION = "legacy"
+
+# Chroma client ที่ใช้ร่วมกันทั้ง process แยกตามโฟลเดอร์ที่เก็บข้อมูล
+_chroma_clients: Dict[str, Any] = {}
+_chroma_clients_lock = threading.Lock()
+
+def validate_question_ids(subject_id, question_id):
+    """
+    ตรวจรหัสวิชาและรหัสคำถามก่อนนำไปใช้สร้างชื่อ collection หรือพาธของไฟล์
+    
+    Args:
+        subject_id: รหัสวิชา
+        question_id: รหัสคำถาม
+        
+    Raises:
+        ValueError: ถ้ารหัสมีอักขระอื่นนอกจากตัวอักษร ตัวเลข _ และ -, ไม่ได้ขึ้นต้นหรือลงท้ายด้วยตัวอักษรหรือตัวเลข
+            หรือยาวเกิน ID_MAX_LENGTH
+    """
+    for name, value in (("subject_id", subject_id), ("question_id", question_id)):
+        if not isinstance(value, str) or not re.fullmatch(ID_PATTERN, value):
+            raise ValueError(
+                f"{name} ต้องประกอบด้วยตัวอักษร ตัวเลข _ หรือ - และขึ้นต้นและลงท้ายด้วยตัวอักษรหรือตัวเลข: {value!r}"
+            )
+        if len(value) > ID_MAX_LENGTH:
+            raise ValueError(f"{name} ต้องยาวไม่เกิน {ID_MAX_LENGTH} ตัวอักษร: {value!r}")
+
+def get_question_key(subject_id, question_id):
+    """
+    สร้างคีย์ของคำถาม (ใช้กับ cache, lock และไฟล์ lexical index ในทุกรูปแบบ collection)
+    
+    Args:
+        subject_id: รหัสวิชา
+        question_id: รหัสคำถาม
+        
+    Returns:
+        คีย์ของคำถาม
+        
+    Raises:
+        ValueError: ถ้ารหัสวิชาหรือรหัสคำถามไม่ถูกต้อง
+    """
+    validate_question_ids(subject_id, question_id)
+    return f"{subject_id}_{question_id}"
+
+def get_collection_name(subject_id, question_id, layout="question"):
+    """
+    สร้างชื่อ collection ของคำถามตามรูปแบบการจัดเก็บ
+    
+    Args:
+        subject_id: รหัสวิชา
+        question_id: รหัสคำถาม
+        layout: รูปแบบ collection ("question" หรือ "subject")
+        
+    Returns:
+        ชื่อ collection
+    """
+    if layout == "subject":
+        validate_question_ids(subject_id, question_id)
+        return f"subject_{subject_id}"
+    return get_question_key(subject_id, question_id)
+
+def get_chunk_id_prefix(question_id, layout="question"):
+    """
+    สร้าง prefix ของรหัสชิ้นส่วน (collection ต่อวิชาต้องแยกรหัสของแต่ละคำถาม)
+    
+    Args:
+        question_id: รหัสคำถาม
+        layout: รูปแบบ collection ("question" หรือ "subject")
+        
+    Returns:
+        prefix ของรหัสชิ้นส่วน
+    """
+    return f"{question_id}_" if layout == "subject" else ""
+
+def get_lexical_index_path(persist_directory, question_key, generation=None):
+    """
+    สร้างพาธของไฟล์ lexical index ของคำถาม
+    
+    Args:
+        persist_directory: โฟลเดอร์ที่ใช้เก็บข้อมูล ChromaDB
+        question_key: คีย์ของคำถาม
+        generation: รุ่นของเฉลย (None = ไฟล์ของเฉลยที่ index ก่อนมี manifest)
+        
+    Returns:
+        พาธของไฟล์ JSON
+    """
+    if generation is None:
+        return os.path.join(persist_directory, "lexical", f"{question_key}.json")
+    return os.path.join(persist_directory, "lexical", f"{question_key}.{generation[:16]}.json")
+
+def get_manifest_path(persist_directory, question_key):
+    """
+    สร้างพาธของไฟล์ manifest ที่ระบุรุ่นของเฉลยที่ใช้งานอยู่ของคำถาม
+    
+    Args:
+        persist_directory: โฟลเดอร์ที่ใช้เก็บข้อมูล ChromaDB
+        question_key: คีย์ของคำถาม
+        
+    Returns:
+        พาธของไฟล์ JSON
+    """
+    return os.path.join(persist_directory, "manifests", f"{question_key}.json")
+
+def get_chroma_client(persist_directory=CHROMA_DB_DIRECTORY):
+    """
+    ดึง Chroma persistent client ที่ใช้ร่วมกันทั้ง process
+    
+    Args:
+        persist_directory: โฟลเดอร์ที่ใช้เก็บข้อมูล ChromaDB
+        
+    Returns:
+        chromadb PersistentClient
+    """
+    path = os.path.abspath(persist_directory)
+    with _chroma_clients_lock:
+        client = _chroma_clients.get(path)
+        if client is None:
+            client = chromadb.PersistentClient(path=path)
+            _chroma_clients[path] = client
+        return client
 
 class AnswerEvaluationService:
-    def __init__(self, persist_directory=CHROMA_DB_DIRECTORY):
+    # ค่าตั้งของตัวแบ่งข้อความ (ใช้ร่วมกับ fingerprint ของเฉลยด้วย)
+    TEXT_SPLITTER_CONFIG = {
+        "chunk_size": 350,
+        "chunk_overlap": 150,
+        "separators": [
+            "==== หน้า ",
+            "\n\n",
+            "\n",
+            ". ", "? ", "! ",
+            "   ", " ",
+            ".", "?", "!", ":", ";", "—", "–",
+            ""
+        ]
+    }
+    
+    # ตัวนับสถิติการค้นหา (ดู get_retrieval_stats)
+    RETRIEVAL_STAT_NAMES = (
+        "queries",
+        "exact_searches",
+        "filtered_searches",
+        "unfiltered_searches",
+        "filter_fallbacks",
+        "exact_search_errors",
+        "embedding_errors",
+        "search_errors"
+    )
+    
+    def __init__(self, persist_directory=CHROMA_DB_DIRECTORY, model_service: Optional[ModelService] = None, collection_layout=COLLECTION_LAYOUT):
         """
         เริ่มต้นบริการประเมินคำตอบด้วย ChromaDB และ AI Models
         
         Args:
             persist_directory: โฟลเดอร์ที่ใช้เก็บข้อมูล ChromaDB
+            model_service: ModelService ที่ต้องการใช้ (ค่าเริ่มต้นคือตัวที่ใช้ร่วมกันทั้ง process)
+            collection_layout: รูปแบบ collection ("question" หรือ "subject")
         """
+        if collection_layout not in COLLECTION_LAYOUTS:
+            raise ValueError(f"ไม่รองรับ COLLECTION_LAYOUT: {collection_layout}")
+        
         # สร้างโฟลเดอร์สำหรับเก็บข้อมูลถ้ายังไม่มี
         os.makedirs(persist_directory, exist_ok=True)
         
         # เตรียม services และ models
-        self._setup_services(persist_directory)
+        self._setup_services(persist_directory, model_service, collection_layout)
         
-    def _setup_services(self, persist_directory):
+    def _setup_services(self, persist_directory, model_service=None, collection_layout="question"):
         """
         เตรียม services และตัวแบ่งข้อความ
         
         Args:
             persist_directory: โฟลเดอร์ที่ใช้เก็บข้อมูล ChromaDB
+            model_service: ModelService ที่ต้องการใช้
+            collection_layout: รูปแบบ collection
         """
-        # ดึงโมเดล embeddings จาก ModelService
-        self.model_service = ModelService()
+        # ดึงโมเดล embeddings จาก ModelService ที่ใช้ร่วมกัน
+        self.model_service = model_service or get_model_service()
         self.embeddings = self.model_service.get_embeddings()
         
         self.persist_directory = persist_directory
+        self.collection_layout = collection_layout
+        self.chroma_client = get_chroma_client(persist_directory)
         self.text_splitter = self._create_text_splitter()
+        
+        # cache ของ vector store แยกตาม collection และ lexical/exact index แยกตามคำถาม (LRU)
+        self._vector_stores = OrderedDict()
+        self._lexical_indexes = OrderedDict()
+        self._exact_indexes = OrderedDict()
+        self._answer_key_documents = OrderedDict()
+        self._vector_stores_lock = threading.Lock()
+        
+        # ตัวนับการล้าง cache ต่อคำถาม ใช้กันไม่ให้ผลที่โหลดก่อนการล้างถูกใส่กลับเข้า cache
+        self._cache_generations = {}
+        
+        # manifest ที่อ่านแล้ว แยกตามคำถาม พร้อมข้อมูลไฟล์ (อ่านใหม่เมื่อไฟล์เปลี่ยน)
+        self._manifests = {}
+        self.vector_store_cache_size = VECTOR_STORE_CACHE_SIZE
+        
+        # สถิติการค้นหาแยกตามวิธีค้นหาและ fallback
+        self._retrieval_stats = dict.fromkeys(self.RETRIEVAL_STAT_NAMES, 0)
+        self._retrieval_stats_lock = threading.Lock()
+        
+        # lock แยกตามคำถามเพื่อไม่ให้ index เฉลยของคำถามเดียวกันซ้อนกัน
+        self._index_locks = {}
+        self._index_locks_lock = threading.Lock()
     
     def _create_text_splitter(self):
         """
@@ -45,41 +246,75 @@ class AnswerEvaluationService:
             RecursiveCharacterTextSplitter สำหรับแบ่งเอกสาร
         """
         return RecursiveCharacterTextSplitter(
-            chunk_size=350,
-            chunk_overlap=150,
+            **self.TEXT_SPLITTER_CONFIG,
             length_function=len,
-            add_start_index=True,
-            separators=[
-                "==== หน้า ",
-                "\n\n",
-                "\n",
-                ". ", "? ", "! ",
-                "   ", " ",
-                ".", "?", "!", ":", ";", "—", "–",
-                ""
-            ]
+            add_start_index=True
         )
         
-    def extract_text_from_pdf(self, file_path: str) -> str:
+    def iter_pdf_pages(self, source):
+        """
+        สกัดข้อความจาก PDF ทีละหน้าแบบ lazy
+        
+        Args:
+            source: พาธของไฟล์ PDF หรือ bytes/bytearray/memoryview ของไฟล์
+            
+        Yields:
+            Tuple (หมายเลขหน้าเริ่มจาก 1, ข้อความของหน้านั้น)
+        """
+        # ใช้ with statement เพื่อจัดการทรัพยากรอย่างมีประสิทธิภาพ
+        with open_pdf(source) as doc:
+            for page_num in range(len(doc)):
+                yield page_num + 1, doc[page_num].get_text("text")
+    
+    def _extract_page_texts(self, source):
+        """
+        สกัดข้อความทุกหน้าของ PDF โดยแบ่งทำขนานกันหลาย process เมื่อเอกสารยาว
+        
+        Args:
+            source: พาธของไฟล์ PDF หรือ bytes/bytearray/memoryview ของไฟล์
+            
+        Returns:
+            รายการข้อความของแต่ละหน้าตามลำดับ
+        """
+        with open_pdf(source) as doc:
+            page_count = len(doc)
+        
+        workers = PROCESS_EXECUTOR_WORKERS
+        if page_count < PDF_PARALLEL_PAGE_THRESHOLD or workers <= 1:
+            return [page_text for _, page_text in self.iter_pdf_pages(source)]
+        
+        # memoryview ส่งข้าม process ไม่ได้ จึงต้องแปลงเป็น bytes
+        if isinstance(source, (bytearray, memoryview)):
+            source = bytes(source)
+        
+        # แบ่งหน้าเป็นช่วงเท่าๆ กันตามจำนวน worker
+        step = -(-page_count // workers)
+        ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+        executor = get_process_executor()
+        futures = [executor.submit(extract_page_range, source, start, end) for start, end in ranges]
+        
+        page_texts = []
+        for future in futures:
+            page_texts.extend(future.result())
+        return page_texts
+    
+    def extract_text_from_pdf(self, file_path) -> str:
         """
         สกัดข้อความจากไฟล์ PDF
         
         Args:
-            file_path: พาธของไฟล์ PDF
+            file_path: พาธของไฟล์ PDF หรือข้อมูลไบต์ของไฟล์
             
         Returns:
             ข้อความที่สกัดได้จาก PDF
         """
-        text = ""
-        
-        # ใช้ with statement เพื่อจัดการทรัพยากรอย่างมีประสิทธิภาพ
-        with fitz.open(file_path) as doc:
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                page_text = page.get_text("text")
-                text += page_text + f"\n\n====หน้า {page_num + 1}====\n\n"
+        page_texts = self._extract_page_texts(file_path)
         
-        return text
+        # รวมข้อความด้วย join เพื่อให้ใช้เวลาเชิงเส้นกับจำนวนหน้า
+        return "".join(
+            f"{page_text}\n\n====หน้า {page_number}====\n\n"
+            for page_number, page_text in enumerate(page_texts, start=1)
+        )
         
     def load_pdf_document(self, file_content, file_name, metadata=None):
         """
@@ -94,30 +329,43 @@ class AnswerEvaluationService:
             เอกสารที่โหลดได้
         """
         metadata = metadata or {}
-        temp_path = None
-
-        try:
-            # สร้างไฟล์ชั่วคราว
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-                temp_file.write(file_content)
-                temp_path = temp_file.name
-            
-            # สกัดข้อความจาก PDF
-            text_content = self.extract_text_from_pdf(temp_path)
-            
-            # สร้างเอกสาร
-            return [
-                Document(
-                    page_content=text_content,
-                    metadata={**metadata, "source": file_name}
-                )
-            ]
-        finally:
-            # ลบไฟล์ชั่วคราวหลังใช้งาน
-            if temp_path and os.path.exists(temp_path):
-                os.unlink(temp_path)
         
-    def index_answer_key(self, answer_key_content, subject_id, question_id, file_name=None):
+        # สกัดข้อความจาก PDF ในหน่วยความจำ
+        text_content = self.extract_text_from_pdf(memoryview(file_content))
+        
+        # สร้างเอกสาร
+        return [
+            Document(
+                page_content=text_content,
+                metadata={**metadata, "source": file_name}
+            )
+        ]
+    
+    def extract_text_from_pdf_content(self, file_content: bytes) -> str:
+        """
+        สกัดข้อความจากข้อมูลไบต์ของไฟล์ PDF
+        
+        Args:
+            file_content: เนื้อหาของไฟล์ในรูปแบบไบต์
+            
+        Returns:
+            ข้อความที่สกัดได้จาก PDF
+        """
+        return self.extract_text_from_pdf(memoryview(file_content))
+    
+    async def aextract_text_from_pdf_content(self, file_content: bytes) -> str:
+        """
+        สกัดข้อความจากข้อมูลไบต์ของไฟล์ PDF โดยไม่ block event loop
+        
+        Args:
+            file_content: เนื้อหาของไฟล์ในรูปแบบไบต์
+            
+        Returns:
+            ข้อความที่สกัดได้จาก PDF
+        """
+        return await run_blocking(self.extract_text_from_pdf_content, file_content)
+        
+    def index_answer_key(self, answer_key_content, subject_id, question_id, file_name=None, progress_callback=None):
         """
         เก็บเอกสารเฉลยในฐานข้อมูล ChromaDB
         
@@ -126,18 +374,28 @@ class AnswerEvaluationService:
             subject_id: รหัสวิชา
             question_id: รหัสคำถาม
             file_name: ชื่อไฟล์ (ถ้ามี)
+            progress_callback: ฟังก์ชันรับความคืบหน้า progress_callback(stage, **info)
             
         Returns:
             จำนวนชิ้นส่วนที่แบ่งได้
         """
         self._validate_pdf_file(file_name)
+        report = progress_callback or (lambda stage, **info: None)
+        
+        # ข้ามการ index ถ้าเฉลยนี้ถูก index ไว้แล้ว
+        fingerprint = self.compute_fingerprint(answer_key_content)
+        indexed_chunks = self.get_indexed_chunk_count(subject_id, question_id, fingerprint)
+        if indexed_chunks:
+            report("skipped", total_chunks=indexed_chunks)
+            return indexed_chunks
         
         # สร้าง metadata และโหลดเอกสาร
+        report("parse")
         metadata = self._create_answer_metadata(subject_id, question_id)
         documents = self.load_pdf_document(answer_key_content, file_name, metadata)
         
         # แบ่งเอกสารและบันทึกลง ChromaDB
-        return self._split_and_store_documents(documents, subject_id, question_id)
+        return self._split_and_store_documents(documents, subject_id, question_id, fingerprint, progress_callback)
     
     def index_answer_key_text(self, text_content, subject_id, question_id):
         """
@@ -156,7 +414,8 @@ class AnswerEvaluationService:
         documents = [Document(page_content=text_content, metadata={**metadata, "source": f"answer_key_{question_id}.txt"})]
         
         # แบ่งเอกสารและบันทึกลง ChromaDB
-        return self._split_and_store_documents(documents, subject_id, question_id)
+        fingerprint = self.compute_fingerprint(text_content.encode("utf-8"))
+        return self._split_and_store_documents(documents, subject_id, question_id, fingerprint)
     
     def _validate_pdf_file(self, file_name):
         """
@@ -188,36 +447,400 @@ class AnswerEvaluationService:
             "question_id": question_id
         }
     
-    def _split_and_store_documents(self, documents, subject_id, question_id):
+    def compute_fingerprint(self, content: bytes) -> str:
+        """
+        สร้าง fingerprint ของเฉลยจากเนื้อหาไฟล์ ค่าตั้งของตัวแบ่งข้อความ และโมเดล embeddings
+        
+        เมื่อเปลี่ยนโมเดลหรือ backend ของ embeddings เฉลยเดิมจะถูก index ใหม่ เพราะเวกเตอร์เดิมใช้ร่วมกันไม่ได้
+        
+        Args:
+            content: เนื้อหาของเฉลยในรูปแบบไบต์
+            
+        Returns:
+            SHA-256 hex digest
+        """
+        digest = hashlib.sha256(content)
+        digest.update(json.dumps(self.TEXT_SPLITTER_CONFIG, sort_keys=True).encode("utf-8"))
+        digest.update(get_embedding_model_id().encode("utf-8"))
+        return digest.hexdigest()
+    
+    def read_manifest(self, subject_id, question_id):
+        """
+        อ่าน manifest ของเฉลยที่ใช้งานอยู่ของคำถาม
+        
+        Args:
+            subject_id: รหัสวิชา
+            question_id: รหัสคำถาม
+            
+        Returns:
+            dict ของ fingerprint และจำนวนชิ้นส่วน หรือ None ถ้ายังไม่มี (เฉลยที่ index ก่อนมี manifest)
+        """
+        question_key = get_question_key(subject_id, question_id)
+        path = get_manifest_path(self.persist_directory, question_key)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        
+        # manifest ถูกแทนที่ด้วย os.replace เสมอ จึงใช้ inode และเวลาแก้ไขตรวจว่าไฟล์เปลี่ยนหรือไม่
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        cached = self._manifests.get(question_key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        
+        try:
+            with open(path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return None
+        self._manifests[question_key] = (signature, manifest)
+        return manifest
+    
+    def _write_manifest(self, subject_id, question_id, manifest):
+        """
+        บันทึก manifest ของคำถามแบบ atomic (เขียนไฟล์ชั่วคราวแล้ว replace)
+        
+        Args:
+            subject_id: รหัสวิชา
+            question_id: รหัสคำถาม
+            manifest: dict ของ fingerprint และจำนวนชิ้นส่วน
+        """
+        path = get_manifest_path(self.persist_directory, get_question_key(subject_id, question_id))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # ไฟล์ชั่วคราวต้องไม่ซ้ำกัน เพราะหลาย process อาจเขียน manifest ของคำถามเดียวกันพร้อมกัน
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=os.path.dirname(path),
+            prefix=f"{os.path.basename(path)}.", suffix=".tmp", delete=False
+        ) as f:
+            temp_path = f.name
+            try:
+                json.dump(manifest, f)
+            except BaseException:
+                f.close()
+                os.remove(temp_path)
+                raise
+        os.replace(temp_path, path)
+    
+    def get_active_generation(self, subject_id, question_id):
+        """
+        ดึงรุ่น (fingerprint) ของเฉลยที่ใช้งานอยู่ของคำถาม
+        
+        Args:
+            subject_id: รหัสวิชา
+            question_id: รหัสคำถาม
+            
+        Returns:
+            fingerprint ของเฉลยที่ใช้งานอยู่ หรือ None ถ้ายังไม่มี manifest
+        """
+        manifest = self.read_manifest(subject_id, question_id)
+        return manifest["fingerprint"] if manifest else None
+    
+    def get_indexed_chunk_count(self, subject_id, question_id, fingerprint):
+        """
+        ตรวจสอบว่าเฉลยที่มี fingerprint นี้ถูก index ไว้แล้วหรือไม่
+        
+        Args:
+            subject_id: รหัสวิชา
+            question_id: รหัสคำถาม
+            fingerprint: fingerprint ของเฉลย
+            
+        Returns:
+            จำนวนชิ้นส่วนที่ index ไว้ (0 ถ้ายังไม่มีหรือเฉลยเปลี่ยนไป)
+        """
+        # ถือว่า index แล้วก็ต่อเมื่อเฉลยที่ใช้งานอยู่คือเฉลยนี้และชิ้นส่วนครบตาม manifest
+        manifest = self.read_manifest(subject_id, question_id)
+        if manifest is None or manifest["fingerprint"] != fingerprint:
+            return 0
+        
+        vector_store = self.get_vector_store_for_question(subject_id, question_id)
+        fingerprint_ids = vector_store.get(
+            where=self._get_question_where(subject_id, question_id, fingerprint=fingerprint), include=[]
+        )["ids"]
+        return len(fingerprint_ids) if len(fingerprint_ids) == manifest["chunk_count"] else 0
+    
+    def _get_index_lock(self, question_key):
+        """
+        ดึง lock สำหรับการ index ของคำถาม
+        
+        Args:
+            question_key: คีย์ของคำถาม
+            
+        Returns:
+            threading.Lock ของคำถามนั้น
+        """
+        with self._index_locks_lock:
+            return self._index_locks.setdefault(question_key, threading.Lock())
+    
+    def _split_and_store_documents(self, documents, subject_id, question_id, fingerprint=None, progress_callback=None):
         """
         แบ่งเอกสารเป็นส่วนย่อยและบันทึกลง ChromaDB
         
+        ถ้าเฉลยที่มี fingerprint เดียวกันถูก index ไว้แล้วจะข้ามไป
+        ถ้าเฉลยเปลี่ยน ชิ้นส่วนใหม่จะถูกเขียนเป็นรุ่นใหม่ (แยกด้วย fingerprint) ซึ่งการค้นหายังมองไม่เห็น
+        จนกว่าจะเขียนครบและสลับ manifest ไปที่รุ่นใหม่ แล้วจึงลบชิ้นส่วนรุ่นเก่า
+        
         Args:
             documents: เอกสารที่ต้องการแบ่ง
             subject_id: รหัสวิชา
             question_id: รหัสคำถาม
+            fingerprint: fingerprint ของเฉลย (ถ้าไม่ระบุจะคำนวณจากเนื้อหาเอกสาร)
+            progress_callback: ฟังก์ชันรับความคืบหน้า progress_callback(stage, **info)
             
         Returns:
             จำนวนชิ้นส่วนที่แบ่งได้
         """
-        # แบ่งเอกสารเป็นส่วนย่อย
-        splits = self.text_splitter.split_documents(documents)
+        report = progress_callback or (lambda stage, **info: None)
         
-        # สร้าง collection name และบันทึกลง ChromaDB
-        collection_name = f"{subject_id}_{question_id}"
-        db = Chroma.from_documents(
-            documents=splits,
-            embedding=self.embeddings,
-            persist_directory=self.persist_directory,
-            collection_name=collection_name
-        )
+        if fingerprint is None:
+            content = "".join(doc.page_content for doc in documents)
+            fingerprint = self.compute_fingerprint(content.encode("utf-8"))
         
-        # บันทึกลงดิสก์ถ้าเป็นไปได้
-        if hasattr(db, 'persist'):
-            db.persist()
+        question_key = get_question_key(subject_id, question_id)
+        with self._get_index_lock(question_key):
+            indexed_chunks = self.get_indexed_chunk_count(subject_id, question_id, fingerprint)
+            if indexed_chunks:
+                report("skipped", total_chunks=indexed_chunks)
+                return indexed_chunks
+            
+            # แบ่งเอกสารเป็นส่วนย่อย
+            splits = self.text_splitter.split_documents(documents)
+            for split in splits:
+                split.metadata["fingerprint"] = fingerprint
+            prefix = get_chunk_id_prefix(question_id, self.collection_layout)
+            ids = [f"{prefix}{fingerprint[:16]}_{i}" for i in range(len(splits))]
+            
+            vector_store = self.get_vector_store_for_question(subject_id, question_id)
+            old_ids = set(
+                vector_store.get(where=self._get_question_where(subject_id, question_id), include=[])["ids"]
+            ) - set(ids)
+            previous_generation = self.get_active_generation(subject_id, question_id)
+            collection = self.chroma_client.get_or_create_collection(
+                self._get_collection_name(subject_id, question_id), embedding_function=None
+            )
+            
+            # คำถามที่ยังไม่มี manifest การค้นหาจะใช้ทุกชิ้นส่วนของคำถาม จึงต้องผูกชิ้นส่วนเดิมกับรุ่น legacy
+            # และเขียน manifest ก่อน ไม่เช่นนั้นการค้นหาระหว่าง index จะเห็นชิ้นส่วนรุ่นใหม่ที่ยังเขียนไม่ครบปนอยู่
+            if previous_generation is None:
+                previous_generation = self._adopt_legacy_generation(collection, subject_id, question_id)
+            
+            # แปลงเป็น embeddings และบันทึกลง ChromaDB ทีละ batch (รุ่นใหม่ยังไม่ถูกใช้ค้นหา)
+            self._embed_and_store_in_batches(collection, splits, ids, report)
+            
+            # สร้าง lexical index ของรุ่นใหม่ก่อนสลับ
+            report("store", total_chunks=len(splits))
+            BM25Index.build(ids, [split.page_content for split in splits]).save(
+                self._get_lexical_index_path(question_key, fingerprint)
+            )
+            
+            # บันทึกลงดิสก์ถ้าเป็นไปได้
+            if hasattr(vector_store, 'persist'):
+                vector_store.persist()
+            
+            # สลับไปใช้รุ่นใหม่ แล้วล้าง cache ของคำถามนี้
+            self._write_manifest(subject_id, question_id, {"fingerprint": fingerprint, "chunk_count": len(splits)})
+            self.invalidate_vector_store(subject_id, question_id)
+            
+            # ลบชิ้นส่วนและ lexical index ของรุ่นเก่า
+            if old_ids:
+                vector_store.delete(ids=list(old_ids))
+            if previous_generation != fingerprint:
+                self._remove_lexical_index(question_key, previous_generation)
+            if previous_generation == LEGACY_GENERATION:
+                self._remove_lexical_index(question_key)
         
+        report("done", total_chunks=len(splits))
         return len(splits)
     
+    def _adopt_legacy_generation(self, collection, subject_id, question_id):
+        """
+        ผูกชิ้นส่วนของเฉลยที่ index ก่อนมี manifest กับรุ่น legacy แล้วเขียน manifest ของรุ่นนั้น
+        
+        Args:
+            collection: Chroma collection ของคำถาม
+            subject_id: รหัสวิชา
+            question_id: รหัสคำถาม
+            
+        Returns:
+            LEGACY_GENERATION
+        """
+        question_key = get_question_key(subject_id, question_id)
+        stored = collection.get(where=self._get_question_where(subject_id, question_id), include=["metadatas"])
+        for start in range(0, len(stored["ids"]), INDEX_BATCH_SIZE):
+            collection.update(
+                ids=stored["ids"][start:start + INDEX_BATCH_SIZE],
+                metadatas=[
+                    {**(metadata or {}), "fingerprint": LEGACY_GENERATION}
+                    for metadata in stored["metadatas"][start:start + INDEX_BATCH_SIZE]
+                ]
+            )
+        
+        # ใช้ lexical index เดิมเป็นของรุ่น legacy (ไม่มีก็สร้างใหม่ตอนใช้งาน)
+        try:
+            os.replace(
+                self._get_lexical_index_path(question_key),
+                self._get_lexical_index_path(question_key, LEGACY_GENERATION)
+            )
+        except FileNotFoundError:
+            pass
+        
+        self._write_manifest(
+            subject_id, question_id, {"fingerprint": LEGACY_GENERATION, "chunk_count": len(stored["ids"])}
+        )
+        self.invalidate_vector_store(subject_id, question_id)
+        return LEGACY_GENERATION
+    
+    def _embed_and_store_in_batches(self, collection, splits, ids, report):
+        """
+        แปลงชิ้นส่วนเป็น embeddings และบันทึกลง ChromaDB ทีละ batch
+        
+        การเขียน batch หนึ่งลง ChromaDB ทำใน thread แยกพร้อมกับการคำนวณ embeddings ของ batch ถัดไป
+        และมี embeddings ค้างในหน่วยความจำไม่เกินสอง batch
+        
+        Args:
+            collection: Chroma collection ของคำถาม
+            splits: ชิ้นส่วนของเอกสาร
+            ids: รหัสของแต่ละชิ้นส่วน
+            report: ฟังก์ชันรับความคืบหน้า
+            
+        Returns:
+            รายการเวลาที่ใช้ของแต่ละ batch
+        """
+        batch_size = INDEX_BATCH_SIZE
+        batch_timings = []
+        embedded_chunks = 0
+        stored_chunks = 0
+        pending = None
+        
+        def collect(future):
+            nonlocal stored_chunks
+            timing = future.result()
+            batch_timings.append(timing)
+            stored_chunks += timing["size"]
+            report(
+                "embed",
+                total_chunks=len(splits),
+                embedded_chunks=embedded_chunks,
+                stored_chunks=stored_chunks,
+                batch_timings=list(batch_timings)
+            )
+        
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="chroma-writer") as writer:
+            for start in range(0, len(splits), batch_size):
+                batch = splits[start:start + batch_size]
+                texts = [split.page_content for split in batch]
+                
+                started = time.perf_counter()
+                vectors = self.embeddings.embed_documents(texts)
+                embed_seconds = time.perf_counter() - started
+                embedded_chunks += len(batch)
+                
+                # รอให้ batch ก่อนหน้าเขียนเสร็จก่อนส่ง batch นี้
+                if pending is not None:
+                    collect(pending)
+                
+                pending = writer.submit(
+                    self._upsert_batch,
+                    collection,
+                    ids[start:start + batch_size],
+                    vectors,
+                    texts,
+                    [split.metadata for split in batch],
+                    embed_seconds
+                )
+            
+            if pending is not None:
+                collect(pending)
+        
+        if batch_timings:
+            embed_total = sum(timing["embed_seconds"] for timing in batch_timings)
+            store_total = sum(timing["store_seconds"] for timing in batch_timings)
+            logger.info(
+                "index %d ชิ้นส่วนใน %d batch (embed %.2fs, store %.2fs)",
+                len(splits), len(batch_timings), embed_total, store_total
+            )
+        return batch_timings
+    
+    def _upsert_batch(self, collection, ids, vectors, texts, metadatas, embed_seconds):
+        """
+        บันทึก embeddings หนึ่ง batch ลง ChromaDB ผ่าน collection API ของ chromadb โดยตรง
+        
+        Args:
+            collection: Chroma collection ของคำถาม
+            ids: รหัสของชิ้นส่วน
+            vectors: embeddings ของชิ้นส่วน
+            texts: ข้อความของชิ้นส่วน
+            metadatas: metadata ของชิ้นส่วน
+            embed_seconds: เวลาที่ใช้คำนวณ embeddings ของ batch นี้
+        
+        Returns:
+            dict เวลาที่ใช้ของ batch นี้
+        """
+        started = time.perf_counter()
+        collection.upsert(
+            ids=ids,
+            embeddings=vectors,
+            documents=texts,
+            metadatas=metadatas
+        )
+        return {
+            "size": len(ids),
+            "embed_seconds": embed_seconds,
+            "store_seconds": time.perf_counter() - started
+        }
+    
+    def _get_collection_name(self, subject_id, question_id):
+        """
+        สร้างชื่อ collection สำหรับคำถามตามรูปแบบ collection ที่ตั้งไว้
+        
+        Args:
+            subject_id: รหัสวิชา
+            question_id: รหัสคำถาม
+            
+        Returns:
+            ชื่อ collection
+        """
+        return get_collection_name(subject_id, question_id, self.collection_layout)
+    
+    def _get_question_where(self, subject_id, question_id, **conditions):
+        """
+        สร้างเงื่อนไข where สำหรับดึงชิ้นส่วนของคำถามจาก collection
+        
+        collection ต่อคำถามไม่ต้องกรอง ส่วน collection ต่อวิชาจะกรองด้วย subject_id และ question_id
+        
+        Args:
+            subject_id: รหัสวิชา
+            question_id: รหัสคำถาม
+            conditions: เงื่อนไขเท่ากับเพิ่มเติมของ metadata
+            
+        Returns:
+            where dictionary หรือ None ถ้าไม่ต้องกรอง
+        """
+        clauses = [{key: {"$eq": value}} for key, value in conditions.items()]
+        if self.collection_layout == "subject":
+            clauses = self._create_metadata_filter(subject_id, question_id)["$and"] + clauses
+        
+        if not clauses:
+            return None
+        if len(clauses) == 1:
+            return clauses[0]
+        return {"$and": clauses}
+    
+    def _get_search_where(self, subject_id, question_id, generation=None):
+        """
+        สร้างเงื่อนไข where สำหรับดึงชิ้นส่วนของเฉลยรุ่นที่ใช้งานอยู่
+        
+        Args:
+            subject_id: รหัสวิชา
+            question_id: รหัสคำถาม
+            generation: รุ่นของเฉลยที่ใช้งานอยู่ (None = ไม่มี manifest ใช้ทุกชิ้นส่วนของคำถาม)
+            
+        Returns:
+            where dictionary หรือ None ถ้าไม่ต้องกรอง
+        """
+        if generation is None:
+            return self._get_question_where(subject_id, question_id)
+        return self._get_question_where(subject_id, question_id, fingerprint=generation)
+    
     def get_vector_store_for_question(self, subject_id, question_id):
         """
         ดึง vector store สำหรับคำถาม
@@ -229,18 +852,258 @@ class AnswerEvaluationService:
         Returns:
             Chroma vector store ของคำถามนั้น
         """
-        collection_name = f"{subject_id}_{question_id}"
+        collection_name = self._get_collection_name(subject_id, question_id)
+        
+        with self._vector_stores_lock:
+            vector_store = self._vector_stores.get(collection_name)
+            if vector_store is not None:
+                self._vector_stores.move_to_end(collection_name)
+                return vector_store
+            
+            vector_store = Chroma(
+                client=self.chroma_client,
+                embedding_function=self.embeddings,
+                collection_name=collection_name
+            )
+            self._vector_stores[collection_name] = vector_store
+            
+            # ลบ vector store ที่ไม่ได้ใช้นานที่สุดเมื่อเกินขนาด cache
+            while len(self._vector_stores) > self.vector_store_cache_size:
+                self._vector_stores.popitem(last=False)
+            
+            return vector_store
+    
+    def invalidate_vector_store(self, subject_id, question_id):
+        """
+        ล้าง vector store ที่ cache ไว้ของคำถาม (เรียกเมื่อมีการเพิ่มเฉลยใหม่)
+        
+        Args:
+            subject_id: รหัสวิชา
+            question_id: รหัสคำถาม
+        """
+        collection_name = self._get_collection_name(subject_id, question_id)
+        question_key = get_question_key(subject_id, question_id)
+        with self._vector_stores_lock:
+            self._vector_stores.pop(collection_name, None)
+            self._lexical_indexes.pop(question_key, None)
+            self._exact_indexes.pop(question_key, None)
+            self._answer_key_documents.pop(question_key, None)
+            self._cache_generations[question_key] = self._cache_generations.get(question_key, 0) + 1
+    
+    def _get_cache_generation(self, question_key):
+        """
+        ดึงตัวนับการล้าง cache ของคำถาม (อ่านก่อนเริ่มโหลดข้อมูลเข้า cache)
+        
+        Args:
+            question_key: คีย์ของคำถาม
+            
+        Returns:
+            จำนวนครั้งที่ cache ของคำถามถูกล้าง
+        """
+        with self._vector_stores_lock:
+            return self._cache_generations.get(question_key, 0)
+    
+    def _get_cached(self, cache, question_key, generation):
+        """
+        ดึงข้อมูลจาก cache ของคำถาม ถ้าเป็นของเฉลยรุ่นที่ใช้งานอยู่
+        
+        ตรวจรุ่นของเฉลยจาก manifest ทุกครั้ง เพื่อให้ worker อื่นที่ index เฉลยใหม่ทำให้ cache นี้หมดอายุได้
+        
+        Args:
+            cache: OrderedDict ของ cache
+            question_key: คีย์ของคำถาม
+            generation: รุ่นของเฉลยที่ใช้งานอยู่
+            
+        Returns:
+            tuple (พบใน cache หรือไม่, ข้อมูล)
+        """
+        with self._vector_stores_lock:
+            entry = cache.get(question_key)
+            if entry is None or entry[0] != generation:
+                return False, None
+            cache.move_to_end(question_key)
+            return True, entry[1]
+    
+    def _put_cached(self, cache, question_key, generation, cache_generation, value):
+        """
+        ใส่ข้อมูลที่โหลดแล้วเข้า cache ของคำถาม
         
-        return Chroma(
-            persist_directory=self.persist_directory,
-            embedding_function=self.embeddings,
-            collection_name=collection_name
+        ถ้า cache ของคำถามถูกล้างระหว่างโหลด (ตัวนับเปลี่ยน) จะไม่ใส่ เพราะข้อมูลอาจเป็นของเฉลยรุ่นเก่า
+        
+        Args:
+            cache: OrderedDict ของ cache
+            question_key: คีย์ของคำถาม
+            generation: รุ่นของเฉลยที่โหลดมา
+            cache_generation: ตัวนับการล้าง cache ที่อ่านไว้ก่อนโหลด
+            value: ข้อมูลที่โหลดแล้ว
+        """
+        with self._vector_stores_lock:
+            if self._cache_generations.get(question_key, 0) != cache_generation:
+                return
+            cache[question_key] = (generation, value)
+            cache.move_to_end(question_key)
+            while len(cache) > self.vector_store_cache_size:
+                cache.popitem(last=False)
+    
+    def get_answer_key_documents(self, subject_id, question_id):
+        """
+        ดึงชิ้นส่วนทั้งหมดของเฉลยเรียงตามตำแหน่งในเอกสาร
+        
+        Args:
+            subject_id: รหัสวิชา
+            question_id: รหัสคำถาม
+            
+        Returns:
+            รายการ Document ของชิ้นส่วนเฉลย
+        """
+        question_key = get_question_key(subject_id, question_id)
+        cache_generation = self._get_cache_generation(question_key)
+        generation = self.get_active_generation(subject_id, question_id)
+        found, documents = self._get_cached(self._answer_key_documents, question_key, generation)
+        if found:
+            return documents
+        
+        vector_store = self.get_vector_store_for_question(subject_id, question_id)
+        stored = vector_store.get(
+            where=self._get_search_where(subject_id, question_id, generation), include=["documents", "metadatas"]
         )
+        documents = [
+            Document(page_content=text, metadata=metadata or {}, id=doc_id)
+            for doc_id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"])
+        ]
+        documents.sort(key=lambda doc: (str(doc.metadata.get("source")), doc.metadata.get("start_index") or 0))
+        
+        self._put_cached(self._answer_key_documents, question_key, generation, cache_generation, documents)
+        return documents
+    
+    def _get_lexical_index_path(self, question_key, generation=None):
+        """
+        สร้างพาธของไฟล์ lexical index ของคำถาม
+        
+        Args:
+            question_key: คีย์ของคำถาม
+            generation: รุ่นของเฉลย
+            
+        Returns:
+            พาธของไฟล์ JSON
+        """
+        return get_lexical_index_path(self.persist_directory, question_key, generation)
+    
+    def _remove_lexical_index(self, question_key, generation=None):
+        """
+        ลบไฟล์ lexical index ของเฉลยรุ่นเก่า
+        
+        Args:
+            question_key: คีย์ของคำถาม
+            generation: รุ่นของเฉลยที่ต้องการลบ
+        """
+        try:
+            os.remove(self._get_lexical_index_path(question_key, generation))
+        except FileNotFoundError:
+            pass
+    
+    def get_lexical_index(self, subject_id, question_id):
+        """
+        ดึง lexical index (BM25) ของคำถาม
+        
+        ถ้ายังไม่มีไฟล์ index (เช่น เฉลยที่ index ก่อนมีฟีเจอร์นี้) จะสร้างจากเอกสารใน collection
+        
+        Args:
+            subject_id: รหัสวิชา
+            question_id: รหัสคำถาม
+            
+        Returns:
+            BM25Index ของคำถามนั้น
+        """
+        question_key = get_question_key(subject_id, question_id)
+        cache_generation = self._get_cache_generation(question_key)
+        generation = self.get_active_generation(subject_id, question_id)
+        found, lexical_index = self._get_cached(self._lexical_indexes, question_key, generation)
+        if found:
+            return lexical_index
+        
+        path = self._get_lexical_index_path(question_key, generation)
+        if os.path.exists(path):
+            lexical_index = BM25Index.load(path)
+        else:
+            vector_store = self.get_vector_store_for_question(subject_id, question_id)
+            stored = vector_store.get(where=self._get_search_where(subject_id, question_id, generation), include=["documents"])
+            lexical_index = BM25Index.build(stored["ids"], stored["documents"])
+            if stored["ids"]:
+                lexical_index.save(path)
+        
+        self._put_cached(self._lexical_indexes, question_key, generation, cache_generation, lexical_index)
+        return lexical_index
+    
+    def get_exact_index(self, subject_id, question_id):
+        """
+        ดึง exact index (matrix ของเวกเตอร์ในหน่วยความจำ) ของคำถาม
+        
+        โหลดเวกเตอร์จาก Chroma ครั้งแรกที่ใช้ และถูกล้างพร้อม vector store เมื่อ index เฉลยใหม่
+        
+        Args:
+            subject_id: รหัสวิชา
+            question_id: รหัสคำถาม
+            
+        Returns:
+            ExactSearchIndex ของคำถามนั้น หรือ None ถ้าปิดใช้งานหรือ collection ใหญ่เกินไป
+        """
+        if not EXACT_SEARCH_ENABLED:
+            return None
+        
+        question_key = get_question_key(subject_id, question_id)
+        cache_generation = self._get_cache_generation(question_key)
+        manifest = self.read_manifest(subject_id, question_id)
+        generation = manifest["fingerprint"] if manifest else None
+        found, exact_index = self._get_cached(self._exact_indexes, question_key, generation)
+        if found:
+            return exact_index
+        
+        vector_store = self.get_vector_store_for_question(subject_id, question_id)
+        where = self._get_search_where(subject_id, question_id, generation)
+        if manifest:
+            count = manifest["chunk_count"]
+        else:
+            count = len(vector_store.get(where=where, include=[])["ids"])
+        if count == 0:
+            # ยังไม่มีเฉลย ไม่ cache เพื่อให้โหลดใหม่หลัง index
+            return None
+        
+        # คำถามที่มีชิ้นส่วนมากเกินไปให้ใช้ HNSW ของ Chroma (cache เป็น None)
+        exact_index = ExactSearchIndex.from_vector_store(vector_store, where) if count <= EXACT_SEARCH_MAX_VECTORS else None
+        
+        self._put_cached(self._exact_indexes, question_key, generation, cache_generation, exact_index)
+        return exact_index
+    
+    def _exact_search(self, embedding, subject_id, question_id, k):
+        """
+        ค้นหาแบบ exact ด้วย exact index ของคำถาม
+        
+        Args:
+            embedding: เวกเตอร์ของคำค้นหา
+            subject_id: รหัสวิชา
+            question_id: รหัสคำถาม
+            k: จำนวนเอกสารที่ต้องการค้นหา
+            
+        Returns:
+            เอกสารที่เกี่ยวข้อง หรือ None ถ้าใช้ exact index ไม่ได้
+        """
+        try:
+            exact_index = self.get_exact_index(subject_id, question_id)
+            if exact_index is None:
+                return None
+            return exact_index.search(embedding, k)
+        except Exception as e:
+            print(f"Error in exact search: {str(e)}")
+            self._record_retrieval("exact_search_errors")
+            return None
     
     def retrieve_relevant_context(self, query, subject_id, question_id, k=4):
         """
         ค้นหาข้อมูลที่เกี่ยวข้องจากเฉลย
         
+        คำนวณเวกเตอร์ของคำค้นหาเพียงครั้งเดียว แล้วใช้เวกเตอร์นั้นกับทุกวิธีค้นหาและ fallback
+        
         Args:
             query: คำถามหรือคำตอบที่ต้องการค้นหาบริบท
             subject_id: รหัสวิชา
@@ -250,58 +1113,204 @@ class AnswerEvaluationService:
         Returns:
             เอกสารที่เกี่ยวข้อง
         """
-        # ดึง vector store
+        try:
+            embedding = self.embeddings.embed_query(query)
+        except Exception as e:
+            print(f"Error in query embedding: {str(e)}")
+            self._record_retrieval("embedding_errors")
+            return []
+        
+        return self.retrieve_relevant_context_by_vector(embedding, subject_id, question_id, k, query=query)
+    
+    def _fuse_with_lexical(self, vector_store, vector_docs, query, subject_id, question_id, k):
+        """
+        รวมผลการค้นหาแบบ vector กับ lexical (BM25) ด้วย reciprocal rank fusion
+        
+        Args:
+            vector_store: Chroma vector store ของคำถาม
+            vector_docs: ผลการค้นหาแบบ vector เรียงตามความเกี่ยวข้อง
+            query: คำค้นหา
+            subject_id: รหัสวิชา
+            question_id: รหัสคำถาม
+            k: จำนวนเอกสารที่ต้องการ
+            
+        Returns:
+            เอกสารที่เกี่ยวข้อง
+        """
+        try:
+            lexical_index = self.get_lexical_index(subject_id, question_id)
+            lexical_ids = [doc_id for doc_id, _ in lexical_index.search(query, k=max(k, HYBRID_CANDIDATES))]
+        except Exception as e:
+            print(f"Error in lexical search: {str(e)}")
+            lexical_ids = []
+        
+        if not lexical_ids:
+            return vector_docs[:k]
+        
+        docs_by_id = {doc.id: doc for doc in vector_docs}
+        fused_ids = reciprocal_rank_fusion([[doc.id for doc in vector_docs], lexical_ids], k=RRF_K)[:k]
+        
+        # ดึงเอกสารที่พบจาก lexical อย่างเดียว
+        missing_ids = [doc_id for doc_id in fused_ids if doc_id not in docs_by_id]
+        if missing_ids:
+            stored = vector_store.get(ids=missing_ids, include=["documents", "metadatas"])
+            for doc_id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+                docs_by_id[doc_id] = Document(page_content=text, metadata=metadata or {}, id=doc_id)
+        
+        return [docs_by_id[doc_id] for doc_id in fused_ids if doc_id in docs_by_id]
+    
+    def retrieve_relevant_context_by_vector(self, embedding, subject_id, question_id, k=4, query=None):
+        """
+        ค้นหาข้อมูลที่เกี่ยวข้องจากเฉลยด้วย embedding ที่คำนวณไว้แล้ว
+        
+        Args:
+            embedding: เวกเตอร์ของคำค้นหา
+            subject_id: รหัสวิชา
+            question_id: รหัสคำถาม
+            k: จำนวนเอกสารที่ต้องการค้นหา
+            query: ข้อความคำค้นหา (ถ้าระบุจะค้นหาแบบ lexical ร่วมด้วย)
+            
+        Returns:
+            เอกสารที่เกี่ยวข้อง
+        """
         vector_store = self.get_vector_store_for_question(subject_id, question_id)
+        hybrid = HYBRID_RETRIEVAL_ENABLED and query is not None
+        search_k = max(k, HYBRID_CANDIDATES) if hybrid else k
         
-        # สร้าง metadata filter
-        metadata_filter = self._create_metadata_filter(subject_id, question_id)
+        vector_docs = self._search_by_vector(vector_store, embedding, subject_id, question_id, search_k)
+        if not hybrid:
+            return vector_docs
+        return self._fuse_with_lexical(vector_store, vector_docs, query, subject_id, question_id, k)
+    
+    async def aretrieve_relevant_context(self, query, subject_id, question_id, k=4):
+        """
+        ค้นหาข้อมูลที่เกี่ยวข้องจากเฉลยโดยไม่ block event loop
         
-        # ค้นหาด้วย fallback
-        return self._search_with_fallback(vector_store, query, k, metadata_filter)
+        Args:
+            query: คำถามหรือคำตอบที่ต้องการค้นหาบริบท
+            subject_id: รหัสวิชา
+            question_id: รหัสคำถาม
+            k: จำนวนเอกสารที่ต้องการค้นหา
+            
+        Returns:
+            เอกสารที่เกี่ยวข้อง
+        """
+        return await run_blocking(self.retrieve_relevant_context, query, subject_id, question_id, k)
     
-    def _create_metadata_filter(self, subject_id, question_id):
+    def _create_metadata_filter(self, subject_id, question_id, generation=None):
         """
         สร้าง metadata filter สำหรับการค้นหา
         
         Args:
             subject_id: รหัสวิชา
             question_id: รหัสคำถาม
+            generation: รุ่นของเฉลยที่ใช้งานอยู่ (ถ้ามี)
             
         Returns:
             metadata filter dictionary
         """
-        return {
-            "$and": [
-                {"subject_id": {"$eq": subject_id}},
-                {"question_id": {"$eq": question_id}}
-            ]
-        }
+        clauses = [
+            {"subject_id": {"$eq": subject_id}},
+            {"question_id": {"$eq": question_id}}
+        ]
+        if generation is not None:
+            clauses.append({"fingerprint": {"$eq": generation}})
+        return {"$and": clauses}
+    
+    def _matches_question(self, doc, subject_id, question_id, generation=None):
+        """
+        ตรวจว่าเอกสารเป็นของคำถามและรุ่นของเฉลยที่ค้นหาหรือไม่
+        
+        Args:
+            doc: Document ที่ค้นหาได้
+            subject_id: รหัสวิชา
+            question_id: รหัสคำถาม
+            generation: รุ่นของเฉลยที่ใช้งานอยู่ (ถ้ามี)
+            
+        Returns:
+            True ถ้า metadata ตรงกับวิชา คำถาม และรุ่นของเฉลย
+        """
+        if generation is not None and doc.metadata.get("fingerprint") != generation:
+            return False
+        return doc.metadata.get("subject_id") == subject_id and doc.metadata.get("question_id") == question_id
     
-    def _search_with_fallback(self, vector_store, query, k, metadata_filter=None):
+    def _search_by_vector(self, vector_store, embedding, subject_id, question_id, k):
         """
-        ค้นหาข้อมูลด้วย filter และมี fallback กรณีเกิดข้อผิดพลาด
+        ค้นหาด้วยเวกเตอร์ของคำค้นหา โดยใช้เวกเตอร์เดิมกับทุกวิธีค้นหา
+        
+        ลำดับการค้นหา:
+        1. exact index ในหน่วยความจำ (collection ขนาดเล็ก)
+        2. HNSW ของ Chroma พร้อม metadata filter (collection ต่อคำถามข้าม filter ได้ด้วย RETRIEVAL_METADATA_FILTER=false)
+        3. ถ้าการค้นหาแบบมี filter ผิดพลาด ค้นหาโดยไม่ใช้ filter แล้วคัดเฉพาะชิ้นส่วนของคำถามนี้
         
         Args:
-            vector_store: Chroma vector store
-            query: คำถามหรือคำตอบ
+            vector_store: Chroma vector store ของคำถาม
+            embedding: เวกเตอร์ของคำค้นหา
+            subject_id: รหัสวิชา
+            question_id: รหัสคำถาม
             k: จำนวนเอกสารที่ต้องการค้นหา
-            metadata_filter: filter สำหรับค้นหา
             
         Returns:
             เอกสารที่เกี่ยวข้อง
         """
+        self._record_retrieval("queries")
+        
+        # collection ขนาดเล็กค้นหาแบบ exact ก่อน แล้วจึงใช้ HNSW ของ Chroma
+        docs = self._exact_search(embedding, subject_id, question_id, k)
+        if docs is not None:
+            self._record_retrieval("exact_searches")
+            return docs
+        
+        generation = self.get_active_generation(subject_id, question_id)
+        if not RETRIEVAL_METADATA_FILTER and self.collection_layout == "question":
+            # collection แยกตามคำถามอยู่แล้ว จึงไม่ต้องใช้ filter (ตัดเฉพาะชิ้นส่วนรุ่นเก่าที่ยังลบไม่เสร็จ)
+            try:
+                docs = vector_store.similarity_search_by_vector(embedding, k=k)
+            except Exception as e:
+                print(f"Error in similarity search by vector: {str(e)}")
+                self._record_retrieval("search_errors")
+                return []
+            self._record_retrieval("unfiltered_searches")
+            return [doc for doc in docs if generation is None or doc.metadata.get("fingerprint") == generation]
+        
         try:
-            # ลองค้นหาด้วย filter ก่อน
-            return vector_store.similarity_search(query, k=k, filter=metadata_filter)
+            docs = vector_store.similarity_search_by_vector(
+                embedding, k=k, filter=self._create_metadata_filter(subject_id, question_id, generation)
+            )
+            self._record_retrieval("filtered_searches")
+            return docs
         except Exception as e:
             print(f"Error in similarity search with filter: {str(e)}")
-            
-            try:
-                # ถ้าเกิดข้อผิดพลาด ให้ลองค้นหาโดยไม่ใช้ filter
-                return vector_store.similarity_search(query, k=k)
-            except Exception as e2:
-                print(f"Error in fallback similarity search: {str(e2)}")
+        
+        # fallback: ค้นหาโดยไม่ใช้ filter ด้วยเวกเตอร์เดิม แล้วตัดชิ้นส่วนของคำถามอื่นออก
+        self._record_retrieval("filter_fallbacks")
+        try:
+            docs = vector_store.similarity_search_by_vector(embedding, k=k)
+        except Exception as e:
+            print(f"Error in fallback similarity search: {str(e)}")
+            self._record_retrieval("search_errors")
             return []
+        return [doc for doc in docs if self._matches_question(doc, subject_id, question_id, generation)]
+    
+    def _record_retrieval(self, name):
+        """
+        เพิ่มตัวนับสถิติการค้นหา
+        
+        Args:
+            name: ชื่อตัวนับ
+        """
+        with self._retrieval_stats_lock:
+            self._retrieval_stats[name] += 1
+    
+    def get_retrieval_stats(self) -> Dict[str, int]:
+        """
+        ดึงสถิติการค้นหาแยกตามวิธีค้นหาและ fallback
+        
+        Returns:
+            dict ของชื่อตัวนับกับจำนวนครั้ง
+        """
+        with self._retrieval_stats_lock:
+            return dict(self._retrieval_stats)
 
     async def load_pdf_from_url(self, file_content: bytes, file_name: str, metadata=None):
         """
@@ -315,7 +1324,7 @@ class AnswerEvaluationService:
         Returns:
             เอกสารที่โหลดได้
         """
-        return self.load_pdf_document(file_content, file_name, metadata)
+        return await run_blocking(self.load_pdf_document, file_content, file_name, metadata)
 
     async def index_answer_key_from_url(self, answer_key_content: bytes, file_name: str, subject_id: str, question_id: str):
         """
@@ -332,9 +1341,15 @@ class AnswerEvaluationService:
         """
         self._validate_pdf_file(file_name)
         
+        # ข้ามการ index ถ้าเฉลยนี้ถูก index ไว้แล้ว (เช่นประเมินนักศึกษาหลายคนด้วยเฉลยเดียวกัน)
+        fingerprint = self.compute_fingerprint(answer_key_content)
+        indexed_chunks = await run_blocking(self.get_indexed_chunk_count, subject_id, question_id, fingerprint)
+        if indexed_chunks:
+            return indexed_chunks
+        
         # สร้าง metadata และโหลดเอกสาร
         metadata = self._create_answer_metadata(subject_id, question_id)
         documents = await self.load_pdf_from_url(answer_key_content, file_name, metadata)
         
         # แบ่งเอกสารและบันทึกลง ChromaDB
-        return self._split_and_store_documents(documents, subject_id, question_id)
\ No newline at end of file
+        return await run_blocking(self._split_and_store_documents, documents, subject_id, question_id, fingerprint)
\ No newline at end of file
@@ -0,0 +1,177 @@
+# backend/app/services/score_parser_service.py
+import re
+from typing import Optional
+from pydantic import ValidationError
+from ..models.schemas import ScoreBlock
+
+# บรรทัดคะแนนในรูปแบบ "คะแนนเต็ม: X/40" (รองรับตัวหนาแบบ markdown)
+SCORE_LINE_PATTERN = re.compile(r"คะแนนเต็ม[\s*]*:[\s*]*(\d+(?:\.\d+)?)")
+
+# บล็อกความคิดของโมเดลแบบ reasoning (เช่น qwen3) ที่ขึ้นต้นคำตอบ ต้องข้ามก่อนหาคะแนน
+REASONING_START = "<think>"
+REASONING_END = "</think>"
+
+def parse_score_line(line: str) -> Optional[float]:
+    """
+    แยกคะแนนจากบรรทัด "คะแนนเต็ม: X/40"
+    
+    Args:
+        line: ข้อความหนึ่งบรรทัด
+    
+    Returns:
+        คะแนนที่แยกได้ หรือ None ถ้าไม่ใช่บรรทัดคะแนน
+    """
+    match = SCORE_LINE_PATTERN.search(line)
+    return float(match.group(1)) if match else None
+
+class IncrementalScoreParser:
+    """
+    ตัวแยกคะแนนที่รับข้อความของ LLM ทีละส่วน และหยุดตรวจทันทีที่ได้คะแนน
+    
+    โหมด structured จะหาบล็อก JSON ก้อนแรกของคำตอบ (ตาม ScoreBlock) แล้วตรวจสอบด้วย pydantic
+    ถ้าบล็อก JSON ไม่ถูกต้องจะกลับไปหาบรรทัด "คะแนนเต็ม: X/40" แทน
+    ถ้าคำตอบขึ้นต้นด้วยบล็อก <think>...</think> จะเริ่มตรวจหลัง </think> เท่านั้น
+    """
+    
+    def __init__(self, structured: bool = False):
+        """
+        สร้างตัวแยกคะแนน
+        
+        Args:
+            structured: คาดหวังบล็อก JSON ของคะแนนที่ต้นคำตอบ
+        """
+        self.structured = structured
+        self.score: Optional[float] = None
+        self.block: Optional[ScoreBlock] = None
+        
+        self._text = ""
+        self._content_start = None
+        self._line_start = 0
+        self._json_start = None
+        self._json_position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+    
+    @property
+    def done(self) -> bool:
+        """ได้คะแนนแล้วหรือไม่"""
+        return self.score is not None
+    
+    def feed(self, text: str) -> Optional[float]:
+        """
+        ส่งข้อความส่วนถัดไปให้ตัวแยก
+        
+        Args:
+            text: ข้อความส่วนถัดไปของคำตอบ
+        
+        Returns:
+            คะแนนถ้าได้คะแนนแล้ว หรือ None
+        """
+        if self.done:
+            return self.score
+        
+        self._text += text
+        if self._content_start is None:
+            self._content_start = self._find_content_start()
+            if self._content_start is None:
+                # ยังอยู่ในบล็อกความคิดของโมเดล
+                return None
+            self._line_start = self._content_start
+        
+        if self.structured:
+            self._scan_json()
+        if not self.done:
+            self._scan_lines()
+        return self.score
+    
+    def finish(self) -> Optional[float]:
+        """
+        แจ้งว่าได้รับข้อความครบแล้ว เพื่อตรวจบรรทัดสุดท้ายที่ยังไม่มีการขึ้นบรรทัดใหม่
+        
+        Returns:
+            คะแนนที่แยกได้ หรือ None (รวมถึงกรณีที่บล็อกความคิดไม่มี </think> ปิด)
+        """
+        if self._content_start is None:
+            if self._text.lstrip().startswith(REASONING_START):
+                return None
+            self._content_start = 0
+            self._scan_lines()
+        if not self.done:
+            self.score = parse_score_line(self._text[self._line_start:])
+        return self.score
+    
+    def _find_content_start(self) -> Optional[int]:
+        """
+        หาตำแหน่งเริ่มต้นของคำตอบหลังบล็อกความคิดของโมเดล
+        
+        Returns:
+            ตำแหน่งเริ่มต้น (0 ถ้าไม่มีบล็อกความคิด) หรือ None ถ้ายังตัดสินไม่ได้หรือบล็อกความคิดยังไม่จบ
+        """
+        stripped = self._text.lstrip()
+        if len(stripped) < len(REASONING_START) and REASONING_START.startswith(stripped):
+            return None
+        if not stripped.startswith(REASONING_START):
+            return 0
+        end = self._text.find(REASONING_END)
+        if end < 0:
+            return None
+        return end + len(REASONING_END)
+    
+    def _scan_json(self):
+        """หาบล็อก JSON ก้อนแรกที่สมบูรณ์ แล้วตรวจสอบตาม ScoreBlock"""
+        if self._json_start is None:
+            start = self._text.find("{", self._content_start)
+            if start < 0:
+                return
+            self._json_start = start
+            self._json_position = start
+        
+        text = self._text
+        for position in range(self._json_position, len(text)):
+            char = text[position]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._validate_block(text[self._json_start:position + 1])
+                    return
+        self._json_position = len(text)
+    
+    def _validate_block(self, raw_json):
+        """
+        ตรวจสอบบล็อก JSON ของคะแนน
+        
+        Args:
+            raw_json: ข้อความ JSON ของบล็อกคะแนน
+        """
+        self.structured = False
+        try:
+            self.block = ScoreBlock.model_validate_json(raw_json)
+        except ValidationError as e:
+            print(f"Invalid score block ({e.error_count()} errors), falling back to score line")
+            return
+        self.score = self.block.total
+    
+    def _scan_lines(self):
+        """ตรวจบรรทัดที่ได้รับครบแล้วเพื่อหาบรรทัดคะแนน"""
+        end = self._text.rfind("\n")
+        if end < self._line_start:
+            return
+        for line in self._text[self._line_start:end].split("\n"):
+            score = parse_score_line(line)
+            if score is not None:
+                self.score = score
+                return
+        self._line_start = end + 1
+
@@ -6,6 +6,7 @@ from fastapi import HTTPException
 from dotenv import load_dotenv
 from supabase import create_client, Client
 from typing import Optional, Dict, Any, Tuple
+from .executor_service import run_blocking
 
 # โหลด environment variables
 load_dotenv()
@@ -41,8 +42,8 @@ class SupabaseService:
             # ดึงชื่อไฟล์จาก URL
             filename = url.split('/')[-1]
             
-            # ส่ง request เพื่อดาวน์โหลดไฟล์
-            response = requests.get(url, stream=True, timeout=30)
+            # ส่ง request เพื่อดาวน์โหลดไฟล์ (ใน executor เพื่อไม่ block event loop)
+            response = await run_blocking(requests.get, url, timeout=30)
             
             if response.status_code != 200:
                 raise HTTPException(
@@ -85,7 +86,7 @@ class SupabaseService:
             filename = path.split('/')[-1]
             
             # ดึงไฟล์จาก Supabase Storage
-            result = self.supabase.storage.from_(bucket).download(path)
+            result = await run_blocking(self.supabase.storage.from_(bucket).download, path)
             
             return result, filename
         except Exception as e:
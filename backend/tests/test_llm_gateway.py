@@ -0,0 +1,256 @@
+# backend/tests/test_llm_gateway.py
+import os
+import sys
+import time
+import asyncio
+import threading
+import contextlib
+import unittest
+
+# เพิ่มพาธของโปรเจกต์เพื่อให้ import โมดูลได้
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.llm_gateway_service import TokenBucket, FairSemaphore, LLMGateway, LLMUnavailableError
+
+class ProviderError(Exception):
+    """ข้อผิดพลาดจำลองของ provider (5xx)"""
+    status_code = 503
+
+class FakeLLM:
+    """LLM จำลองที่ตอบตามลำดับ หรือรอจนได้รับสัญญาณก่อนตอบ"""
+    
+    def __init__(self, outcomes=None, gate: threading.Event = None):
+        self.outcomes = list(outcomes or [])
+        self.gate = gate
+        self.started = threading.Event()
+        self.calls = 0
+    
+    def invoke(self, prompt_value):
+        self.calls += 1
+        self.started.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        outcome = self.outcomes.pop(0) if self.outcomes else "ok"
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    
+    async def astream(self, prompt_value):
+        for chunk in ["a", "b", "c"]:
+            yield chunk
+
+def wait_until(condition, timeout=5.0):
+    """รอจนเงื่อนไขเป็นจริง"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("หมดเวลารอ")
+        time.sleep(0.005)
+
+class TestTokenBucket(unittest.TestCase):
+    """ทดสอบ token bucket"""
+    
+    def test_unlimited(self):
+        bucket = TokenBucket(0)
+        bucket.consume(1000)
+        self.assertEqual(bucket.wait_time(1000, time.monotonic()), 0.0)
+    
+    def test_wait_and_refill(self):
+        bucket = TokenBucket(60)
+        now = bucket.updated_at
+        self.assertEqual(bucket.wait_time(60, now), 0.0)
+        bucket.consume(60)
+        
+        # 60 ต่อนาที = 1 ต่อวินาที
+        self.assertAlmostEqual(bucket.wait_time(1, now), 1.0)
+        self.assertEqual(bucket.wait_time(1, now + 1.0), 0.0)
+    
+    def test_request_larger_than_capacity_waits_for_full_bucket(self):
+        bucket = TokenBucket(60)
+        now = bucket.updated_at
+        bucket.consume(60)
+        self.assertAlmostEqual(bucket.wait_time(600, now), 60.0)
+    
+    def test_negative_balance_after_usage_adjustment(self):
+        bucket = TokenBucket(60)
+        now = bucket.updated_at
+        bucket.consume(90)
+        self.assertAlmostEqual(bucket.wait_time(1, now), 31.0)
+
+class TestFairSemaphore(unittest.TestCase):
+    """ทดสอบ semaphore แบบ FIFO"""
+    
+    def test_threads_acquire_in_arrival_order(self):
+        semaphore = FairSemaphore(1)
+        semaphore.acquire()
+        order = []
+        
+        def worker(name):
+            semaphore.acquire()
+            order.append(name)
+            semaphore.release()
+        
+        threads = []
+        for index, name in enumerate(["first", "second", "third"]):
+            thread = threading.Thread(target=worker, args=(name,))
+            thread.start()
+            wait_until(lambda: len(semaphore._waiters) == index + 1)
+            threads.append(thread)
+        
+        semaphore.release()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(order, ["first", "second", "third"])
+        self.assertEqual(semaphore._value, 1)
+    
+    def test_released_slot_goes_to_waiter_not_newcomer(self):
+        semaphore = FairSemaphore(1)
+        semaphore.acquire()
+        acquired = threading.Event()
+        
+        def waiter():
+            semaphore.acquire()
+            acquired.set()
+        
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        wait_until(lambda: len(semaphore._waiters) == 1)
+        semaphore.release()
+        thread.join(5)
+        
+        # ช่องถูกส่งให้ผู้รอโดยตรง ไม่ได้คืนเข้า semaphore
+        self.assertTrue(acquired.is_set())
+        self.assertEqual(semaphore._value, 0)
+        semaphore.release()
+        self.assertEqual(semaphore._value, 1)
+    
+    def test_coroutines_acquire_in_arrival_order(self):
+        async def scenario():
+            semaphore = FairSemaphore(1)
+            await semaphore.aacquire()
+            order = []
+            
+            async def worker(name):
+                await semaphore.aacquire()
+                order.append(name)
+                semaphore.release()
+            
+            tasks = []
+            for name in ["first", "second", "third"]:
+                tasks.append(asyncio.create_task(worker(name)))
+                await asyncio.sleep(0)
+            semaphore.release()
+            await asyncio.gather(*tasks)
+            return order, semaphore._value
+        
+        order, value = asyncio.run(scenario())
+        self.assertEqual(order, ["first", "second", "third"])
+        self.assertEqual(value, 1)
+    
+    def test_cancelled_waiter_does_not_leak_slot(self):
+        async def scenario():
+            semaphore = FairSemaphore(1)
+            await semaphore.aacquire()
+            task = asyncio.create_task(semaphore.aacquire())
+            await asyncio.sleep(0)
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+            semaphore.release()
+            return semaphore._value, len(semaphore._waiters)
+        
+        self.assertEqual(asyncio.run(scenario()), (1, 0))
+
+class TestCircuitBreaker(unittest.TestCase):
+    """ทดสอบ circuit breaker และคำขอทดลองของสถานะ half-open"""
+    
+    def create_gateway(self):
+        return LLMGateway(max_concurrency=4, max_retries=0, failure_threshold=1, reset_timeout=0.05)
+    
+    def open_circuit(self, gateway):
+        with self.assertRaises(ProviderError):
+            gateway.invoke(FakeLLM([ProviderError()]), "prompt")
+        self.assertEqual(gateway.get_stats()["circuit_state"], "open")
+    
+    def test_open_circuit_rejects_requests(self):
+        gateway = self.create_gateway()
+        self.open_circuit(gateway)
+        
+        llm = FakeLLM()
+        with self.assertRaises(LLMUnavailableError):
+            gateway.invoke(llm, "prompt")
+        self.assertEqual(llm.calls, 0)
+        self.assertEqual(gateway.get_stats()["rejected"], 1)
+    
+    def test_half_open_allows_single_probe(self):
+        gateway = self.create_gateway()
+        self.open_circuit(gateway)
+        time.sleep(0.06)
+        self.assertEqual(gateway.get_stats()["circuit_state"], "half_open")
+        
+        gate = threading.Event()
+        probe_llm = FakeLLM(gate=gate)
+        results = []
+        probe = threading.Thread(target=lambda: results.append(gateway.invoke(probe_llm, "prompt")))
+        probe.start()
+        probe_llm.started.wait(5)
+        
+        # ระหว่างคำขอทดลองทำงาน คำขออื่นถูกปฏิเสธ
+        self.assertTrue(gateway.get_stats()["probing"])
+        other = FakeLLM()
+        with self.assertRaises(LLMUnavailableError):
+            gateway.invoke(other, "prompt")
+        self.assertEqual(other.calls, 0)
+        
+        gate.set()
+        probe.join(5)
+        self.assertEqual(results, ["ok"])
+        
+        stats = gateway.get_stats()
+        self.assertEqual(stats["circuit_state"], "closed")
+        self.assertFalse(stats["probing"])
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertEqual(gateway.invoke(FakeLLM(), "prompt"), "ok")
+    
+    def test_failed_probe_reopens_circuit(self):
+        gateway = self.create_gateway()
+        self.open_circuit(gateway)
+        time.sleep(0.06)
+        
+        with self.assertRaises(ProviderError):
+            gateway.invoke(FakeLLM([ProviderError()]), "prompt")
+        
+        stats = gateway.get_stats()
+        self.assertEqual(stats["circuit_state"], "open")
+        self.assertFalse(stats["probing"])
+        with self.assertRaises(LLMUnavailableError):
+            gateway.invoke(FakeLLM(), "prompt")
+    
+    def test_rate_limit_does_not_open_circuit(self):
+        gateway = self.create_gateway()
+        error = ProviderError()
+        error.status_code = 429
+        with self.assertRaises(ProviderError):
+            gateway.invoke(FakeLLM([error]), "prompt")
+        self.assertEqual(gateway.get_stats()["circuit_state"], "closed")
+
+class TestStream(unittest.TestCase):
+    """ทดสอบการคืนช่องของ stream"""
+    
+    def test_closing_stream_early_releases_slot(self):
+        gateway = LLMGateway(max_concurrency=1, max_retries=0)
+        
+        async def scenario():
+            chunks = []
+            async with contextlib.aclosing(gateway.astream(FakeLLM(), "prompt")) as stream:
+                async for chunk in stream:
+                    chunks.append(chunk)
+                    break
+            return chunks
+        
+        self.assertEqual(asyncio.run(scenario()), ["a"])
+        self.assertEqual(gateway.get_stats()["in_flight"], 0)
+        self.assertEqual(gateway._slots._value, 1)
+
+if __name__ == "__main__":
+    unittest.main()
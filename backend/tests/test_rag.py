@@ -20,7 +20,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.services.rag_service import AnswerEvaluationService
 from app.services.llm_service import LLMEvaluationService
-from app.services.model_service import ModelService
+from app.services.model_service import get_model_service
 
 class RAGTester:
     """คลาสสำหรับทดสอบประสิทธิภาพของระบบ RAG สำหรับตรวจข้อสอบอัตนัย"""
@@ -72,9 +72,9 @@ class RAGTester:
     def _initialize_services(self):
         """เตรียม service สำหรับการทดสอบ (กรณีไม่ใช้ API)"""
         if not self.use_api:
-            self.rag_service = AnswerEvaluationService()
-            model_service = ModelService()
-            self.llm_service = LLMEvaluationService(self.rag_service)
+            model_service = get_model_service()
+            self.rag_service = AnswerEvaluationService(model_service=model_service)
+            self.llm_service = LLMEvaluationService(self.rag_service, model_service=model_service)
     
     def _initialize_test_results(self):
         """เตรียมตัวแปรสำหรับเก็บผลการทดสอบ"""
@@ -190,7 +190,8 @@ class RAGTester:
             files = {'file': (os.path.basename(pdf_path), f, 'application/pdf')}
             data = {
                 'subject_id': self.subject_id,
-                'question_id': question_id
+                'question_id': question_id,
+                'wait': 'true'  # รอให้ index เฉลยเสร็จก่อนประเมิน
             }
             
             start_time = time.time()
@@ -1,4 +1,5 @@
 # backend/tests/test_rag_performance.py
+# ตั้ง LLM_BACKEND=fake (และ LLM_REQUESTS_PER_MINUTE=0) เพื่อวัดประสิทธิภาพแบบออฟไลน์โดยไม่เรียก Groq
 import os
 import sys
 import time
@@ -20,7 +21,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.services.rag_service import AnswerEvaluationService
 from app.services.llm_service import LLMEvaluationService
-from app.services.model_service import ModelService
+from app.services.model_service import get_model_service
 
 class RAGTester:
     """คลาสสำหรับทดสอบประสิทธิภาพของระบบ RAG สำหรับตรวจข้อสอบอัตนัย"""
@@ -72,9 +73,9 @@ class RAGTester:
     def _initialize_services(self):
         """เตรียม service สำหรับการทดสอบ (กรณีไม่ใช้ API)"""
         if not self.use_api:
-            self.rag_service = AnswerEvaluationService()
-            model_service = ModelService()
-            self.llm_service = LLMEvaluationService(self.rag_service)
+            model_service = get_model_service()
+            self.rag_service = AnswerEvaluationService(model_service=model_service)
+            self.llm_service = LLMEvaluationService(self.rag_service, model_service=model_service)
     
     def _initialize_test_results(self):
         """เตรียมตัวแปรสำหรับเก็บผลการทดสอบ"""
@@ -190,7 +191,8 @@ class RAGTester:
             files = {'file': (os.path.basename(pdf_path), f, 'application/pdf')}
             data = {
                 'subject_id': self.subject_id,
-                'question_id': question_id
+                'question_id': question_id,
+                'wait': 'true'  # รอให้ index เฉลยเสร็จก่อนประเมิน
             }
             
             start_time = time.time()
@@ -151,7 +151,8 @@ class RagTester:
                 files = {'file': (os.path.basename(pdf_path), f, 'application/pdf')}
                 data = {
                     'subject_id': self.subject_id,
-                    'question_id': self.question_id
+                    'question_id': self.question_id,
+                    'wait': 'true'  # รอให้ index เฉลยเสร็จก่อนประเมิน
                 }
                 
                 # เริ่มจับเวลา
@@ -277,6 +278,82 @@ class RagTester:
             print(f"❌ เกิดข้อผิดพลาด: {str(e)}")
             return None
     
+    def run_stream_evaluation_test(self, answer_index=0, stop_after_score=True):
+        """
+        ทดสอบการประเมินคำตอบแบบ streaming (server-sent events)
+        
+        Args:
+            answer_index: ดัชนีของคำตอบทดสอบที่ต้องการใช้
+            stop_after_score: ขอให้หยุดรับข้อความจาก LLM ทันทีที่ได้คะแนน
+            
+        Returns:
+            bool: ผลการทดสอบ (True = สำเร็จ, False = ล้มเหลว)
+        """
+        print(f"\n=== ทดสอบการประเมินคำตอบแบบ streaming (stop_after_score={stop_after_score}) ===")
+        
+        try:
+            # ปรับ URL ตามที่ใช้งานจริง
+            url = f"{self.api_base_url}/api/evaluation/evaluate-stream"
+            
+            # เตรียมข้อมูลสำหรับประเมิน (bypass_cache เพื่อให้เรียก LLM จริง)
+            data = {
+                'question': self.test_question,
+                'student_answer': self.test_student_answers[answer_index],
+                'subject_id': self.subject_id,
+                'question_id': self.question_id,
+                'bypass_cache': True,
+                'stop_after_score': stop_after_score
+            }
+            
+            # เริ่มจับเวลา
+            start_time = time.time()
+            
+            # อ่าน event ทีละรายการ
+            events = []
+            event_name = None
+            with requests.post(url, json=data, stream=True) as response:
+                if response.status_code != 200:
+                    print(f"❌ ประเมินคำตอบล้มเหลว: {response.status_code}")
+                    print(f"รายละเอียด: {response.text}")
+                    return False
+                for line in response.iter_lines(decode_unicode=True):
+                    if line.startswith("event: "):
+                        event_name = line[len("event: "):]
+                    elif line.startswith("data: "):
+                        events.append((event_name, json.loads(line[len("data: "):])))
+            
+            # คำนวณเวลาที่ใช้
+            elapsed_time = time.time() - start_time
+            
+            # ตรวจลำดับของ event
+            names = [name for name, _ in events]
+            if "error" in names:
+                print(f"❌ เกิดข้อผิดพลาดระหว่างประเมิน: {dict(events)['error']}")
+                return False
+            if names.count("score") != 1 or names[-1] != "result":
+                print(f"❌ ลำดับ event ไม่ถูกต้อง: {names}")
+                return False
+            
+            score = dict(events)["score"]["score"]
+            result = events[-1][1]
+            if result["score"] != score:
+                print(f"❌ คะแนนใน event score ({score}) ไม่ตรงกับผลการประเมิน ({result['score']})")
+                return False
+            
+            # เมื่อหยุดหลังได้คะแนน ต้องไม่มี token หลัง event score
+            tokens_after_score = names[names.index("score") + 1:-1]
+            if stop_after_score and tokens_after_score:
+                print(f"❌ ยังได้รับ token หลังคะแนนอีก {len(tokens_after_score)} รายการ")
+                return False
+            
+            print(f"✅ ประเมินคำตอบแบบ streaming สำเร็จ (ใช้เวลา {elapsed_time:.2f} วินาที)")
+            print(f"คะแนน: {score}/40 จาก {names.count('token')} token")
+            return True
+        
+        except Exception as e:
+            print(f"❌ เกิดข้อผิดพลาด: {str(e)}")
+            return False
+    
     def run_comparative_test(self):
         """
         ทดสอบเปรียบเทียบการประเมินคำตอบแบบต่างๆ
@@ -333,6 +410,10 @@ def main():
         # ทดสอบการประเมินแบบเปรียบเทียบ
         tester.run_comparative_test()
     
+        # ทดสอบการประเมินแบบ streaming ทั้งแบบรับข้อความครบและแบบหยุดหลังได้คะแนน
+        tester.run_stream_evaluation_test(stop_after_score=False)
+        tester.run_stream_evaluation_test(stop_after_score=True)
+    
     print("\n" + "=" * 60)
     print(" " * 20 + "การทดสอบเสร็จสิ้น")
     print("=" * 60)
@@ -0,0 +1,73 @@
+# backend/tests/test_retrieval.py
+import os
+import sys
+import tempfile
+import unittest
+from langchain_core.documents import Document
+
+# เพิ่มพาธของโปรเจกต์เพื่อให้ import โมดูลได้
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.lexical_index_service import BM25Index, reciprocal_rank_fusion
+from app.services.context_service import pack_context
+
+class TestBM25Index(unittest.TestCase):
+    """ทดสอบ lexical index แบบ BM25"""
+    
+    def setUp(self):
+        self.index = BM25Index.build(
+            ["solid", "singleton", "scrum"],
+            [
+                "หลักการ SOLID ช่วยให้ออกแบบซอฟต์แวร์ที่ดูแลรักษาง่าย",
+                "Singleton pattern ทำให้คลาสมี instance เดียว",
+                "Scrum แบ่งงานเป็น Sprint"
+            ]
+        )
+    
+    def test_exact_term_ranks_first(self):
+        results = self.index.search("Singleton", k=3)
+        self.assertEqual(results[0][0], "singleton")
+        self.assertEqual(len(results), 1)
+    
+    def test_unknown_term_returns_nothing(self):
+        self.assertEqual(self.index.search("Kubernetes"), [])
+    
+    def test_empty_index(self):
+        self.assertEqual(BM25Index.build([], []).search("SOLID"), [])
+    
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "lexical", "S1_Q1.json")
+            self.index.save(path)
+            loaded = BM25Index.load(path)
+            self.assertEqual(os.listdir(os.path.dirname(path)), ["S1_Q1.json"])
+        self.assertEqual(loaded.search("Scrum Sprint"), self.index.search("Scrum Sprint"))
+
+class TestReciprocalRankFusion(unittest.TestCase):
+    """ทดสอบการรวมผลการค้นหาด้วย RRF"""
+    
+    def test_documents_in_both_rankings_rank_first(self):
+        fused = reciprocal_rank_fusion([["a", "b", "c"], ["d", "b", "e"]])
+        self.assertEqual(fused[0], "b")
+        self.assertEqual(set(fused), {"a", "b", "c", "d", "e"})
+    
+    def test_single_ranking_keeps_order(self):
+        self.assertEqual(reciprocal_rank_fusion([["x", "y", "z"]]), ["x", "y", "z"])
+
+class TestPackContext(unittest.TestCase):
+    """ทดสอบการรวมชิ้นส่วนเฉลยเป็นบริบท"""
+    
+    def make_doc(self, text, start_index):
+        return Document(page_content=text, metadata={"source": "key.pdf", "fingerprint": "f", "start_index": start_index})
+    
+    def test_overlapping_chunks_are_merged(self):
+        docs = [self.make_doc("abcdef", 0), self.make_doc("defghi", 3)]
+        self.assertEqual(pack_context(docs, token_budget=100, chars_per_token=1), "abcdefghi")
+    
+    def test_budget_skips_chunks_that_do_not_fit(self):
+        docs = [self.make_doc("a" * 10, 0), self.make_doc("b" * 50, 100), self.make_doc("c" * 10, 200)]
+        packed = pack_context(docs, token_budget=25, chars_per_token=1)
+        self.assertEqual(packed, "a" * 10 + "\n\n" + "c" * 10)
+
+if __name__ == "__main__":
+    unittest.main()
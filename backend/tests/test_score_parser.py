@@ -0,0 +1,104 @@
+# backend/tests/test_score_parser.py
+import os
+import sys
+import json
+import unittest
+
+# เพิ่มพาธของโปรเจกต์เพื่อให้ import โมดูลได้
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.score_parser_service import IncrementalScoreParser, parse_score_line
+
+SCORE_BLOCK = {
+    "understanding": {"raw": 2, "weighted": 8},
+    "analysis": {"raw": 1, "weighted": 4},
+    "completeness": {"raw": 2, "weighted": 8},
+    "comparison": {"raw": 1, "weighted": 4},
+    "communication": {"raw": 2, "weighted": 8},
+    "item_scores": [8, 8, 8, 8],
+    "total": 32
+}
+
+def feed_all(parser, chunks):
+    """ส่งข้อความทีละส่วนและเก็บผลของแต่ละครั้ง"""
+    return [parser.feed(chunk) for chunk in chunks]
+
+class TestParseScoreLine(unittest.TestCase):
+    """ทดสอบการแยกคะแนนจากบรรทัดเดียว"""
+    
+    def test_plain_line(self):
+        self.assertEqual(parse_score_line("คะแนนเต็ม: 32/40"), 32.0)
+    
+    def test_markdown_bold_and_decimal(self):
+        self.assertEqual(parse_score_line("**คะแนนเต็ม:** 27.5/40"), 27.5)
+    
+    def test_not_a_score_line(self):
+        self.assertIsNone(parse_score_line("ข้อ 1: 8/10"))
+
+class TestIncrementalScoreParser(unittest.TestCase):
+    """ทดสอบตัวแยกคะแนนที่รับข้อความทีละส่วน"""
+    
+    def test_score_split_across_chunks(self):
+        parser = IncrementalScoreParser()
+        results = feed_all(parser, ["คะแนนเ", "ต็ม: 3", "2/40", "\nรายละเอียด"])
+        
+        # บรรทัดคะแนนยังไม่จบจนกว่าจะขึ้นบรรทัดใหม่
+        self.assertEqual(results, [None, None, None, 32.0])
+        self.assertTrue(parser.done)
+    
+    def test_finish_reads_last_line_without_newline(self):
+        parser = IncrementalScoreParser()
+        feed_all(parser, ["ความเห็น\n", "คะแนนเต็ม: 25/40"])
+        self.assertIsNone(parser.score)
+        self.assertEqual(parser.finish(), 25.0)
+    
+    def test_first_score_line_wins(self):
+        parser = IncrementalScoreParser()
+        parser.feed("คะแนนเต็ม: 30/40\nคะแนนเต็ม: 10/40\n")
+        self.assertEqual(parser.score, 30.0)
+    
+    def test_skips_reasoning_block(self):
+        parser = IncrementalScoreParser()
+        results = feed_all(parser, [
+            "<th", "ink>ลองคิดว่า คะแนนเต็ม: 10/40\n", "ยังคิดอยู่\n", "</think>\n", "คะแนนเต็ม: 30/40\n"
+        ])
+        self.assertEqual(results, [None, None, None, None, 30.0])
+    
+    def test_unclosed_reasoning_block(self):
+        parser = IncrementalScoreParser()
+        feed_all(parser, ["<think>คะแนนเต็ม: 10/40\n", "ถูกตัดก่อนจบ"])
+        self.assertIsNone(parser.score)
+        self.assertIsNone(parser.finish())
+    
+    def test_text_resembling_reasoning_tag(self):
+        parser = IncrementalScoreParser()
+        parser.feed("<t")
+        self.assertIsNone(parser.score)
+        parser.feed("able>\nคะแนนเต็ม: 20/40\n")
+        self.assertEqual(parser.score, 20.0)
+    
+    def test_structured_block_split_across_chunks(self):
+        raw = json.dumps(SCORE_BLOCK, ensure_ascii=False)
+        middle = len(raw) // 2
+        parser = IncrementalScoreParser(structured=True)
+        results = feed_all(parser, [raw[:middle], raw[middle:], "\nคะแนนเต็ม: 10/40\n"])
+        
+        self.assertEqual(results[:2], [None, 32.0])
+        self.assertEqual(parser.block.total, 32)
+        self.assertEqual(parser.block.understanding.raw, 2)
+    
+    def test_structured_block_after_reasoning(self):
+        parser = IncrementalScoreParser(structured=True)
+        parser.feed('<think>{"total": 5}</think>\n')
+        parser.feed(json.dumps(SCORE_BLOCK))
+        self.assertEqual(parser.score, 32.0)
+    
+    def test_invalid_block_falls_back_to_score_line(self):
+        block = dict(SCORE_BLOCK, total=99)
+        parser = IncrementalScoreParser(structured=True)
+        parser.feed(json.dumps(block) + "\nคะแนนเต็ม: 28/40\n")
+        self.assertEqual(parser.score, 28.0)
+        self.assertIsNone(parser.block)
+
+if __name__ == "__main__":
+    unittest.main()